@@ -20,65 +20,34 @@ Notas:
 import os
 import sys
 import time
+import logging
 import threading
-import tempfile
-import subprocess
-from dataclasses import dataclass
+from dataclasses import replace
 from typing import Optional, Tuple
 
-import numpy as np
-import cv2
-
 # Qt
-from PyQt6.QtCore import Qt, QTimer, QRect, pyqtSignal, QObject
-from PyQt6.QtGui import QPainter, QColor, QPen, QGuiApplication, QPixmap, QImage
+from PyQt6.QtCore import Qt, QTimer, QRect, QPoint, pyqtSignal, QObject
+from PyQt6.QtGui import QPainter, QColor, QPen, QGuiApplication, QPixmap, QImage, QKeySequence, QShortcut
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QFileDialog, QHBoxLayout,
     QVBoxLayout, QGroupBox, QRadioButton, QListWidget, QMessageBox,
-    QSpinBox, QComboBox, QFormLayout, QLineEdit, QCheckBox
+    QSpinBox, QDoubleSpinBox, QComboBox, QFormLayout, QLineEdit, QCheckBox
 )
 
-# Screen capture
-from mss import mss
-
-# Window enumeration (optional)
-try:
-    import pygetwindow as gw  # type: ignore
-    HAVE_GW = True
-except Exception:
-    HAVE_GW = False
-
-# Audio recording (microfone)
-try:
-    import sounddevice as sd
-    import soundfile as sf
-    HAVE_SD = True
-except Exception:
-    HAVE_SD = False
-
-
-@dataclass
-class CaptureRegion:
-    left: int
-    top: int
-    width: int
-    height: int
-
-
-class SafeFrameBuffer:
-    """Thread-safe último frame capturado (numpy BGR)."""
-    def __init__(self):
-        self._lock = threading.Lock()
-        self._frame = None  # type: Optional[np.ndarray]
-
-    def set(self, frame: np.ndarray):
-        with self._lock:
-            self._frame = frame.copy()
-
-    def get(self) -> Optional[np.ndarray]:
-        with self._lock:
-            return None if self._frame is None else self._frame.copy()
+# Motor de gravação (sem GUI; também usado pela CLI)
+from recorder_engine import (
+    log, DROP_POLICIES, VIDEO_CODECS, PIP_POSITIONS, OverlaySpec, CameraFormat, MotionOptions, CaptureRegion, EncodeOptions, AVSync, SafeFrameBuffer, StageStats, Telemetry,
+    RecorderThread, RecorderProcess, SharedFrameRing, AudioRecorder, FinalizeJob, Finalizer, has_ffmpeg, recover_temp_files, temp_media_path,
+    list_monitors, monitor_stream_path, motion_index_path, window_geometry,
+    audio_backend, window_backend,
+)
 
+# Módulos opcionais (a GUI precisa de saber logo se existem para montar os controlos)
+gw = window_backend()
+HAVE_GW = gw is not None
+_audio = audio_backend()
+HAVE_SD = _audio is not None
+sd = _audio[0] if HAVE_SD else None
 
 class RegionOverlay(QWidget):
     """Overlay de ecrã inteiro para desenhar uma caixa com o rato."""
@@ -89,9 +58,8 @@ class RegionOverlay(QWidget):
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint)
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground, True)
         self.setCursor(Qt.CursorShape.CrossCursor)
-        # Cobrir todos os ecrãs
-        geo = QGuiApplication.primaryScreen().geometry()
-        # Nota: para setups multi-monitor avançados, poderíamos unir geometrias.
+        # Cobrir todos os ecrãs (geometria virtual = união de todos os monitores)
+        geo = QGuiApplication.primaryScreen().virtualGeometry()
         self.setGeometry(geo)
         self._dragging = False
         self._start = None
@@ -114,7 +82,9 @@ class RegionOverlay(QWidget):
             self._dragging = False
             self._end = e.position().toPoint()
             rect = self._normalized_rect()
-            self.region_selected.emit(rect.left(), rect.top(), rect.width(), rect.height())
+            # coordenadas globais (lógicas do Qt), não relativas à janela do overlay
+            origin = self.geometry().topLeft()
+            self.region_selected.emit(rect.left() + origin.x(), rect.top() + origin.y(), rect.width(), rect.height())
             self.close()
 
     def paintEvent(self, e):
@@ -137,137 +107,6 @@ class RegionOverlay(QWidget):
         return QRect(left, top, right - left, bottom - top)
 
 
-class RecorderThread(threading.Thread):
-    def __init__(self, *, mode: str, file_path: str, fps: int = 20,
-                 camera_index: int = 0, region: CaptureRegion | None = None,
-                 codec: str = 'mp4v', out_size: Tuple[int, int] | None = None,
-                 preview_buf: SafeFrameBuffer | None = None,
-                 running_flag: threading.Event | None = None):
-        super().__init__(daemon=True)
-        self.mode = mode            # 'camera' | 'screen' | 'window'
-        self.file_path = file_path
-        self.fps = max(1, int(fps))
-        self.camera_index = camera_index
-        self.region = region
-        self.codec = codec
-        self.out_size = out_size
-        self.preview_buf = preview_buf
-        self._running = running_flag or threading.Event()
-        self._running.set()
-
-    def stop(self):
-        self._running.clear()
-
-    def run(self):
-        if self.mode == 'camera':
-            self._record_camera()
-        else:
-            self._record_screen_like()
-
-    def _open_writer(self, size_wh: tuple[int, int]):
-        fourcc = cv2.VideoWriter_fourcc(*self.codec.upper())
-        writer = cv2.VideoWriter(self.file_path, fourcc, float(self.fps), size_wh)
-        if not writer.isOpened():
-            raise RuntimeError("Não foi possível abrir o VideoWriter. Tente outro codec/ficheiro.")
-        return writer
-
-    def _resize_if_needed(self, frame: np.ndarray) -> np.ndarray:
-        if self.out_size is None:
-            return frame
-        w, h = self.out_size
-        if w > 0 and h > 0 and (frame.shape[1] != w or frame.shape[0] != h):
-            return cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
-        return frame
-
-    def _record_camera(self):
-        cap = cv2.VideoCapture(self.camera_index)
-        if not cap.isOpened():
-            raise RuntimeError(f"Não foi possível acessar a câmera (índice {self.camera_index}).")
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 640)
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 480)
-        # respeitar out_size se definido
-        target_size = (self.out_size[0], self.out_size[1]) if self.out_size else (width, height)
-        writer = self._open_writer(target_size)
-        frame_interval = 1.0 / self.fps
-        try:
-            while self._running.is_set():
-                t0 = time.perf_counter()
-                ok, frame = cap.read()
-                if not ok:
-                    break
-                if self.preview_buf is not None:
-                    self.preview_buf.set(frame)
-                frame = self._resize_if_needed(frame)
-                writer.write(frame)
-                dt = time.perf_counter() - t0
-                to_wait = frame_interval - dt
-                if to_wait > 0:
-                    time.sleep(to_wait)
-        finally:
-            cap.release()
-            writer.release()
-
-    def _record_screen_like(self):
-        with mss() as sct:
-            if self.region is None:
-                mon = sct.monitors[1]
-                region = CaptureRegion(mon['left'], mon['top'], mon['width'], mon['height'])
-            else:
-                region = self.region
-            monitor = {'left': int(region.left), 'top': int(region.top), 'width': int(region.width), 'height': int(region.height)}
-            # respeitar out_size
-            out_w = self.out_size[0] if self.out_size else monitor['width']
-            out_h = self.out_size[1] if self.out_size else monitor['height']
-            writer = self._open_writer((out_w, out_h))
-            frame_interval = 1.0 / self.fps
-            try:
-                while self._running.is_set():
-                    t0 = time.perf_counter()
-                    img = sct.grab(monitor)  # BGRA
-                    frame = np.array(img)[:, :, :3]  # BGR
-                    if self.preview_buf is not None:
-                        self.preview_buf.set(frame)
-                    if self.out_size is not None:
-                        frame = cv2.resize(frame, (out_w, out_h), interpolation=cv2.INTER_AREA)
-                    writer.write(frame)
-                    dt = time.perf_counter() - t0
-                    to_wait = frame_interval - dt
-                    if to_wait > 0:
-                        time.sleep(to_wait)
-            finally:
-                writer.release()
-
-
-class AudioRecorder(threading.Thread):
-    """Grava áudio do microfone para WAV temporário usando sounddevice+soundfile."""
-    def __init__(self, samplerate: int = 48000, channels: int = 1, device: Optional[int] = None):
-        super().__init__(daemon=True)
-        self.samplerate = int(samplerate)
-        self.channels = int(channels)
-        self.device = device
-        self._running = threading.Event()
-        self._running.set()
-        self.wav_path = os.path.join(tempfile.gettempdir(), f"qtrec_audio_{int(time.time())}.wav")
-
-    def stop(self):
-        self._running.clear()
-
-    def run(self):
-        if not HAVE_SD:
-            return
-        with sf.SoundFile(self.wav_path, mode='w', samplerate=self.samplerate, channels=self.channels, subtype='PCM_16') as wav:
-            def callback(indata, frames, time_info, status):
-                if status:
-                    # Opcional: log de status
-                    pass
-                if not self._running.is_set():
-                    raise sd.CallbackStop()
-                wav.write(indata.copy())
-            with sd.InputStream(samplerate=self.samplerate, channels=self.channels, device=self.device, callback=callback):
-                while self._running.is_set():
-                    time.sleep(0.1)
-
-
 class RecorderApp(QWidget):
     def __init__(self):
         super().__init__()
@@ -276,13 +115,26 @@ class RecorderApp(QWidget):
 
         # State
         self.output_path: str = ''
-        self.rec_thread: RecorderThread | None = None
+        self.rec_thread: RecorderThread | RecorderProcess | None = None
+        self.extra_threads: list[RecorderThread] = []  # monitores 2.. no modo "um ficheiro por monitor"
+        self._final_path = ''
         self.audio_thread: AudioRecorder | None = None
         self.preview_buf = SafeFrameBuffer()
+        self._preview_seq = -1
+        self.preview_gui_stats = StageStats('preview_gui')
         self._running_flag = threading.Event()
         self._running_flag.clear()
         self.selected_region: CaptureRegion | None = None
         self.temp_video_path: str | None = None
+        self._video_encoded = False  # vídeo temporário já em H.264 (só falta juntar o áudio)
+        self._spool_path: str | None = None  # gravação em spool bruto, codificada no fim
+        self._spool_opts: EncodeOptions | None = None
+        self.av_sync: AVSync | None = None
+        self.telemetry: Telemetry | None = None
+        # mux/cópia das gravações paradas, em segundo plano (pode gravar-se outra entretanto)
+        self.finalizer = Finalizer()
+        self.finalizer.start()
+        self._jobs_reported = 0
 
         # --- UI ---
         # Modes
@@ -317,21 +169,95 @@ class RecorderApp(QWidget):
         form = QFormLayout()
         self.fps_spin = QSpinBox(); self.fps_spin.setRange(1, 120); self.fps_spin.setValue(30)
         self.cam_index = QSpinBox(); self.cam_index.setRange(0, 10); self.cam_index.setValue(0)
-        self.codec_combo = QComboBox(); self.codec_combo.addItems(["mp4v", "XVID", "MJPG", "H264"])  # disponibilidade varia
+        self.cam_fourcc_combo = QComboBox(); self.cam_fourcc_combo.addItems(["Automático", "MJPG", "YUYV"]); self.cam_fourcc_combo.setCurrentText("MJPG")
+        self.cam_res_combo = QComboBox(); self.cam_res_combo.addItems(["Automática", "640x480", "1280x720", "1920x1080", "2560x1440", "3840x2160"])
+        self.cam_passthrough_cb = QCheckBox("Gravar o MJPEG da câmara sem recodificar (ffmpeg, sem redimensionar)")
+        self.motion_cb = QCheckBox("Câmara: gravar só com movimento (um ficheiro por evento + índice <saída>_events.jsonl)")
+        self.motion_cb.setToolTip("Em repouso a câmara só é lida e comparada, nada é codificado. Sem áudio.")
+        self.motion_thresh_spin = QSpinBox(); self.motion_thresh_spin.setRange(1, 255); self.motion_thresh_spin.setValue(25)
+        self.motion_thresh_spin.setToolTip("Diferença de luminância (0–255) para um píxel contar como em movimento")
+        self.motion_area_spin = QDoubleSpinBox(); self.motion_area_spin.setRange(0.1, 50.0); self.motion_area_spin.setSingleStep(0.1)
+        self.motion_area_spin.setValue(0.5); self.motion_area_spin.setSuffix(" % da imagem")
+        self.preroll_spin = QSpinBox(); self.preroll_spin.setRange(0, 30); self.preroll_spin.setValue(2); self.preroll_spin.setSuffix(" s antes")
+        self.postroll_spin = QSpinBox(); self.postroll_spin.setRange(0, 120); self.postroll_spin.setValue(3); self.postroll_spin.setSuffix(" s depois")
+        self.codec_combo = QComboBox(); self.codec_combo.addItems(list(VIDEO_CODECS))  # disponibilidade varia
         self.res_combo = QComboBox(); self.res_combo.addItems([
             "Nativo/Original", "3840x2160", "2560x1440", "1920x1080", "1600x900", "1280x720", "1024x576", "854x480"
         ])
         self.bitrate_spin = QSpinBox(); self.bitrate_spin.setRange(200, 50000); self.bitrate_spin.setValue(6000); self.bitrate_spin.setSuffix(" kbps")
+        self.drop_combo = QComboBox(); self.drop_combo.addItems(list(DROP_POLICIES))
+        self.direct_cb = QCheckBox("Codificar em direto com ffmpeg (sem ficheiro temporário)"); self.direct_cb.setChecked(True)
+        self.preset_combo = QComboBox(); self.preset_combo.addItems(["ultrafast", "superfast", "veryfast", "faster", "fast", "medium"]); self.preset_combo.setCurrentText("veryfast")
+        self.pixfmt_combo = QComboBox(); self.pixfmt_combo.addItems(["yuv420p", "yuv422p", "yuv444p"])
+        self.i420_cb = QCheckBox("Converter para I420 na captura (metade dos bytes até ao ffmpeg; só yuv420p)")
+        self.vfr_cb = QCheckBox("Frame rate variável (VFR: o ffmpeg descarta as repetições, mantendo a duração real)")
+        self.damage_cb = QCheckBox("Não recodificar frames sem alterações (ecrã estático)"); self.damage_cb.setChecked(True)
+        self.adaptive_cb = QCheckBox("Qualidade adaptativa (baixar fps/resolução de captura se o PC não acompanhar)")
+        self.segment_spin = QSpinBox(); self.segment_spin.setRange(0, 60); self.segment_spin.setValue(0); self.segment_spin.setSuffix(" s")
+        self.segment_spin.setSpecialValueText("desligado")
+        self.workers_spin = QSpinBox(); self.workers_spin.setRange(1, 64); self.workers_spin.setValue(os.cpu_count() or 1)
+        self.fragment_spin = QSpinBox(); self.fragment_spin.setRange(0, 60); self.fragment_spin.setValue(2); self.fragment_spin.setSuffix(" s")
+        self.fragment_spin.setSpecialValueText("desligado")
+        self.recover_btn = QPushButton("Recuperar gravações interrompidas…"); self.recover_btn.clicked.connect(self.recover_recordings)
+        self.replay_spin = QSpinBox(); self.replay_spin.setRange(0, 3600); self.replay_spin.setValue(0); self.replay_spin.setSuffix(" s")
+        self.replay_spin.setSpecialValueText("desligado")
+        self.spool_cb = QCheckBox("Spool bruto em disco (60–120 fps: só cópia na captura, codificado depois em segundo plano)")
+        self.spool_mb_spin = QSpinBox(); self.spool_mb_spin.setRange(256, 262144); self.spool_mb_spin.setSingleStep(1024)
+        self.spool_mb_spin.setValue(4096); self.spool_mb_spin.setSuffix(" MB")
+        self.spool_mb_spin.setToolTip("Espaço reservado no disco temporário; quando enche, a gravação para.")
+        self.worker_cb = QCheckBox("Captura e codificação num processo à parte (a janela não disputa o GIL)")
+        self.worker_cb.setToolTip("A pré-visualização chega por memória partilhada. Sem replay; no modo Janela grava "
+                                  "a posição inicial; o áudio é juntado no fim.")
+        self.replay_mem_spin = QSpinBox(); self.replay_mem_spin.setRange(16, 8192); self.replay_mem_spin.setValue(256); self.replay_mem_spin.setSuffix(" MB")
+        self.monitor_combo = QComboBox(); self.populate_monitors()
+        self.track_spin = QSpinBox(); self.track_spin.setRange(0, 2000); self.track_spin.setSingleStep(50); self.track_spin.setValue(250)
+        self.track_spin.setSuffix(" ms"); self.track_spin.setSpecialValueText("posição fixa")
+        self.track_spin.setToolTip("Intervalo entre consultas à posição da janela (modo Janela). A captura usa sempre a última posição conhecida.")
+        self.pip_cb = QCheckBox("Sobrepor a câmara ao ecrã/janela (picture-in-picture)")
+        self.pip_pos_combo = QComboBox(); self.pip_pos_combo.addItems(list(PIP_POSITIONS))
+        self.pip_scale_spin = QSpinBox(); self.pip_scale_spin.setRange(10, 50); self.pip_scale_spin.setValue(25); self.pip_scale_spin.setSuffix(" %")
+        self.replay_btn = QPushButton("Guardar replay (Ctrl+Shift+S)"); self.replay_btn.setEnabled(False)
+        self.replay_btn.clicked.connect(self.save_replay)
+        QShortcut(QKeySequence("Ctrl+Shift+S"), self, activated=self.save_replay)
 
         self.filename_edit = QLineEdit(); self.filename_edit.setPlaceholderText("Escolha o ficheiro de saída (.mp4)")
         choose_btn = QPushButton("Escolher ficheiro…"); choose_btn.clicked.connect(self.choose_file)
         h = QHBoxLayout(); h.addWidget(self.filename_edit); h.addWidget(choose_btn)
 
         form.addRow("FPS:", self.fps_spin)
+        form.addRow("Monitor:", self.monitor_combo)
+        form.addRow("Seguir a janela a cada:", self.track_spin)
         form.addRow("Índice da câmara:", self.cam_index)
+        cam_row = QHBoxLayout(); cam_row.addWidget(self.cam_fourcc_combo); cam_row.addWidget(self.cam_res_combo)
+        form.addRow("Formato/resolução da câmara:", cam_row)
+        form.addRow(self.cam_passthrough_cb)
+        form.addRow(self.motion_cb)
+        motion_row = QHBoxLayout(); motion_row.addWidget(self.motion_thresh_spin); motion_row.addWidget(self.motion_area_spin)
+        form.addRow("Limiar/área mínima do movimento:", motion_row)
+        roll_row = QHBoxLayout(); roll_row.addWidget(self.preroll_spin); roll_row.addWidget(self.postroll_spin)
+        form.addRow("Pre-roll/post-roll:", roll_row)
+        form.addRow(self.pip_cb)
+        pip_row = QHBoxLayout(); pip_row.addWidget(self.pip_pos_combo); pip_row.addWidget(self.pip_scale_spin)
+        form.addRow("Posição/largura da câmara:", pip_row)
         form.addRow("Codec (captura):", self.codec_combo)
         form.addRow("Resolução de saída:", self.res_combo)
         form.addRow("Bitrate (ffmpeg):", self.bitrate_spin)
+        form.addRow("Fila cheia:", self.drop_combo)
+        form.addRow(self.direct_cb)
+        form.addRow("Preset (ffmpeg):", self.preset_combo)
+        form.addRow("Pixel format:", self.pixfmt_combo)
+        form.addRow(self.i420_cb)
+        form.addRow(self.vfr_cb)
+        form.addRow(self.damage_cb)
+        form.addRow(self.adaptive_cb)
+        form.addRow("Segmentos paralelos:", self.segment_spin)
+        form.addRow("Processos de encode:", self.workers_spin)
+        form.addRow("Fragmentos (à prova de falhas):", self.fragment_spin)
+        form.addRow(self.spool_cb)
+        form.addRow("Tamanho máximo do spool:", self.spool_mb_spin)
+        form.addRow(self.worker_cb)
+        form.addRow("Replay (últimos N s em memória):", self.replay_spin)
+        form.addRow("Limite de memória do replay:", self.replay_mem_spin)
         form.addRow("Saída:", h)
         settings_box.setLayout(form)
 
@@ -343,6 +269,8 @@ class RecorderApp(QWidget):
         self.audio_ch = QComboBox(); self.audio_ch.addItems(["Mono (1)", "Stereo (2)"])
         self.audio_dev = QComboBox(); self.populate_audio_devices()
         self.reencode_cb = QCheckBox("Mux/Re‑encode com ffmpeg (para aplicar bitrate)"); self.reencode_cb.setChecked(True)
+        self.reencode_cb.setToolTip("Vídeo já em H.264 é sempre copiado (-c:v copy); sem áudio nem re‑encode o "
+                                    "temporário é só movido para o destino.")
         aform.addRow(self.audio_enable)
         aform.addRow("Sample rate:", self.audio_sr)
         aform.addRow("Canais:", self.audio_ch)
@@ -357,13 +285,34 @@ class RecorderApp(QWidget):
         preview_box = QGroupBox("Pré‑visualização ao vivo")
         pv_layout = QVBoxLayout()
         self.preview_enable = QCheckBox("Ativar pré‑visualização")
+        self.preview_enable.toggled.connect(self._toggle_preview)
+        self.preview_fps_spin = QSpinBox(); self.preview_fps_spin.setRange(1, 30); self.preview_fps_spin.setValue(10); self.preview_fps_spin.setSuffix(" fps")
         self.preview_label = QLabel("(sem pré‑visualização)")
         self.preview_label.setFixedHeight(300)
         self.preview_label.setStyleSheet("background:#111; color:#ccc; border:1px solid #333;")
-        pv_layout.addWidget(self.preview_enable)
+        self.preview_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        pv_row = QHBoxLayout(); pv_row.addWidget(self.preview_enable); pv_row.addWidget(self.preview_fps_spin)
+        pv_layout.addLayout(pv_row)
         pv_layout.addWidget(self.preview_label)
         preview_box.setLayout(pv_layout)
 
+        # Desempenho (telemetria ao vivo)
+        status_box = QGroupBox("Desempenho")
+        st_layout = QVBoxLayout()
+        self.telemetry_cb = QCheckBox("Telemetria (histogramas + <saída>.telemetry.jsonl)")
+        self.status_label = QLabel("(telemetria desligada)")
+        self.status_label.setStyleSheet("font-family: monospace;")
+        self.status_label.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
+        st_layout.addWidget(self.telemetry_cb)
+        st_layout.addWidget(self.status_label)
+        status_box.setLayout(st_layout)
+
+        # Finalização em segundo plano
+        self.finalize_label = QLabel("")
+        self.finalize_label.setWordWrap(True)
+        self.cancel_finalize_btn = QPushButton("Cancelar finalização"); self.cancel_finalize_btn.setEnabled(False)
+        self.cancel_finalize_btn.clicked.connect(self.cancel_finalize)
+
         # Controls
         self.start_btn = QPushButton("Gravar")
         self.stop_btn = QPushButton("Parar"); self.stop_btn.setEnabled(False)
@@ -379,12 +328,16 @@ class RecorderApp(QWidget):
         left_col.addWidget(self.refresh_btn)
         left_col.addWidget(self.select_region_btn)
         left_col.addWidget(self.clear_region_btn)
+        left_col.addWidget(self.recover_btn)
+        left_col.addWidget(status_box)
+        left_col.addWidget(self.finalize_label)
+        left_col.addWidget(self.cancel_finalize_btn)
 
         right_col = QVBoxLayout()
         right_col.addWidget(settings_box)
         right_col.addWidget(audio_box)
         right_col.addWidget(preview_box)
-        btn_row = QHBoxLayout(); btn_row.addWidget(self.start_btn); btn_row.addWidget(self.stop_btn); btn_row.addWidget(self.exit_btn)
+        btn_row = QHBoxLayout(); btn_row.addWidget(self.start_btn); btn_row.addWidget(self.stop_btn); btn_row.addWidget(self.replay_btn); btn_row.addWidget(self.exit_btn)
         right_col.addLayout(btn_row)
 
         root = QHBoxLayout(); root.addLayout(left_col, 1); root.addLayout(right_col, 2)
@@ -394,9 +347,54 @@ class RecorderApp(QWidget):
         self.ui_pulse = QTimer(self); self.ui_pulse.setInterval(60)
         self.ui_pulse.timeout.connect(self._tick)
         self.ui_pulse.start()
+        self.status_pulse = QTimer(self); self.status_pulse.setInterval(1000)
+        self.status_pulse.timeout.connect(self._update_status)
+        self.status_pulse.start()
+        self.finalize_pulse = QTimer(self); self.finalize_pulse.setInterval(250)
+        self.finalize_pulse.timeout.connect(self._update_finalize)
+        self.finalize_pulse.start()
 
         self.refresh_windows()
 
+    # --- Monitores ---
+    def populate_monitors(self):
+        self.monitor_combo.clear()
+        try:
+            self._monitors = list_monitors()
+        except Exception:
+            self._monitors = []
+        if len(self._monitors) < 2:
+            self.monitor_combo.addItem("Monitor principal", userData=1)
+            return
+        for idx, m in enumerate(self._monitors):
+            geo = f"{m['width']}x{m['height']} @ ({m['left']},{m['top']})"
+            label = f"Todos os monitores — {geo}" if idx == 0 else f"Monitor {idx}: {geo}"
+            self.monitor_combo.addItem(label, userData=idx)
+        self.monitor_combo.setCurrentIndex(1)
+        if len(self._monitors) > 2:
+            # -1: um stream (captura + codificador) por monitor, em paralelo
+            self.monitor_combo.addItem("Cada monitor num ficheiro (em paralelo)", userData=-1)
+
+    def _to_capture_coords(self, left: int, top: int, width: int, height: int) -> CaptureRegion:
+        """Converte uma região em coordenadas lógicas do Qt para os píxeis físicos do mss.
+
+        O ecrã do Qt que contém o canto superior esquerdo é emparelhado com o
+        monitor do mss do mesmo tamanho físico; com escalas diferentes por
+        monitor, a região é medida na escala desse ecrã.
+        """
+        screen = QGuiApplication.screenAt(QPoint(left, top)) or QGuiApplication.primaryScreen()
+        sg = screen.geometry()
+        dpr = screen.devicePixelRatio()
+        phys_w, phys_h = round(sg.width() * dpr), round(sg.height() * dpr)
+        candidates = [m for m in self._monitors[1:] if m['width'] == phys_w and m['height'] == phys_h]
+        if candidates:
+            mon = min(candidates, key=lambda m: abs(m['left'] - sg.left() * dpr) + abs(m['top'] - sg.top() * dpr))
+            ox, oy = mon['left'], mon['top']
+        else:
+            ox, oy = round(sg.left() * dpr), round(sg.top() * dpr)
+        return CaptureRegion(ox + round((left - sg.left()) * dpr), oy + round((top - sg.top()) * dpr),
+                             round(width * dpr), round(height * dpr))
+
     # --- Audio devices ---
     def populate_audio_devices(self):
         self.audio_dev.clear()
@@ -416,18 +414,29 @@ class RecorderApp(QWidget):
             self.audio_dev.addItem("(erro a listar dispositivos)", userData=None)
 
     # --- Preview helpers ---
+    def _toggle_preview(self, checked: bool):
+        if self.rec_thread is not None:
+            self.rec_thread.preview_enabled = checked
+
     def _update_preview(self):
-        if not self.preview_enable.isChecked():
+        if not self.preview_enable.isChecked() or self.preview_buf.seq == self._preview_seq:
             return
-        frame = self.preview_buf.get()
-        if frame is None:
+        # frame e seq lidos juntos: reler .seq depois poderia saltar um frame publicado entretanto
+        pf, seq = self.preview_buf.get_with_seq()
+        if pf is None:
             return
-        # Converter BGR -> RGB e mostrar
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, _ = rgb.shape
-        qimg = QImage(rgb.data, w, h, QImage.Format.Format_RGB888)
-        pix = QPixmap.fromImage(qimg)
-        self.preview_label.setPixmap(pix.scaled(self.preview_label.width(), self.preview_label.height(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
+        t0 = time.perf_counter()
+        try:
+            # o frame já vem reduzido da captura: BGR888 direto, sem conversão de cor nem escala
+            self._preview_seq = seq
+            frame = pf.data
+            h, w, _ = frame.shape
+            qimg = QImage(frame.data, w, h, frame.strides[0], QImage.Format.Format_BGR888)
+            pix = QPixmap.fromImage(qimg)
+        finally:
+            pf.release()
+        self.preview_label.setPixmap(pix)
+        self.preview_gui_stats.add(time.perf_counter() - t0)
 
     # --- UI logic ---
     def choose_file(self):
@@ -469,29 +478,23 @@ class RecorderApp(QWidget):
         except Exception as e:
             QMessageBox.warning(self, "Aviso", f"Falha ao listar janelas: {e}")
 
-    def _selected_window_region(self) -> CaptureRegion | None:
+    def _camera_format(self, fps: int) -> CameraFormat:
+        fourcc = self.cam_fourcc_combo.currentText()
+        res = self.cam_res_combo.currentText()
+        w, h = (int(v) for v in res.split("x")) if "x" in res else (0, 0)
+        return CameraFormat(fourcc='' if fourcc == "Automático" else fourcc, width=w, height=h, fps=fps)
+
+    def _selected_window(self):
         if not HAVE_GW or not self.mode_window.isChecked():
             return None
         row = self.window_list.currentRow()
         if row < 0 or row >= len(getattr(self, '_win_map', [])):
             return None
-        w = self._win_map[row]
-        try:
-            left, top = int(w.left), int(w.top)
-            width, height = int(w.width), int(w.height)
-            return CaptureRegion(left, top, width, height)
-        except Exception:
-            try:
-                bx = w.box
-                if len(bx) == 4:
-                    l, t, a, b = bx
-                    if a > 0 and b > 0 and (a > l and b > t):
-                        width = int(a - l); height = int(b - t)
-                        return CaptureRegion(int(l), int(t), width, height)
-                    else:
-                        return CaptureRegion(int(l), int(t), int(a), int(b))
-            except Exception:
-                return None
+        return self._win_map[row]
+
+    def _selected_window_region(self) -> CaptureRegion | None:
+        w = self._selected_window()
+        return window_geometry(w) if w is not None else None
 
     def open_region_overlay(self):
         if self.rec_thread is not None:
@@ -499,14 +502,15 @@ class RecorderApp(QWidget):
             return
         overlay = RegionOverlay(self)
         overlay.region_selected.connect(self._set_region_from_overlay)
-        overlay.showFullScreen()
+        # show() e não showFullScreen(): o overlay cobre todos os monitores, não só um
+        overlay.show()
 
     def _set_region_from_overlay(self, left, top, width, height):
         if width < 10 or height < 10:
             QMessageBox.information(self, "Info", "Região demasiado pequena.")
             return
-        self.selected_region = CaptureRegion(left, top, width, height)
-        QMessageBox.information(self, "Região", f"Selecionada: {width}x{height} @ ({left},{top})")
+        r = self.selected_region = self._to_capture_coords(left, top, width, height)
+        QMessageBox.information(self, "Região", f"Selecionada: {r.width}x{r.height} @ ({r.left},{r.top})")
 
     def clear_region(self):
         self.selected_region = None
@@ -535,121 +539,276 @@ class RecorderApp(QWidget):
         out_size = self._parse_resolution()
 
         # determinar modo e região
+        window = None
         if self.mode_camera.isChecked():
             mode = 'camera'; region = None
         elif self.mode_window.isChecked():
-            mode = 'window'; region = self._selected_window_region()
+            mode = 'window'; window = self._selected_window(); region = self._selected_window_region()
             if region is None:
                 QMessageBox.warning(self, "Aviso", "Selecione uma janela válida ou use Ecrã inteiro.")
                 return
         else:
             mode = 'screen'; region = self.selected_region  # pode ser None → ecrã inteiro
 
-        # ficheiro temporário de vídeo para permitir mux posterior
+        replay_seconds = self.replay_spin.value()
+        if replay_seconds > 0 and not self._has_ffmpeg():
+            QMessageBox.warning(self, "Aviso", "O modo replay precisa do ffmpeg.")
+            return
+        # sem região: monitor escolhido (0 = todos); -1 = um stream por monitor, em paralelo
+        monitor = self.monitor_combo.currentData()
+        split_monitors = []
+        base_path = path
+        if monitor == -1:
+            if mode != 'screen' or region is not None or replay_seconds > 0:
+                QMessageBox.warning(self, "Aviso", "Um ficheiro por monitor só funciona com Ecrã inteiro, sem região e sem replay.")
+                return
+            split_monitors = list(range(2, len(self._monitors)))
+            path, monitor = monitor_stream_path(path, 1), 1
+        # por movimento: os eventos vão diretos para <base>_evtNNN_*; o "ficheiro final" é o índice
+        motion = mode == 'camera' and self.motion_cb.isChecked() and replay_seconds == 0
+        self._final_path = motion_index_path(path) if motion else path
+        spool = self.spool_cb.isChecked() and replay_seconds == 0 and not motion
+        worker = self.worker_cb.isChecked() and replay_seconds == 0
+        # o replay e os eventos de movimento guardam só vídeo
+        want_audio = HAVE_SD and self.audio_enable.isChecked() and replay_seconds == 0 and not motion
+        device = self.audio_dev.currentData()
+        ch = 1 if self.audio_ch.currentIndex() == 0 else 2
+
+        # ffmpeg em direto: frames crus por pipe, já com bitrate/preset/pix_fmt finais
+        encode_opts = None
+        audio_pipe_w = None
+        if (self.direct_cb.isChecked() or replay_seconds > 0) and self._has_ffmpeg():
+            encode_opts = EncodeOptions(
+                bitrate_kbps=self.bitrate_spin.value(),
+                preset=self.preset_combo.currentText(),
+                pix_fmt=self.pixfmt_combo.currentText(),
+                segment_seconds=float(self.segment_spin.value()),
+                workers=self.workers_spin.value(),
+                fragment_seconds=float(self.fragment_spin.value()),
+                i420=self.i420_cb.isChecked(),
+            )
+            # com segmentos, spool ou worker o áudio vai para WAV e é juntado no fim com -c:v copy
+            if want_audio and os.name == 'posix' and encode_opts.segment_seconds <= 0 and not spool and not worker:
+                # áudio multiplexado em direto por um segundo pipe (pass_fds só existe em POSIX)
+                encode_opts.audio_fd, audio_pipe_w = os.pipe()
+                encode_opts.audio_rate = self.audio_sr.value()
+                encode_opts.audio_channels = ch
+
         base, ext = os.path.splitext(path)
-        self.temp_video_path = os.path.join(tempfile.gettempdir(), f"qtrec_video_{int(time.time())}{ext or '.mp4'}")
+        self._video_encoded = encode_opts is not None
+        self._spool_path = None
+        self._spool_opts = encode_opts
+        if motion:
+            video_path = path
+            self.temp_video_path = None
+        elif spool:
+            # frames crus em disco; codificados pelo Finalizer (para um vídeo temporário se houver áudio a juntar)
+            video_path = self._spool_path = temp_media_path("qtrec_spool", ".qtspool")
+            self.temp_video_path = os.path.splitext(video_path)[0] + (ext or '.mp4') if want_audio else None
+        elif encode_opts is not None and (not want_audio or audio_pipe_w is not None):
+            # o ffmpeg escreve logo o ficheiro final: nada a fazer ao parar
+            video_path = path
+            self.temp_video_path = None
+        else:
+            # ficheiro temporário de vídeo para permitir mux posterior
+            video_path = self.temp_video_path = temp_media_path("qtrec_video", ext or '.mp4')
+
+        # câmara sobreposta ao ecrã/janela, capturada em paralelo
+        overlays = None
+        if self.pip_cb.isChecked() and mode != 'camera':
+            overlays = [OverlaySpec(camera_index=self.cam_index.value(), position=self.pip_pos_combo.currentText(),
+                                    scale=self.pip_scale_spin.value() / 100.0, fps=fps)]
 
         # construir thread de vídeo
+        self.av_sync = AVSync()
+        self.telemetry = Telemetry() if self.telemetry_cb.isChecked() else None
+        self.status_label.setText("(a aguardar a primeira amostra)" if self.telemetry else "(telemetria desligada)")
+        # flag própria: a gravação anterior pode ainda estar a terminar no Finalizer
+        self._running_flag = threading.Event()
         self._running_flag.set()
-        self.rec_thread = RecorderThread(
+        preview_size = (self.preview_label.width(), self.preview_label.height())
+        if worker:
+            # o worker publica a pré-visualização em memória partilhada; a GUI lê-a como um SafeFrameBuffer
+            self.preview_buf = SharedFrameRing((preview_size[1], preview_size[0], 3))
+            recorder_cls, shared = RecorderProcess, {}
+        else:
+            recorder_cls, shared = RecorderThread, {'running_flag': self._running_flag, 'window': window}
+        self._preview_seq = 0
+        self.rec_thread = recorder_cls(
             mode=mode,
-            file_path=self.temp_video_path,
+            file_path=video_path,
             fps=fps,
             camera_index=self.cam_index.value(),
             region=region,
             codec=codec,
             out_size=out_size,
             preview_buf=self.preview_buf,
-            running_flag=self._running_flag,
+            preview_size=preview_size,
+            preview_fps=self.preview_fps_spin.value(),
+            drop_policy=self.drop_combo.currentText(),
+            encode_opts=encode_opts,
+            vfr=self.vfr_cb.isChecked(),
+            skip_unchanged=self.damage_cb.isChecked(),
+            adaptive=self.adaptive_cb.isChecked(),
+            replay_seconds=float(replay_seconds),
+            replay_max_mb=self.replay_mem_spin.value(),
+            av_sync=self.av_sync,
+            telemetry=self.telemetry,
+            overlays=overlays,
+            monitor=monitor,
+            track_interval=self.track_spin.value() / 1000.0,
+            camera_format=self._camera_format(fps),
+            camera_passthrough=self.cam_passthrough_cb.isChecked(),
+            spool_mb=self.spool_mb_spin.value() if spool else 0,
+            motion=MotionOptions(threshold=self.motion_thresh_spin.value(),
+                                 min_area=self.motion_area_spin.value() / 100.0,
+                                 pre_roll=float(self.preroll_spin.value()),
+                                 post_roll=float(self.postroll_spin.value())) if motion else None,
+            **shared,
         )
+        # restantes monitores: captura e codificador próprios, gravados diretamente no destino (o áudio vai no 1.º)
+        extra_opts = replace(encode_opts, audio_fd=None) if encode_opts is not None else None
+        self.extra_threads = [
+            RecorderThread(mode='screen', file_path=monitor_stream_path(base_path, idx), fps=fps, codec=codec,
+                           out_size=out_size, running_flag=self._running_flag,
+                           drop_policy=self.drop_combo.currentText(),
+                           encode_opts=replace(extra_opts) if extra_opts is not None else None,
+                           vfr=self.vfr_cb.isChecked(), skip_unchanged=self.damage_cb.isChecked(),
+                           adaptive=self.adaptive_cb.isChecked(),
+                           telemetry=Telemetry() if self.telemetry is not None else None, monitor=idx)
+            for idx in split_monitors
+        ]
 
         # áudio
-        if HAVE_SD and self.audio_enable.isChecked():
-            device = self.audio_dev.currentData()
-            ch = 1 if self.audio_ch.currentIndex() == 0 else 2
-            self.audio_thread = AudioRecorder(samplerate=self.audio_sr.value(), channels=ch, device=device)
+        if want_audio:
+            self.audio_thread = AudioRecorder(samplerate=self.audio_sr.value(), channels=ch, device=device,
+                                              pcm_fd=audio_pipe_w, av_sync=self.av_sync)
+            if self.telemetry is not None:
+                self.telemetry.add_counters(self.audio_thread.stats)
         else:
             self.audio_thread = None
 
         # UI
         self._set_controls_running(True)
+        self.replay_btn.setEnabled(replay_seconds > 0)
 
         # start threads
+        self.rec_thread.preview_enabled = self.preview_enable.isChecked()
         self.rec_thread.start()
+        for t in self.extra_threads:
+            t.start()
         if self.audio_thread is not None:
             self.audio_thread.start()
 
     def stop_recording(self):
         if self.rec_thread is None:
             return
-        # sinalizar paragem
+        # sinalizar paragem; esperar pelas threads e juntar/copiar fica para o Finalizer (a janela não congela)
         self._running_flag.clear()
         self.rec_thread.stop()
+        self.rec_thread.preview_enabled = False
+        for t in self.extra_threads:
+            t.stop()
         if self.audio_thread is not None:
             self.audio_thread.stop()
-        # esperar
-        self.rec_thread.join(timeout=5)
-        if self.audio_thread is not None:
-            self.audio_thread.join(timeout=5)
-        # mux/encode final
-        final_path = self.filename_edit.text().strip() or self.output_path
-        self._mux_or_copy(final_path)
-        # limpar estado
+        replay = self.rec_thread.replay is not None
+        log.info("Custo da pré-visualização: captura %s, GUI %s",
+                 self.rec_thread.status().get('preview'), self.preview_gui_stats.snapshot())
+        if isinstance(self.preview_buf, SharedFrameRing):
+            # o worker continua com o seu mapeamento até terminar; aqui só se liberta o nosso
+            self.preview_buf.close()
+            self.preview_buf = SafeFrameBuffer()
+        if not replay:
+            threads = [self.rec_thread, *self.extra_threads]
+            if self.audio_thread is not None:
+                threads.append(self.audio_thread)
+            self.finalizer.submit(FinalizeJob(
+                self._final_path, self.temp_video_path,
+                self.audio_thread.wav_path if self.audio_thread is not None else None,
+                threads=threads, video_encoded=self._video_encoded, reencode=self.reencode_cb.isChecked(),
+                bitrate_kbps=self.bitrate_spin.value(), video_codec=self.codec_combo.currentText(),
+                av_sync=self.av_sync if self.audio_thread is not None else None,
+                extra_paths=[t.file_path for t in self.extra_threads],
+                spool_path=self._spool_path, encode_opts=self._spool_opts))
+            self._update_finalize()
+        # limpar estado: já se pode começar outra gravação
         self.rec_thread = None
+        self.extra_threads = []
         self.audio_thread = None
         self._set_controls_running(False)
-        QMessageBox.information(self, "Info", f"Gravação finalizada: {final_path}")
+        self.replay_btn.setEnabled(False)
+        if replay:
+            QMessageBox.information(self, "Info", "Buffer de replay descartado.")
+
+    def cancel_finalize(self):
+        """Cancela a finalização em curso; os temporários ficam para "Recuperar gravações interrompidas…"."""
+        active = self.finalizer.active()
+        if active:
+            active[0].cancel()
+
+    def _update_finalize(self):
+        active = self.finalizer.active()
+        self.finalize_label.setText("\n".join("A finalizar " + j.describe() for j in active))
+        self.cancel_finalize_btn.setEnabled(bool(active))
+        # os trabalhos terminam por ordem: avisar de cada um uma só vez
+        jobs = self.finalizer.jobs
+        while self._jobs_reported < len(jobs) and jobs[self._jobs_reported].done:
+            job = jobs[self._jobs_reported]
+            self._jobs_reported += 1
+            self._report_job(job)
+
+    def _report_job(self, job: FinalizeJob):
+        if job.state == 'failed':
+            QMessageBox.warning(self, "Aviso", f"A finalização de {job.final_path} falhou: {job.error}\n"
+                                "Os temporários foram mantidos (Recuperar gravações interrompidas…).")
+            return
+        if job.state == 'cancelled':
+            QMessageBox.information(self, "Info", f"Finalização de {job.final_path} cancelada.\n"
+                                    "Os temporários foram mantidos (Recuperar gravações interrompidas…).")
+            return
+        msg = "Gravação finalizada: " + ", ".join([job.final_path, *job.extra_paths])
+        if job.av_report is not None:
+            log.info("Sincronização A/V: %s", job.av_report)
+            msg += (f"\nA/V: desvio inicial {job.av_report['start_offset_ms']:+.0f} ms, "
+                    f"deriva do áudio {job.av_report.get('audio_drift_ms', 0.0):+.0f} ms")
+        QMessageBox.information(self, "Info", msg)
+
+    def closeEvent(self, event):
+        active = self.finalizer.active()
+        if active:
+            answer = QMessageBox.question(self, "Sair", f"Há {len(active)} gravação(ões) a finalizar. "
+                                          "Esperar que terminem e sair?")
+            if answer != QMessageBox.StandardButton.Yes:
+                event.ignore()
+                return
+            self.finalizer.close()
+        event.accept()
 
-    def _mux_or_copy(self, final_path: str):
-        # Sem ffmpeg, copia o vídeo temporário para o destino
-        if not self.temp_video_path or not os.path.exists(self.temp_video_path):
+    def save_replay(self):
+        if self.rec_thread is None or self.rec_thread.replay is None:
             return
-        have_ffmpeg = self._has_ffmpeg()
+        base, ext = os.path.splitext(self.filename_edit.text().strip() or self.output_path)
+        path = f"{base}_replay_{time.strftime('%Y%m%d-%H%M%S')}{ext or '.mp4'}"
         try:
-            if have_ffmpeg:
-                args = ["ffmpeg", "-y", "-i", self.temp_video_path]
-                if self.audio_thread is not None and os.path.exists(self.audio_thread.wav_path):
-                    args += ["-i", self.audio_thread.wav_path]
-                    if self.reencode_cb.isChecked():
-                        # re‑encode para aplicar bitrate
-                        kbps = self.bitrate_spin.value()
-                        args += ["-c:v", "libx264", "-b:v", f"{kbps}k", "-pix_fmt", "yuv420p", "-c:a", "aac", "-b:a", "160k"]
-                    else:
-                        args += ["-c:v", "copy", "-c:a", "aac", "-b:a", "160k"]
-                else:
-                    if self.reencode_cb.isChecked():
-                        kbps = self.bitrate_spin.value()
-                        args += ["-c:v", "libx264", "-b:v", f"{kbps}k", "-pix_fmt", "yuv420p"]
-                    else:
-                        args += ["-c", "copy"]
-                args += [final_path]
-                subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            else:
-                # sem ffmpeg: apenas copia
-                if final_path != self.temp_video_path:
-                    try:
-                        import shutil
-                        shutil.copyfile(self.temp_video_path, final_path)
-                    except Exception:
-                        pass
-        finally:
-            # limpar temporários
-            try:
-                os.remove(self.temp_video_path)
-            except Exception:
-                pass
-            if self.audio_thread is not None:
-                try:
-                    os.remove(self.audio_thread.wav_path)
-                except Exception:
-                    pass
+            saved = self.rec_thread.save_replay(path)
+        except Exception as e:
+            QMessageBox.warning(self, "Aviso", f"Não foi possível guardar o replay: {e}")
+            return
+        QMessageBox.information(self, "Replay", f"Replay guardado: {saved}")
+
+    def recover_recordings(self):
+        dest = QFileDialog.getExistingDirectory(self, "Pasta para as gravações recuperadas")
+        if not dest:
+            return
+        results = recover_temp_files(dest)
+        if not results:
+            QMessageBox.information(self, "Recuperação", "Não foram encontradas gravações interrompidas.")
+            return
+        lines = [f"{os.path.basename(src)} → {dst or '—'} ({msg})" for src, dst, msg in results]
+        QMessageBox.information(self, "Recuperação", "\n".join(lines))
 
     def _has_ffmpeg(self) -> bool:
-        try:
-            subprocess.run(["ffmpeg", "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            return True
-        except Exception:
-            return False
+        return has_ffmpeg()
 
     def _set_controls_running(self, running: bool):
         self.start_btn.setEnabled(not running)
@@ -662,9 +821,38 @@ class RecorderApp(QWidget):
         self.refresh_btn.setEnabled(not running and HAVE_GW)
         self.fps_spin.setEnabled(not running)
         self.cam_index.setEnabled(not running)
+        self.cam_fourcc_combo.setEnabled(not running)
+        self.cam_res_combo.setEnabled(not running)
+        self.cam_passthrough_cb.setEnabled(not running)
+        for w in (self.motion_cb, self.motion_thresh_spin, self.motion_area_spin, self.preroll_spin, self.postroll_spin):
+            w.setEnabled(not running)
+        self.monitor_combo.setEnabled(not running)
+        self.track_spin.setEnabled(not running)
+        self.pip_cb.setEnabled(not running)
+        self.pip_pos_combo.setEnabled(not running)
+        self.pip_scale_spin.setEnabled(not running)
         self.codec_combo.setEnabled(not running)
         self.res_combo.setEnabled(not running)
         self.bitrate_spin.setEnabled(not running)
+        self.drop_combo.setEnabled(not running)
+        self.direct_cb.setEnabled(not running)
+        self.preset_combo.setEnabled(not running)
+        self.pixfmt_combo.setEnabled(not running)
+        self.i420_cb.setEnabled(not running)
+        self.spool_cb.setEnabled(not running)
+        self.spool_mb_spin.setEnabled(not running)
+        self.worker_cb.setEnabled(not running)
+        self.vfr_cb.setEnabled(not running)
+        self.damage_cb.setEnabled(not running)
+        self.adaptive_cb.setEnabled(not running)
+        self.segment_spin.setEnabled(not running)
+        self.workers_spin.setEnabled(not running)
+        self.fragment_spin.setEnabled(not running)
+        self.recover_btn.setEnabled(not running)
+        self.replay_spin.setEnabled(not running)
+        self.replay_mem_spin.setEnabled(not running)
+        self.preview_fps_spin.setEnabled(not running)
+        self.telemetry_cb.setEnabled(not running)
         self.audio_enable.setEnabled(not running and HAVE_SD)
         self.audio_sr.setEnabled(not running and HAVE_SD)
         self.audio_ch.setEnabled(not running and HAVE_SD)
@@ -676,8 +864,34 @@ class RecorderApp(QWidget):
     def _tick(self):
         self._update_preview()
 
+    def _update_status(self):
+        tel = self.telemetry
+        if self.rec_thread is None or tel is None or tel.last is None:
+            return
+        sample = tel.last
+        status = self.rec_thread.status()
+        lines = [f"{name:8s} p50 {h['p50_ms']:6.1f}  p95 {h['p95_ms']:6.1f}  máx {h['max_ms']:6.1f} ms"
+                 for name, h in sample['stages'].items() if h['n']]
+        c = dict(sample['counters'])
+        if self.audio_thread is not None:
+            c.update(self.audio_thread.stats())  # com worker, a telemetria do worker não vê o áudio
+        lines.append(f"fila {c.get('queue_depth', 0)}/{status.get('queue_size', 0)} (máx {c.get('queue_max_depth', 0)})  "
+                     f"escritos {c.get('written', 0)}")
+        lines.append(f"descartados {c.get('dropped', 0)}  duplicados {c.get('duplicated', 0)}")
+        if status.get('quality'):
+            lines.append(f"qualidade: {status['quality']}")
+        if status.get('motion'):
+            m = status['motion']
+            lines.append(f"movimento: {m['events']} evento(s), {'a gravar' if m['recording'] else 'em repouso'} "
+                         f"(área {100 * m['area']:.1f}%)")
+        if 'input_overflows' in c:
+            lines.append(f"áudio: overflows {c['input_overflows']}  underflows {c['input_underflows']}  "
+                         f"perdidos no anel {c['ring_dropped_frames']}")
+        self.status_label.setText("\n".join(lines))
+
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
     app = QApplication(sys.argv)
     w = RecorderApp()
     w.show()
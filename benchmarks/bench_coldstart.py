@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: tempo de arranque a frio da CLI e do motor, comparado com a GUI.
+
+Cada medição é um processo Python novo (mediana de N execuções). Falha
+se importar o motor carregar PyQt6, tkinter ou algum módulo opcional.
+
+    python benchmarks/bench_coldstart.py --runs 10
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# módulos que o motor só pode carregar quando são usados
+LAZY = ("PyQt6", "tkinter", "mss", "sounddevice", "soundfile", "pygetwindow")
+
+CASES = {
+    "cli --help": [os.path.join(ROOT, "recorder_cli.py"), "--help"],
+    "import recorder_engine": ["-c", "import recorder_engine"],
+    "import GUI (referência)": ["-c", "import importlib.util as u; s = u.spec_from_file_location('g', 'Qt-Screen-Recorder.py');"
+                                      " s.loader.exec_module(u.module_from_spec(s))"],
+}
+
+
+def time_process(argv: list[str], runs: int) -> list[float]:
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, *argv], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def loaded_lazy_modules() -> list[str]:
+    code = ("import sys, recorder_engine; "
+            f"print(','.join(m for m in {LAZY!r} if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [m for m in out.stdout.strip().split(",") if m]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    env_qpa = os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    print(f"{args.runs} execuções por caso (QT_QPA_PLATFORM={env_qpa})")
+    for name, argv in CASES.items():
+        try:
+            samples = time_process(argv, args.runs)
+        except subprocess.CalledProcessError:
+            print(f"{name:26s}  falhou")
+            continue
+        print(f"{name:26s}  mediana {1000 * statistics.median(samples):6.0f} ms   mín {1000 * min(samples):6.0f} ms")
+
+    loaded = loaded_lazy_modules()
+    if loaded:
+        sys.exit(f"recorder_engine carregou módulos que deviam ser preguiçosos: {', '.join(loaded)}")
+    print("recorder_engine não carrega:", ", ".join(LAZY))
+
+
+if __name__ == '__main__':
+    main()
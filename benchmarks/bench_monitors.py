@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: débito total da captura multi-monitor à medida que se juntam monitores.
+
+Para 1..N monitores sintéticos (benchmarks/fakes.py) compara:
+  - streams:  um RecorderThread por monitor (captura + codificador próprios, em paralelo)
+  - span:     um só stream com o ambiente de trabalho virtual inteiro (monitors[0])
+
+    python benchmarks/bench_monitors.py --monitors 3 --size 1920x1080 --seconds 3
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+import recorder_engine as engine  # noqa: E402
+import fakes  # noqa: E402
+
+
+def run(count: int, span: bool, w: int, h: int, fps: int, seconds: float, codec: str) -> dict:
+    engine.mss = fakes.FakeMSS.sized(w, h, count)
+    use_ffmpeg = codec == 'ffmpeg'
+    running = threading.Event()
+    out = os.path.join(tempfile.gettempdir(), f"qtrec_bench_mon{'.mp4' if codec in ('mp4v', 'ffmpeg') else '.avi'}")
+    indices = [0] if span else list(range(1, count + 1))
+    threads = [engine.RecorderThread(mode='screen', file_path=engine.monitor_stream_path(out, i), fps=fps,
+                                     codec='mp4v' if use_ffmpeg else codec, running_flag=running, monitor=i,
+                                     encode_opts=engine.EncodeOptions(fragment_seconds=0.0) if use_ffmpeg else None)
+               for i in indices]
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    running.clear()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+    frames = [t.stats['encode'].frames for t in threads]
+    pixels = sum(f * t.pool.shape[0] * t.pool.shape[1] for f, t in zip(frames, threads) if t.pool is not None)
+    for t in threads:
+        if os.path.exists(t.file_path):
+            os.remove(t.file_path)
+    return {
+        'monitors': count,
+        'mode': 'span' if span else 'streams',
+        'streams': len(threads),
+        'fps_per_stream': [f / wall for f in frames],
+        'fps_total': sum(frames) / wall,
+        'megapixels_per_s': pixels / wall / 1e6,
+        'dropped': sum(t.queue.dropped + t.scheduler.skipped for t in threads),
+        'cpu_s': cpu,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--monitors", type=int, default=3)
+    ap.add_argument("--size", default="1920x1080", help="resolução de cada monitor")
+    ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--codec", default="ffmpeg" if engine.has_ffmpeg() else "mp4v")
+    ap.add_argument("--out", default=None, help="guardar os resultados em JSON")
+    args = ap.parse_args()
+    w, h = (int(v) for v in args.size.split("x"))
+
+    print(f"{args.size} por monitor @ {args.fps} fps, {args.seconds:g} s, codec {args.codec}")
+    print(f"{'monitores':>9s} {'modo':8s} {'fps total':>9s} {'fps/stream':>18s} {'MP/s':>7s} {'perdidos':>8s} {'CPU s':>6s}")
+    results = []
+    for count in range(1, args.monitors + 1):
+        for span in (False, True):
+            if span and count == 1:
+                continue
+            r = run(count, span, w, h, args.fps, args.seconds, args.codec)
+            results.append(r)
+            per = "/".join(f"{v:.0f}" for v in r['fps_per_stream'])
+            print(f"{count:9d} {r['mode']:8s} {r['fps_total']:9.1f} {per:>18s} {r['megapixels_per_s']:7.1f} "
+                  f"{r['dropped']:8d} {r['cpu_s']:6.2f}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'args': vars(args), 'cpu_count': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
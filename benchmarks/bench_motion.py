@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: CPU da gravação por movimento (câmara) em repouso e com eventos, contra a gravação contínua.
+
+Câmara sintética de vigilância (benchmarks/fakes.py, ScriptedMotionCapture):
+cena parada com ruído de sensor e, em "eventos", um objeto a mexer-se N s
+em cada ciclo. Casos:
+  - contínua: gravação normal da câmara (tudo codificado)
+  - repouso:  gravação por movimento com a cena sempre parada
+  - eventos:  gravação por movimento com --idle s parados e --active s de movimento em ciclo
+Cada caso corre num processo próprio; o CPU inclui os processos filhos
+(ffmpeg). A coluna "% CPU" é CPU / tempo de relógio.
+
+    python benchmarks/bench_motion.py --size 1280x720 --seconds 10
+    python benchmarks/bench_motion.py --size 1920x1080 --codec mp4v --out motion.json
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+from bench_pipeline import _children_cpu  # noqa: E402
+
+CASES = ("contínua", "repouso", "eventos")
+
+
+def run_case(case: dict) -> dict:
+    import recorder_engine as engine
+    import fakes
+
+    w, h = (int(v) for v in case['size'].split("x"))
+    script = (1.0, 0.0) if case['name'] == 'repouso' else (case['idle'], case['active'])
+    fakes.install_fake_capture(engine, w, h, motion=script)
+    use_ffmpeg = case['codec'] == 'ffmpeg'
+    base = os.path.join(tempfile.gettempdir(), f"qtrec_bench_motion_{os.getpid()}.mp4")
+    motion = None if case['name'] == 'contínua' else engine.MotionOptions(pre_roll=case['pre_roll'],
+                                                                           post_roll=case['post_roll'])
+    rec = engine.RecorderThread(mode='camera', file_path=base, fps=case['fps'], codec='mp4v' if use_ffmpeg else case['codec'],
+                                encode_opts=engine.EncodeOptions(fragment_seconds=0.0) if use_ffmpeg else None,
+                                motion=motion)
+    cpu0, child0 = time.process_time(), _children_cpu()
+    t0 = time.perf_counter()
+    rec.start()
+    time.sleep(case['seconds'])
+    rec.stop()
+    rec.join()
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+    child = _children_cpu()
+    cpu += (child - child0) if child is not None else 0.0
+
+    outputs = [p for p in glob.glob(os.path.splitext(base)[0] + "*") if not p.endswith('.jsonl')]
+    result = {
+        'cpu_s': cpu,
+        'cpu_pct': 100.0 * cpu / wall,
+        'wall_s': wall,
+        'frames_written': rec.frames_written,
+        'events': len(rec.motion_events),
+        'output_bytes': sum(os.path.getsize(p) for p in outputs),
+        'peak_rss_bytes': engine.peak_rss_bytes(),
+    }
+    for p in glob.glob(os.path.splitext(base)[0] + "*"):
+        os.remove(p)
+    return result
+
+
+def main():
+    import recorder_engine as engine
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--size", default="1280x720")
+    ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--codec", default="ffmpeg" if engine.has_ffmpeg() else "mp4v")
+    ap.add_argument("--idle", type=float, default=6.0, help="s sem movimento em cada ciclo (caso eventos)")
+    ap.add_argument("--active", type=float, default=2.0, help="s com movimento em cada ciclo (caso eventos)")
+    ap.add_argument("--pre-roll", type=float, default=2.0)
+    ap.add_argument("--post-roll", type=float, default=2.0)
+    ap.add_argument("--out", default=None, help="guardar os resultados em JSON")
+    ap.add_argument("--case", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+
+    print(f"câmara {args.size} @ {args.fps} fps, codec {args.codec}, {args.seconds:g} s, {os.cpu_count()} CPUs")
+    print(f"{'caso':10s} {'CPU s':>6s} {'% CPU':>6s} {'frames':>7s} {'eventos':>7s} {'MB':>6s} {'pico MB':>8s}")
+    results = []
+    for name in CASES:
+        case = {'name': name, 'size': args.size, 'fps': args.fps, 'seconds': args.seconds, 'codec': args.codec,
+                'idle': args.idle, 'active': args.active, 'pre_roll': args.pre_roll, 'post_roll': args.post_roll}
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)],
+                              capture_output=True, text=True, timeout=args.seconds + 120)
+        try:
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            r = {'error': (proc.stderr.strip().splitlines() or ["sem saída"])[-1]}
+        results.append(dict(case, **r))
+        if 'error' in r:
+            print(f"{name:10s} erro: {r['error']}")
+            continue
+        print(f"{name:10s} {r['cpu_s']:6.2f} {r['cpu_pct']:6.1f} {r['frames_written']:7d} {r['events']:7d} "
+              f"{r['output_bytes'] / 2**20:6.1f} {(r['peak_rss_bytes'] or 0) / 2**20:8.0f}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'args': vars(args), 'cpu_count': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark reprodutível do pipeline captura → fila → codificação (RecorderThread).
+
+Usa fontes sintéticas (benchmarks/fakes.py): um substituto do mss com frames
+BGRA e um cv2.VideoCapture falso (gerador ou ficheiro de vídeo em ciclo), por
+isso corre sem ecrã nem câmara. A fonte "pip" junta as duas (ecrã com a
+câmara sobreposta, ambas à resolução do caso); "camera-mjpeg" é a câmara a
+entregar JPEG copiados para o contentor sem decode (só com o codec ffmpeg). Cada caso (fonte × resolução × codec) corre
+num processo próprio, para o pico de memória e o tempo de CPU não se
+misturarem entre casos. Os resultados ficam em JSON para comparar execuções.
+
+    python benchmarks/bench_pipeline.py --seconds 3 --out antes.json
+    python benchmarks/bench_pipeline.py --sizes 1920x1080 --codecs mp4v,ffmpeg --out depois.json
+    python benchmarks/bench_pipeline.py --compare antes.json depois.json
+
+Codec "ffmpeg" = backend ffmpeg em direto (libx264), se existir no PATH;
+"ffmpeg-i420" = o mesmo com os frames convertidos para I420 na captura;
+"spool"/"spool-i420" = frames crus num spool mmap, sem codificar (a
+transcodificação fica fora da medição). A coluna "MB/s enc" é o débito de
+frames crus até ao encoder (bytes no pipe ou no spool).
+
+    python benchmarks/bench_pipeline.py --sources screen --sizes 1920x1080,3840x2160 --codecs ffmpeg,ffmpeg-i420
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+SIZES = ("854x480", "1280x720", "1920x1080", "2560x1440", "3840x2160")
+SOURCES = ("screen", "camera", "camera-mjpeg", "pip")
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def _children_cpu() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+
+def run_case(case: dict) -> dict:
+    """Corre um caso neste processo e devolve as métricas."""
+    import recorder_engine as engine
+    import fakes
+
+    w, h = (int(v) for v in case['size'].split("x"))
+    overlays = None
+    camera_format = None
+    if case['source'] in ('screen', 'pip'):
+        engine.mss = fakes.FakeMSS.sized(w, h)
+        mode = 'screen'
+        if case['source'] == 'pip':
+            # ecrã + câmara à mesma resolução, compostos num só frame
+            fakes.install_fake_capture(engine, w, h, case.get('video'))
+            overlays = [engine.OverlaySpec(camera_index=0, fps=case['fps'])]
+    else:
+        fakes.install_fake_capture(engine, w, h, case.get('video'))
+        mode = 'camera'
+        if case['source'] == 'camera-mjpeg':
+            camera_format = engine.CameraFormat(width=w, height=h)
+    use_opts = case['codec'].startswith(('ffmpeg', 'spool'))
+    spool = case['codec'].startswith('spool')
+    ext = '.avi' if case['codec'] in ('XVID', 'MJPG') else '.qtspool' if spool else '.mp4'
+    out = os.path.join(tempfile.gettempdir(), f"qtrec_bench_{os.getpid()}{ext}")
+
+    errors: list[str] = []
+    threading.excepthook = lambda a: errors.append(f"{a.exc_type.__name__}: {a.exc_value}")
+    rec = engine.RecorderThread(mode=mode, file_path=out, fps=case['fps'],
+                                codec='mp4v' if use_opts else case['codec'],
+                                encode_opts=engine.EncodeOptions(fragment_seconds=0.0, i420=case['codec'].endswith('-i420'))
+                                if use_opts else None, spool_mb=8192 if spool else 0,
+                                overlays=overlays, camera_format=camera_format,
+                                camera_passthrough=camera_format is not None)
+    cpu0, child0 = time.process_time(), _children_cpu()
+    t0 = time.perf_counter()
+    rec.start()
+    time.sleep(case['seconds'])
+    rec.stop()
+    t_stop = time.perf_counter()
+    rec.join()
+    t_end = time.perf_counter()
+    cpu = time.process_time() - cpu0
+    child = _children_cpu()
+
+    timing = rec.scheduler.report()
+    lat = sorted(rec.latency)
+    result = {
+        'fps_target': case['fps'],
+        # frames distintos que passaram pelo codificador por segundo de relógio (inclui o esvaziar da fila)
+        'fps_achieved': rec.stats['encode'].frames / (t_end - t0),
+        'capture_fps': timing['capture_fps'],
+        'frames_written': rec.frames_written,
+        'duplicated': timing['duplicated'] + rec.gap_filled,
+        'dropped': timing['skipped'] + rec.queue.dropped,
+        'latency_ms': {k: 1000 * _percentile(lat, q) for k, q in (('p50', .5), ('p95', .95), ('p99', .99), ('max', 1.0))},
+        'stages': {name: st.snapshot() for name, st in rec.stats.items() if name != 'preview'},
+        'cpu_s': cpu,
+        'cpu_children_s': (child - child0) if child is not None else None,
+        'wall_s': t_end - t0,
+        'drain_s': t_end - t_stop,
+        'peak_rss_bytes': engine.peak_rss_bytes(),
+        'output_bytes': os.path.getsize(out) if os.path.exists(out) else 0,
+        'encoder_input_MBps': getattr(rec.writer, 'bytes_written', 0) / 2**20 / (t_end - t0),
+        'passthrough': rec.passthrough_active,
+        'error': "; ".join(errors) or None,
+    }
+    if os.path.exists(out):
+        os.remove(out)
+    return result
+
+
+def _meta(args) -> dict:
+    import cv2
+    import numpy as np
+    import recorder_engine as engine
+    return {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'ffmpeg': engine.has_ffmpeg(),
+        'args': {k: v for k, v in vars(args).items() if k != 'compare'},
+    }
+
+
+def _key(r: dict) -> tuple:
+    return r['source'], r['size'], r['codec']
+
+
+def compare(path_a: str, path_b: str):
+    with open(path_a) as f:
+        a = {_key(r): r for r in json.load(f)['results']}
+    with open(path_b) as f:
+        b = {_key(r): r for r in json.load(f)['results']}
+    print(f"{'caso':32s} {'fps A':>7s} {'fps B':>7s} {'p95 A':>7s} {'p95 B':>7s} {'CPU B/A':>8s}")
+    for key in sorted(a.keys() & b.keys()):
+        ra, rb = a[key], b[key]
+        if ra.get('error') or rb.get('error'):
+            continue
+        cpu_ratio = rb['cpu_s'] / ra['cpu_s'] if ra['cpu_s'] else float('nan')
+        print(f"{' '.join(key):32s} {ra['fps_achieved']:7.1f} {rb['fps_achieved']:7.1f} "
+              f"{ra['latency_ms']['p95']:7.1f} {rb['latency_ms']['p95']:7.1f} {cpu_ratio:8.2f}")
+
+
+def main():
+    import recorder_engine as engine
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default=",".join(SIZES))
+    ap.add_argument("--codecs", default=",".join(engine.VIDEO_CODECS + ("ffmpeg", "ffmpeg-i420", "spool", "spool-i420")))
+    ap.add_argument("--sources", default=",".join(SOURCES))
+    ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--video", default=None, help="ficheiro de vídeo para a câmara falsa (por omissão frames sintéticos)")
+    ap.add_argument("--out", default=None, help="JSON de saída (por omissão bench_pipeline_<data>.json)")
+    ap.add_argument("--compare", nargs=2, metavar=("A.json", "B.json"))
+    ap.add_argument("--case", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    codecs = [c for c in args.codecs.split(",") if not c.startswith('ffmpeg') or engine.has_ffmpeg()]
+    cases = [{'source': src, 'size': size, 'codec': codec, 'fps': args.fps, 'seconds': args.seconds, 'video': args.video}
+             for src in args.sources.split(",") for size in args.sizes.split(",") for codec in codecs
+             if src != 'camera-mjpeg' or codec == 'ffmpeg']
+    results = []
+    print(f"{'caso':32s} {'fps':>6s} {'p50 ms':>7s} {'p95 ms':>7s} {'p99 ms':>7s} {'CPU s':>6s} {'pico MB':>8s} "
+          f"{'MB/s enc':>8s}")
+    for case in cases:
+        name = f"{case['source']} {case['size']} {case['codec']}"
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)],
+                              capture_output=True, text=True, timeout=case['seconds'] + 120)
+        try:
+            metrics = json.loads(proc.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            metrics = {'error': (proc.stderr.strip().splitlines() or ["sem saída"])[-1]}
+        results.append(dict(case, **metrics))
+        if metrics.get('error'):
+            print(f"{name:32s} erro: {metrics['error']}")
+            continue
+        lat = metrics['latency_ms']
+        cpu = metrics['cpu_s'] + (metrics['cpu_children_s'] or 0.0)
+        print(f"{name:32s} {metrics['fps_achieved']:6.1f} {lat['p50']:7.1f} {lat['p95']:7.1f} {lat['p99']:7.1f} "
+              f"{cpu:6.2f} {(metrics['peak_rss_bytes'] or 0) / 2**20:8.0f} {metrics['encoder_input_MBps']:8.1f}")
+
+    out = args.out or f"bench_pipeline_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(out, 'w') as f:
+        json.dump({'meta': _meta(args), 'results': results}, f, indent=2)
+    print("resultados:", out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: redimensionamento de saída, caminho antigo vs FrameResizer.
+
+Para cada razão compara, em ms por frame BGR:
+  - area:      cv2.resize(..., INTER_AREA) numa só chamada (caminho antigo)
+  - resizer:   FrameResizer sem faixas (metades INTER_AREA + INTER_LINEAR)
+  - faixas:    FrameResizer em N faixas no pool de threads
+  - remap:     cv2.remap com tabelas em ponto fixo pré-calculadas (referência;
+               nunca mais rápido que o FrameResizer nas razões medidas, por isso não é usado)
+  - decimação: src[::f, ::f] (referência, só fatores inteiros; com aliasing)
+O PSNR é medido contra o INTER_AREA. Com --cv-threads 1 o OpenCV deixa de
+paralelizar por dentro e as faixas passam a ser a única fonte de paralelismo.
+
+    python benchmarks/bench_resize.py --repeat 30 --cv-threads 1
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+import numpy as np  # noqa: E402
+import cv2  # noqa: E402
+
+import recorder_engine as engine  # noqa: E402
+
+CASES = ("3840x2160:1920x1080", "3840x2160:1280x720", "2560x1440:1920x1080", "1920x1080:1280x720",
+         "1920x1080:854x480", "960x540:1920x1080")
+
+
+def test_image(w: int, h: int) -> np.ndarray:
+    """Ruído suavizado + linhas finas (texto/arestas), para o PSNR distinguir aliasing."""
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (h, w, 3), dtype=np.uint8), (0, 0), 3)
+    img[::7, :] = 255
+    img[:, ::11] = 0
+    return img
+
+
+def remap_tables(src_wh: tuple[int, int], dst_wh: tuple[int, int]) -> tuple:
+    """Tabelas do cv2.remap com as coordenadas do INTER_LINEAR do cv2.resize (centros alinhados)."""
+    (w, h), (dw, dh) = src_wh, dst_wh
+    xs = np.clip((np.arange(dw, dtype=np.float32) + 0.5) * (w / dw) - 0.5, 0, w - 1)
+    ys = np.clip((np.arange(dh, dtype=np.float32) + 0.5) * (h / dh) - 0.5, 0, h - 1)
+    mx, my = np.meshgrid(xs, ys)
+    return cv2.convertMaps(mx, my, cv2.CV_16SC2)
+
+
+def timed(fn, repeat: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return 1000 * (time.perf_counter() - t0) / repeat
+
+
+def psnr(a: np.ndarray, b: np.ndarray) -> float:
+    return float(cv2.PSNR(np.ascontiguousarray(a), np.ascontiguousarray(b)))
+
+
+def run(case: str, repeat: int, stripes: int) -> dict:
+    (sw, sh), (dw, dh) = ((int(v) for v in part.split("x")) for part in case.split(":"))
+    src = test_image(sw, sh)
+    ref = np.empty((dh, dw, 3), np.uint8)
+    r = {'case': case}
+    r['area_ms'] = timed(lambda: cv2.resize(src, (dw, dh), dst=ref, interpolation=cv2.INTER_AREA), repeat)
+
+    single = engine.FrameResizer((sw, sh), (dw, dh), stripes=1)
+    r['method'] = single.describe()
+    r['resizer_ms'] = timed(lambda: single.resize(src), repeat)
+    r['resizer_psnr'] = psnr(single.resize(src), ref)
+
+    striped = engine.FrameResizer((sw, sh), (dw, dh), stripes=stripes)
+    r['stripes_ms'] = timed(lambda: striped.resize(src), repeat)
+    r['stripes_equal'] = bool(np.abs(striped.resize(src).astype(np.int16) - single.resize(src)).max() <= 1)
+
+    m1, m2 = remap_tables((sw, sh), (dw, dh))
+    out = np.empty_like(ref)
+    r['remap_ms'] = timed(lambda: cv2.remap(src, m1, m2, cv2.INTER_LINEAR, dst=out), repeat)
+    r['remap_psnr'] = psnr(out, ref)
+
+    if sw % dw == 0 and sh % dh == 0 and sw // dw == sh // dh:
+        f = sw // dw
+        r['decimate_ms'] = timed(lambda: np.copyto(out, src[::f, ::f]), repeat)
+        r['decimate_psnr'] = psnr(out, ref)
+    return r
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--cases", default=",".join(CASES), help="ORIGEM:DESTINO separados por vírgulas")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--stripes", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--cv-threads", type=int, default=None, help="cv2.setNumThreads (por omissão o do OpenCV)")
+    ap.add_argument("--out", default=None, help="guardar os resultados em JSON")
+    args = ap.parse_args()
+    if args.cv_threads is not None:
+        cv2.setNumThreads(args.cv_threads)
+
+    print(f"OpenCV {cv2.__version__}, {cv2.getNumThreads()} threads internas, {args.stripes} faixas, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'caso':22s} {'area':>6s} {'resizer':>7s} {'faixas':>6s} {'remap':>6s} {'decim':>6s}  "
+          f"{'PSNR':>5s}  método")
+    results = []
+    for case in args.cases.split(","):
+        r = run(case, args.repeat, args.stripes)
+        results.append(r)
+        dec = f"{r['decimate_ms']:6.1f}" if 'decimate_ms' in r else f"{'-':>6s}"
+        flag = "" if r['stripes_equal'] else " (faixas diferem!)"
+        print(f"{case:22s} {r['area_ms']:6.1f} {r['resizer_ms']:7.1f} {r['stripes_ms']:6.1f} {r['remap_ms']:6.1f} "
+              f"{dec}  {r['resizer_psnr']:5.1f}  {r['method']}{flag}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'opencv': cv2.__version__, 'cv_threads': cv2.getNumThreads(), 'args': vars(args),
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
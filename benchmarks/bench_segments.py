@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: escalabilidade da codificação por segmentos (SegmentedEncoder) com o nº de processos.
+
+Gera frames sintéticos, escreve-os com 1, 2, 4, … processos e mostra o tempo total e a
+velocidade relativa ao tempo real. Requer ffmpeg no PATH.
+
+    python benchmarks/bench_segments.py --size 1920x1080 --seconds 10 --segment 2
+"""
+
+import os
+import sys
+import time
+import argparse
+import importlib
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_recorder():
+    # só o motor (sem PyQt6)
+    sys.path.insert(0, os.path.join(HERE, ".."))
+    return importlib.import_module("recorder_engine")
+
+
+def synthetic_frames(w: int, h: int, n: int):
+    base = np.random.default_rng(0).integers(0, 255, (h, w, 3), dtype=np.uint8)
+    for i in range(n):
+        # deslocar o padrão para o encoder ter movimento real para codificar
+        yield np.roll(base, i * 8, axis=1)
+
+
+def run(rec, w, h, fps, seconds, segment, workers, preset):
+    out = os.path.join(rec.tempfile.gettempdir(), f"qtrec_bench_seg_{workers}.mp4")
+    opts = rec.EncodeOptions(preset=preset, segment_seconds=segment, workers=workers)
+    t0 = time.perf_counter()
+    writer = rec.SegmentedEncoder(out, (w, h), float(fps), opts)
+    for frame in synthetic_frames(w, h, int(fps * seconds)):
+        writer.write(frame)
+    writer.release()
+    elapsed = time.perf_counter() - t0
+    os.remove(out)
+    return elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--size", default="1920x1080")
+    ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--segment", type=float, default=2.0)
+    ap.add_argument("--preset", default="medium")
+    ap.add_argument("--workers", default=None, help="lista separada por vírgulas (por omissão 1,2,4,…,nº CPUs)")
+    args = ap.parse_args()
+
+    rec = load_recorder()
+    if not rec.has_ffmpeg():
+        sys.exit("ffmpeg não encontrado no PATH")
+    w, h = (int(v) for v in args.size.split("x"))
+    if args.workers:
+        counts = [int(v) for v in args.workers.split(",")]
+    else:
+        cpus = os.cpu_count() or 1
+        counts = sorted({1, cpus} | {2 ** k for k in range(1, cpus.bit_length()) if 2 ** k <= cpus})
+
+    print(f"{w}x{h} @ {args.fps} fps, {args.seconds:g} s, segmentos de {args.segment:g} s, preset {args.preset}")
+    base = None
+    for n in counts:
+        elapsed = run(rec, w, h, args.fps, args.seconds, args.segment, n, args.preset)
+        base = base or elapsed
+        print(f"workers={n:3d}  {elapsed:7.2f} s  {args.seconds / elapsed:5.2f}x tempo real  speedup {base / elapsed:4.2f}")
+
+
+if __name__ == '__main__':
+    main()
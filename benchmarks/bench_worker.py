@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: gravação no processo da GUI (RecorderThread) vs num worker (RecorderProcess).
+
+Simula a thread da GUI sem Qt: um ciclo a --ui-hz que, a cada tick, lê a
+pré-visualização como o RecorderApp._update_preview (cópia do último
+frame + conversão de cor, o equivalente ao QImage → QPixmap) e gasta
+--ui-work ms em Python (layout, sinais, pintura). Mede, com e sem worker:
+  - frame time da GUI: intervalo entre ticks (p50/p95/p99/máx) e % de
+    ticks atrasados (> 1,5× o intervalo pedido), que é o que se vê como
+    solavancos na janela;
+  - latência captura → escrito do gravador (p50/p95);
+  - fps escritos e CPU total (este processo + filhos: worker e ffmpeg).
+A medição começa no primeiro frame da pré-visualização, para o arranque
+do worker (spawn + imports) não contar. Fonte: ecrã sintético (fakes.py).
+
+    python benchmarks/bench_worker.py --size 1920x1080 --fps 30 --seconds 5
+    python benchmarks/bench_worker.py --codec mp4v --ui-work 4 --out worker.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+import cv2  # noqa: E402
+
+import recorder_engine as engine  # noqa: E402
+import fakes  # noqa: E402
+from bench_pipeline import _percentile, _children_cpu  # noqa: E402
+
+
+def install_fake_screen(w: int, h: int):
+    """Fonte sintética no processo atual (também corre no worker, como initializer)."""
+    engine.mss = fakes.FakeMSS.sized(w, h)
+
+
+def _busy(seconds: float):
+    t_end = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < t_end:
+        n += 1  # trabalho Python puro: disputa o GIL como o código da GUI
+    return n
+
+
+def run(worker: bool, w: int, h: int, fps: int, seconds: float, codec: str, ui_hz: int, ui_work_ms: float) -> dict:
+    install_fake_screen(w, h)
+    use_ffmpeg = codec.startswith('ffmpeg')
+    out = os.path.join(tempfile.gettempdir(), f"qtrec_bench_worker_{os.getpid()}.mp4")
+    kwargs = dict(mode='screen', file_path=out, fps=fps, codec='mp4v' if use_ffmpeg else codec,
+                  encode_opts=engine.EncodeOptions(fragment_seconds=0.0, i420=codec.endswith('-i420'))
+                  if use_ffmpeg else None, preview_size=(480, 300), preview_fps=ui_hz)
+    if worker:
+        buf = engine.SharedFrameRing((300, 480, 3))
+        rec = engine.RecorderProcess(preview_buf=buf, initializer=install_fake_screen, initargs=(w, h), **kwargs)
+    else:
+        buf = engine.SafeFrameBuffer()
+        rec = engine.RecorderThread(preview_buf=buf, **kwargs)
+    cpu0, child0 = time.process_time(), _children_cpu()
+    rec.start()
+    t_wait = time.perf_counter() + 30
+    while buf.seq == 0 and rec.is_alive() and time.perf_counter() < t_wait:
+        time.sleep(0.01)
+
+    interval = 1.0 / ui_hz
+    frames0 = rec.frames_written
+    ticks: list[float] = []
+    shown = 0
+    seen = buf.seq
+    t0 = t_prev = time.perf_counter()
+    t_next = t0 + interval
+    while t_prev - t0 < seconds:
+        delay = t_next - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.perf_counter()
+        ticks.append(now - t_prev)
+        t_prev = now
+        t_next = max(t_next + interval, now)  # como um QTimer: não recupera ticks perdidos
+        if buf.seq != seen:
+            pf, seen = buf.get_with_seq()
+            if pf is not None:
+                cv2.cvtColor(pf.data, cv2.COLOR_BGR2RGB)
+                pf.release()
+                shown += 1
+        _busy(ui_work_ms / 1000.0)
+    window = time.perf_counter() - t0
+    frames = rec.frames_written - frames0
+    rec.stop()
+    rec.join()
+    cpu = time.process_time() - cpu0
+    child = _children_cpu()
+    if worker:
+        buf.close()
+    if os.path.exists(out):
+        os.remove(out)
+
+    ticks.sort()
+    lat = sorted(rec.latency)
+    return {
+        'mode': 'worker' if worker else 'thread',
+        'fps_written': frames / window,
+        'latency_ms': {k: 1000 * _percentile(lat, q) for k, q in (('p50', .5), ('p95', .95))},
+        'ui_frame_ms': {k: 1000 * _percentile(ticks, q) for k, q in (('p50', .5), ('p95', .95), ('p99', .99),
+                                                                      ('max', 1.0))},
+        'ui_late_pct': 100.0 * sum(t > 1.5 * interval for t in ticks) / max(1, len(ticks)),
+        'preview_shown': shown,
+        'cpu_s': cpu + ((child - child0) if child is not None else 0.0),
+        'error': getattr(rec, 'error', None),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--size", default="1920x1080")
+    ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--codec", default="ffmpeg" if engine.has_ffmpeg() else "mp4v",
+                    help="FourCC do OpenCV, ffmpeg ou ffmpeg-i420")
+    ap.add_argument("--ui-hz", type=int, default=60, help="ritmo do ciclo da GUI simulada")
+    ap.add_argument("--ui-work", type=float, default=2.0, help="ms de trabalho Python por tick da GUI")
+    ap.add_argument("--out", default=None, help="guardar os resultados em JSON")
+    args = ap.parse_args()
+    w, h = (int(v) for v in args.size.split("x"))
+
+    print(f"{args.size} @ {args.fps} fps, codec {args.codec}, GUI {args.ui_hz} Hz + {args.ui_work:g} ms/tick, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'modo':7s} {'fps':>6s} {'lat p50':>7s} {'lat p95':>7s} {'GUI p50':>7s} {'p95':>6s} {'p99':>6s} "
+          f"{'máx':>6s} {'atras.%':>7s} {'CPU s':>6s}")
+    results = []
+    for worker in (False, True):
+        r = run(worker, w, h, args.fps, args.seconds, args.codec, args.ui_hz, args.ui_work)
+        results.append(r)
+        if r['error']:
+            print(f"{r['mode']:7s} erro: {r['error']}")
+            continue
+        lat, ui = r['latency_ms'], r['ui_frame_ms']
+        print(f"{r['mode']:7s} {r['fps_written']:6.1f} {lat['p50']:7.1f} {lat['p95']:7.1f} {ui['p50']:7.1f} "
+              f"{ui['p95']:6.1f} {ui['p99']:6.1f} {ui['max']:6.1f} {r['ui_late_pct']:7.1f} {r['cpu_s']:6.2f}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'args': vars(args), 'cpu_count': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Fontes sintéticas para benchmarks: substitutos do `mss` e do `cv2.VideoCapture`.
+
+Permitem correr o RecorderThread sem ecrã nem câmara. Os frames são gerados
+uma vez (um pequeno ciclo com movimento) para o custo da fonte não contar
+como custo do pipeline.
+
+    import recorder_engine, fakes
+    recorder_engine.mss = fakes.FakeMSS.sized(1920, 1080)
+    fakes.install_fake_capture(recorder_engine, 1280, 720)   # ou video_path="clip.mp4"
+    fakes.install_fake_capture(recorder_engine, 1280, 720, motion=(8.0, 2.0))  # cena parada com movimento
+"""
+
+import time
+
+import numpy as np
+
+CYCLE = 8  # frames distintos por ciclo
+
+
+def synthetic_cycle(w: int, h: int, channels: int, n: int = CYCLE, seed: int = 0) -> list[np.ndarray]:
+    """Ruído fixo + uma barra que se desloca: todos os frames são diferentes entre si."""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 256, (h, w, channels), dtype=np.uint8)
+    frames = []
+    bar = max(8, w // 32)
+    for i in range(n):
+        f = base.copy()
+        x = (i * w // n) % max(1, w - bar)
+        f[:, x:x + bar] = 255
+        frames.append(f)
+    return frames
+
+
+class FakeShot:
+    """Imita mss.ScreenShot: `raw` (BGRA), `width`, `height`, `size`."""
+    __slots__ = ('raw', 'width', 'height', 'size')
+
+    def __init__(self, frame: np.ndarray):
+        self.raw = frame.data  # memoryview: np.frombuffer não copia
+        self.height, self.width = frame.shape[:2]
+        self.size = (self.width, self.height)
+
+
+class FakeMSS:
+    """Substituto do `mss.mss()` que devolve frames BGRA sintéticos do tamanho pedido.
+
+    `count` monitores de width x height lado a lado; monitors[0] é a união.
+    """
+    width, height = 1920, 1080
+    count = 1
+
+    def __init__(self, *args, **kwargs):
+        self.monitors = [{'left': 0, 'top': 0, 'width': self.width * self.count, 'height': self.height}]
+        self.monitors += [{'left': i * self.width, 'top': 0, 'width': self.width, 'height': self.height}
+                          for i in range(self.count)]
+        self._cycles: dict[tuple[int, int], list[np.ndarray]] = {}
+        self.grabs = 0
+
+    @classmethod
+    def sized(cls, width: int, height: int, count: int = 1) -> type:
+        """Subclasse com `count` monitores de width x height."""
+        return type(f"FakeMSS{count}x{width}x{height}", (cls,), {'width': width, 'height': height, 'count': count})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._cycles.clear()
+
+    def grab(self, monitor: dict) -> FakeShot:
+        key = (int(monitor['width']), int(monitor['height']))
+        if key not in self._cycles:
+            self._cycles[key] = synthetic_cycle(key[0], key[1], 4)
+        frames = self._cycles[key]
+        self.grabs += 1
+        return FakeShot(frames[self.grabs % len(frames)])
+
+
+class FakeVideoCapture:
+    """Substituto do `cv2.VideoCapture`: gerador sintético ou um ficheiro de vídeo em ciclo.
+
+    Como uma webcam USB, aceita FOURCC MJPG e, com CAP_PROP_CONVERT_RGB = 0,
+    devolve os JPEG (pré-codificados) em vez de frames BGR.
+    """
+    def __init__(self, index=0, *, width: int = 1280, height: int = 720, video_path: str | None = None,
+                 real_capture=None):
+        self._file = None
+        if video_path is not None:
+            self._file = real_capture(video_path)
+            width = int(self._file.get(3) or width)
+            height = int(self._file.get(4) or height)
+            self._frames = None
+        else:
+            self._frames = synthetic_cycle(width, height, 3)
+        self.width, self.height = width, height
+        self.reads = 0
+        self.fourcc = 0
+        self.convert_rgb = True
+        self._jpegs: list[np.ndarray] | None = None
+
+    def isOpened(self) -> bool:
+        return self._file.isOpened() if self._file is not None else True
+
+    def get(self, prop: int) -> float:
+        # 3 = CAP_PROP_FRAME_WIDTH, 4 = CAP_PROP_FRAME_HEIGHT, 5 = CAP_PROP_FPS, 6 = CAP_PROP_FOURCC
+        return {3: float(self.width), 4: float(self.height), 5: 30.0, 6: float(self.fourcc)}.get(prop, 0.0)
+
+    def set(self, prop: int, value) -> bool:
+        if prop == 6:
+            self.fourcc = int(value)
+            return True
+        if prop == 16:  # CAP_PROP_CONVERT_RGB
+            self.convert_rgb = bool(value)
+            return True
+        return False
+
+    def _mjpeg(self) -> bool:
+        return self._frames is not None and not self.convert_rgb and self.fourcc == 0x47504A4D  # 'MJPG'
+
+    def read(self, image: np.ndarray | None = None):
+        if self._mjpeg():
+            if self._jpegs is None:
+                import cv2
+                self._jpegs = [cv2.imencode('.jpg', f, [cv2.IMWRITE_JPEG_QUALITY, 85])[1] for f in self._frames]
+            buf = self._jpegs[self.reads % len(self._jpegs)]
+            self.reads += 1
+            return True, buf.reshape(1, -1).copy()
+        if self._file is not None:
+            ok, frame = self._file.read(image)
+            if not ok:
+                self._file.set(1, 0)  # CAP_PROP_POS_FRAMES: recomeçar o ficheiro
+                ok, frame = self._file.read(image)
+            self.reads += ok
+            return ok, frame
+        src = self._frames[self.reads % len(self._frames)]
+        self.reads += 1
+        if image is not None and image.shape == src.shape:
+            np.copyto(image, src)
+            return True, image
+        return True, src.copy()
+
+    def release(self):
+        if self._file is not None:
+            self._file.release()
+
+
+class ScriptedMotionCapture(FakeVideoCapture):
+    """Câmara de vigilância sintética: cena parada com ruído de sensor e, em ciclo, um objeto a mover-se.
+
+    `motion` = (s parado, s com movimento), a contar da primeira leitura;
+    (1, 0) é uma cena sempre parada. O ruído (±3 níveis) fica abaixo do
+    limiar por omissão do MotionDetector, como numa webcam real.
+    """
+    def __init__(self, index=0, *, width: int = 1280, height: int = 720, motion: tuple[float, float] = (8.0, 2.0),
+                 **kwargs):
+        super().__init__(index, width=width, height=height)
+        rng = np.random.default_rng(1)
+        base = np.repeat(np.linspace(40, 200, width, dtype=np.float32)[None, :], height, axis=0)
+        base = np.dstack([base, base[::-1, ::-1] * 0.8, np.full_like(base, 90)])
+        self._still = [np.clip(base + rng.normal(0, 1.5, base.shape), 0, 255).astype(np.uint8) for _ in range(4)]
+        self._moving = []
+        box = max(16, min(width, height) // 4)
+        for i in range(CYCLE):
+            f = self._still[i % 4].copy()
+            x = (i * width // CYCLE) % max(1, width - box)
+            f[height // 3:height // 3 + box, x:x + box] = 245
+            self._moving.append(f)
+        self._frames = self._still
+        self.idle_s, self.active_s = motion
+        self._t0: float | None = None
+
+    def read(self, image: np.ndarray | None = None):
+        now = time.perf_counter()
+        if self._t0 is None:
+            self._t0 = now
+        phase = (now - self._t0) % (self.idle_s + self.active_s)
+        self._frames = self._moving if phase >= self.idle_s else self._still
+        return super().read(image)
+
+
+def install_fake_capture(engine, width: int = 1280, height: int = 720, video_path: str | None = None,
+                         motion: tuple[float, float] | None = None):
+    """Substitui cv2.VideoCapture no módulo `engine` (processo do benchmark apenas)."""
+    real = engine.cv2.VideoCapture
+
+    def factory(index=0, *args):
+        if motion is not None:
+            return ScriptedMotionCapture(index, width=width, height=height, motion=motion)
+        return FakeVideoCapture(index, width=width, height=height, video_path=video_path, real_capture=real)
+
+    engine.cv2.VideoCapture = factory
+    return factory
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Gravador de ecrã/câmara sem GUI (linha de comandos).
+
+Exemplos:
+    python recorder_cli.py -o ecra.mp4 --duration 10
+    python recorder_cli.py --mode screen --region 0,0,1280,720 --fps 30 --audio -o regiao.mp4
+    python recorder_cli.py --mode window --window "Firefox" -d 30 -o janela.mkv
+    python recorder_cli.py --mode camera --camera 0 -o camara.mp4
+    python recorder_cli.py --mode camera --camera-size 1920x1080 --camera-passthrough -o camara.mkv
+    python recorder_cli.py --mode camera --motion --pre-roll 3 -o entrada.mp4   # entrada_evt001_….mp4 + entrada_events.jsonl
+    python recorder_cli.py --monitor 0 -o todos.mp4            # ambiente de trabalho virtual inteiro
+    python recorder_cli.py --each-monitor -o aula.mp4          # aula_mon1.mp4, aula_mon2.mp4, …
+    python recorder_cli.py --pip-camera 0 --pip-position top-right -o ecra_com_camara.mp4
+    python recorder_cli.py --fps 120 --spool 8192 -d 5 -o rajada.mp4   # frames crus em disco, codificados no fim
+    python recorder_cli.py --worker --fps 60 -o ecra.mp4    # captura/codificação num processo à parte
+    python recorder_cli.py --from-spool /tmp/qtrec_spool_1700000000.qtspool --trim 1.5,4 -o corte.mp4
+
+Sem --duration grava até Ctrl+C. Os argumentos são validados antes de
+carregar o motor (numpy/OpenCV); PyQt6 e tkinter nunca são importados e o
+mss/sounddevice/pygetwindow só quando o modo escolhido precisa deles.
+Custo de arranque: python benchmarks/bench_coldstart.py
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from dataclasses import replace
+
+_T_PROCESS = time.perf_counter()
+
+
+def _parse_region(text: str) -> tuple[int, int, int, int]:
+    try:
+        left, top, width, height = (int(v) for v in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("formato esperado: X,Y,LARGURA,ALTURA")
+    if width < 10 or height < 10:
+        raise argparse.ArgumentTypeError("região demasiado pequena")
+    return left, top, width, height
+
+
+def _parse_trim(text: str) -> tuple[float, float | None]:
+    try:
+        start, _, end = text.partition(",")
+        return float(start or 0), float(end) if end else None
+    except ValueError:
+        raise argparse.ArgumentTypeError("formato esperado: INÍCIO,FIM em segundos (FIM opcional)")
+
+
+def _parse_size(text: str) -> tuple[int, int]:
+    try:
+        w, h = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("formato esperado: LARGURAxALTURA")
+    return w, h
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-o", "--output", default=None, help="ficheiro de saída (por omissão gravacao_<data>.mp4)")
+    ap.add_argument("-m", "--mode", choices=("screen", "window", "camera"), default="screen")
+    ap.add_argument("--region", type=_parse_region, default=None, help="X,Y,LARGURA,ALTURA (modo screen)")
+    ap.add_argument("--monitor", type=int, default=1, help="monitor a gravar sem --region (0 = todos, ambiente virtual)")
+    ap.add_argument("--each-monitor", action="store_true",
+                    help="um ficheiro por monitor (<saída>_monN), capturados e codificados em paralelo")
+    ap.add_argument("--window", default=None, help="parte do título da janela (modo window)")
+    ap.add_argument("--track-interval", type=float, default=0.25, metavar="S",
+                    help="segundos entre consultas à posição da janela (modo window; 0 = posição fixa)")
+    ap.add_argument("--camera", type=int, default=0, help="índice da câmara (modo camera)")
+    ap.add_argument("--camera-format", default="MJPG", help="FOURCC pedido à câmara (MJPG, YUYV, auto)")
+    ap.add_argument("--camera-size", type=_parse_size, default=None, help="resolução pedida à câmara (LARGURAxALTURA)")
+    ap.add_argument("--camera-passthrough", action="store_true",
+                    help="copiar o MJPEG da câmara para o ficheiro sem descodificar/recodificar (precisa do ffmpeg)")
+    ap.add_argument("--motion", action="store_true",
+                    help="modo camera: gravar só com movimento, um ficheiro por evento + índice <saída>_events.jsonl")
+    ap.add_argument("--motion-threshold", type=int, default=25, metavar="N",
+                    help="diferença de luminância (0–255) para um píxel contar como em movimento")
+    ap.add_argument("--motion-area", type=float, default=0.5, metavar="PCT",
+                    help="percentagem mínima da imagem em movimento para abrir um evento")
+    ap.add_argument("--pre-roll", type=float, default=2.0, metavar="S", help="segundos guardados antes do movimento")
+    ap.add_argument("--post-roll", type=float, default=3.0, metavar="S",
+                    help="segundos gravados depois do último movimento")
+    ap.add_argument("--pip-camera", type=int, default=None, metavar="N",
+                    help="sobrepor a câmara N ao ecrã/janela (picture-in-picture)")
+    ap.add_argument("--pip-position", choices=("bottom-right", "bottom-left", "top-right", "top-left"), default="bottom-right")
+    ap.add_argument("--pip-scale", type=float, default=0.25, help="largura da câmara relativa à saída")
+    ap.add_argument("--fps", type=int, default=20)
+    ap.add_argument("-d", "--duration", type=float, default=0.0, help="segundos a gravar (0 = até Ctrl+C)")
+    ap.add_argument("--size", type=_parse_size, default=None, help="redimensionar para LARGURAxALTURA")
+    ap.add_argument("--codec", default="mp4v", help="FourCC do OpenCV quando não há ffmpeg")
+    ap.add_argument("--bitrate", type=int, default=6000, help="kbps (ffmpeg)")
+    ap.add_argument("--preset", default="veryfast", help="preset do libx264")
+    ap.add_argument("--i420", action="store_true",
+                    help="converter para I420 logo na captura: metade dos bytes por frame até ao ffmpeg")
+    ap.add_argument("--vfr", action="store_true", help="frame rate variável: o ffmpeg descarta as repetições (pts reais no contentor) + ficheiro de instantes")
+    ap.add_argument("--adaptive", action="store_true",
+                    help="baixar fps/resolução de captura enquanto o pipeline não acompanhar o tempo real")
+    ap.add_argument("--no-damage", action="store_true", help="converter também frames iguais ao anterior")
+    ap.add_argument("--spool", type=int, default=0, metavar="MB",
+                    help="gravar frames crus num spool em disco de até MB (alta cadência) e codificar no fim")
+    ap.add_argument("--worker", action="store_true",
+                    help="captura e codificação num processo à parte (fora do GIL deste processo)")
+    ap.add_argument("--from-spool", default=None, metavar="SPOOL",
+                    help="não gravar: codificar um .qtspool existente para --output")
+    ap.add_argument("--trim", type=_parse_trim, default=(0.0, None), metavar="INÍCIO,FIM",
+                    help="com --from-spool: só o troço entre INÍCIO e FIM (s)")
+    ap.add_argument("--fragment", type=float, default=2.0, help="segundos por fragmento MP4/MKV (0 = desligado)")
+    ap.add_argument("--no-ffmpeg", action="store_true", help="usar só o OpenCV VideoWriter")
+    ap.add_argument("--audio", action="store_true", help="gravar o microfone (sounddevice + soundfile)")
+    ap.add_argument("--audio-rate", type=int, default=48000)
+    ap.add_argument("--audio-channels", type=int, choices=(1, 2), default=1)
+    ap.add_argument("--audio-device", type=int, default=None)
+    ap.add_argument("--telemetry", action="store_true", help="histogramas por etapa em <saída>.telemetry.jsonl")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    return ap
+
+
+def _find_window(engine, title: str):
+    gw = engine.window_backend()
+    if gw is None:
+        raise SystemExit("pygetwindow não está disponível: use --mode screen --region X,Y,L,A")
+    for w in gw.getAllWindows():
+        if title.lower() in (w.title or "").lower() and engine.window_geometry(w) is not None:
+            return w
+    raise SystemExit(f"Nenhuma janela visível com '{title}' no título.")
+
+
+def transcode(args) -> int:
+    import recorder_engine as engine
+    path = args.output or os.path.splitext(os.path.basename(args.from_spool))[0] + ".mp4"
+    opts = None
+    if not args.no_ffmpeg and engine.has_ffmpeg():
+        opts = engine.EncodeOptions(bitrate_kbps=args.bitrate, preset=args.preset, fragment_seconds=args.fragment)
+    start, end = args.trim
+    try:
+        engine.transcode_spool(args.from_spool, path, opts, codec=args.codec, start=start, end=end)
+    except (RuntimeError, ValueError, OSError) as e:
+        engine.log.error("Não foi possível codificar o spool: %s", e)
+        return 1
+    print(path)
+    return 0
+
+
+def record(args) -> int:
+    import recorder_engine as engine
+    log = engine.log
+    log.info("Motor carregado em %.0f ms desde o arranque do processo", 1000 * (time.perf_counter() - _T_PROCESS))
+
+    path = args.output or f"gravacao_{time.strftime('%Y%m%d-%H%M%S')}.mp4"
+    monitor = args.monitor
+    split_monitors = []
+    if args.each_monitor:
+        if args.mode != "screen" or args.region is not None:
+            raise SystemExit("--each-monitor só funciona com --mode screen e sem --region")
+        split_monitors = list(range(2, len(engine.list_monitors())))
+        base_path, path, monitor = path, engine.monitor_stream_path(path, 1), 1
+    region = window = None
+    if args.mode == "window":
+        if not args.window:
+            raise SystemExit("--mode window precisa de --window TÍTULO")
+        window = _find_window(engine, args.window)
+        region = engine.window_geometry(window)
+    elif args.region is not None:
+        region = engine.CaptureRegion(*args.region)
+
+    motion = None
+    if args.motion:
+        if args.mode != "camera":
+            raise SystemExit("--motion só funciona com --mode camera")
+        motion = engine.MotionOptions(threshold=args.motion_threshold, min_area=args.motion_area / 100.0,
+                                      pre_roll=args.pre_roll, post_roll=args.post_roll)
+
+    want_audio = args.audio
+    if want_audio and motion is not None:
+        log.warning("--motion: os eventos são gravados sem áudio")
+        want_audio = False
+    if want_audio and engine.audio_backend() is None:
+        log.warning("sounddevice/soundfile não disponíveis: a gravar sem áudio")
+        want_audio = False
+
+    # ffmpeg em direto (mesma lógica da GUI): áudio por pipe em POSIX, WAV + mux nos restantes
+    encode_opts = None
+    audio_pipe_w = None
+    if not args.no_ffmpeg and engine.has_ffmpeg():
+        encode_opts = engine.EncodeOptions(bitrate_kbps=args.bitrate, preset=args.preset,
+                                           fragment_seconds=args.fragment, i420=args.i420)
+        if want_audio and os.name == 'posix' and args.spool <= 0 and not args.worker:
+            encode_opts.audio_fd, audio_pipe_w = os.pipe()
+            encode_opts.audio_rate = args.audio_rate
+            encode_opts.audio_channels = args.audio_channels
+    spool_path = None
+    if motion is not None:
+        # cada evento é escrito diretamente em <saída>_evtNNN_*; o resultado é o índice
+        if args.spool > 0:
+            log.warning("--motion: --spool ignorado")
+        video_path, temp_video_path = path, None
+        path = engine.motion_index_path(path)
+    elif args.spool > 0:
+        # frames crus em disco; codificados depois de parar (para um temporário se houver áudio a juntar)
+        video_path = spool_path = engine.temp_media_path("qtrec_spool", ".qtspool")
+        temp_video_path = os.path.splitext(spool_path)[0] + (os.path.splitext(path)[1] or '.mp4') if want_audio else None
+    elif encode_opts is not None and (not want_audio or audio_pipe_w is not None):
+        video_path, temp_video_path = path, None
+    else:
+        ext = os.path.splitext(path)[1] or '.mp4'
+        video_path = temp_video_path = engine.temp_media_path("qtrec_video", ext)
+
+    overlays = None
+    if args.pip_camera is not None and args.mode != "camera":
+        overlays = [engine.OverlaySpec(camera_index=args.pip_camera, position=args.pip_position,
+                                       scale=args.pip_scale, fps=args.fps)]
+    cam_w, cam_h = args.camera_size or (0, 0)
+    camera_format = engine.CameraFormat(fourcc='' if args.camera_format.lower() == 'auto' else args.camera_format,
+                                        width=cam_w, height=cam_h, fps=args.fps)
+    av_sync = engine.AVSync()
+    telemetry = engine.Telemetry() if args.telemetry else None
+    rec_kwargs = dict(
+        mode=args.mode, file_path=video_path, fps=args.fps, camera_index=args.camera,
+        region=region, codec=args.codec, out_size=args.size, encode_opts=encode_opts,
+        vfr=args.vfr, skip_unchanged=not args.no_damage, adaptive=args.adaptive, av_sync=av_sync, telemetry=telemetry,
+        overlays=overlays, monitor=monitor, track_interval=args.track_interval,
+        camera_format=camera_format, camera_passthrough=args.camera_passthrough,
+        spool_mb=args.spool if motion is None else 0, motion=motion,
+    )
+    if args.worker:
+        if window is not None:
+            log.warning("--worker: a janela é gravada na posição inicial (sem seguimento)")
+        rec = engine.RecorderProcess(**rec_kwargs)
+    else:
+        rec = engine.RecorderThread(window=window, **rec_kwargs)
+    # restantes monitores: stream próprio, sem áudio, escrito diretamente no destino
+    extra = [engine.RecorderThread(mode="screen", file_path=engine.monitor_stream_path(base_path, idx), fps=args.fps,
+                                   codec=args.codec, out_size=args.size, vfr=args.vfr,
+                                   encode_opts=replace(encode_opts, audio_fd=None) if encode_opts is not None else None,
+                                   skip_unchanged=not args.no_damage, adaptive=args.adaptive, monitor=idx,
+                                   telemetry=engine.Telemetry() if args.telemetry else None)
+             for idx in split_monitors]
+    audio = None
+    if want_audio:
+        audio = engine.AudioRecorder(samplerate=args.audio_rate, channels=args.audio_channels,
+                                     device=args.audio_device, pcm_fd=audio_pipe_w, av_sync=av_sync)
+        if telemetry is not None:
+            telemetry.add_counters(audio.stats)
+
+    rec.start()
+    for t in extra:
+        t.start()
+    if audio is not None:
+        audio.start()
+    log.info("A gravar %s → %s (Ctrl+C para parar)", args.mode, path)
+    t_end = time.perf_counter() + args.duration if args.duration > 0 else None
+    try:
+        while rec.is_alive() and (t_end is None or time.perf_counter() < t_end):
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    rec.stop()
+    for t in extra:
+        t.stop()
+    if audio is not None:
+        audio.stop()
+    rec.join()
+    for t in extra:
+        t.join()
+    if audio is not None:
+        audio.join(timeout=5)
+
+    if audio is not None:
+        report = av_sync.report()
+        if report is not None:
+            log.info("Sincronização A/V: %s", report)
+    if spool_path is not None:
+        log.info("A codificar o spool %s…", spool_path)
+        try:
+            engine.transcode_spool(spool_path, temp_video_path or path, encode_opts, codec=args.codec)
+            os.remove(spool_path)
+        except (RuntimeError, ValueError, OSError) as e:
+            log.error("Não foi possível codificar o spool (mantido em %s): %s", spool_path, e)
+    if temp_video_path is not None:
+        mux_wav = audio.wav_path if audio is not None else None
+        try:
+            engine.mux_or_copy(temp_video_path, path, mux_wav, video_encoded=encode_opts is not None,
+                               bitrate_kbps=args.bitrate, av_sync=av_sync, video_codec=args.codec)
+        except (RuntimeError, OSError) as e:
+            log.error("Não foi possível finalizar (temporários mantidos em %s): %s", tempfile.gettempdir(), e)
+    if telemetry is not None:
+        for name, h in telemetry.totals.items():
+            if h.n:
+                log.info("%-8s p50 %.1f ms, p95 %.1f ms, p99 %.1f ms, máx %.1f ms",
+                         name, h.percentile(.5), h.percentile(.95), h.percentile(.99), h.max_ms)
+        # com --worker os contadores do áudio (deste processo) não chegam ao JSON-lines do worker
+        counters = telemetry.counters()
+        if counters:
+            log.info("Contadores: %s", ", ".join(f"{k}={v}" for k, v in counters.items()))
+    if not os.path.exists(path):
+        log.error("A gravação falhou: %s não foi criado", path)
+        return 1
+    if motion is not None:
+        log.info("%d evento(s) de movimento", rec.status()['motion']['events'])
+    print(path)
+    for t in extra:
+        print(t.file_path)
+    return 0
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+    return transcode(args) if args.from_spool else record(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
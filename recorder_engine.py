@@ -0,0 +1,3817 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de gravação sem GUI (ecrã/janela/região/câmara + microfone).
+
+Usado pelo Qt-Screen-Recorder.py e pela linha de comandos (recorder_cli.py);
+não importa PyQt6 nem tkinter. Os módulos opcionais pesados (mss,
+sounddevice/soundfile, pygetwindow) só são importados quando são usados.
+
+Dependências:
+    pip install opencv-python numpy mss
+    # opcionais: sounddevice soundfile (áudio), pygetwindow (janelas); ffmpeg no PATH
+"""
+
+import os
+import sys
+import errno
+import json
+import mmap
+import struct
+import time
+import logging
+import queue
+import threading
+import shutil
+import tempfile
+import subprocess
+import importlib
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, replace
+from fractions import Fraction
+from typing import Optional, Tuple
+
+import numpy as np
+import cv2
+
+log = logging.getLogger("qtrec")
+
+# Módulos opcionais: importados só no primeiro uso (o arranque da CLI não paga por eles)
+_optional_modules: dict[str, object | None] = {}
+
+
+def _optional_import(name: str):
+    """Importa `name` uma única vez; devolve None se não estiver disponível."""
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except Exception:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+
+def audio_backend():
+    """(sounddevice, soundfile) ou None se o áudio não estiver disponível."""
+    sd, sf = _optional_import("sounddevice"), _optional_import("soundfile")
+    return (sd, sf) if sd is not None and sf is not None else None
+
+
+def window_backend():
+    """Módulo pygetwindow ou None (enumeração de janelas é best-effort)."""
+    return _optional_import("pygetwindow")
+
+
+# Captura de ecrã: fábrica mss importada no primeiro uso (substituível em testes/benchmarks)
+mss = None
+
+
+def _screen_grabber():
+    global mss
+    if mss is None:
+        from mss import mss as _mss
+        mss = _mss
+    return mss()
+
+
+# Políticas de descarte da fila entre captura e codificação
+DROP_POLICIES = ('drop-oldest', 'drop-newest', 'block')
+
+# FourCC do OpenCV VideoWriter oferecidos na GUI (disponibilidade varia com a build)
+VIDEO_CODECS = ('mp4v', 'XVID', 'MJPG', 'H264')
+
+
+@dataclass
+class CaptureRegion:
+    left: int
+    top: int
+    width: int
+    height: int
+
+
+@dataclass
+class EncodeOptions:
+    """Parâmetros do backend ffmpeg (frames crus enviados por pipe para o encoder)."""
+    bitrate_kbps: int = 6000
+    preset: str = 'veryfast'
+    pix_fmt: str = 'yuv420p'
+    vcodec: str = 'libx264'
+    # extremidade de leitura de um pipe com PCM s16le do microfone (mux em direto)
+    audio_fd: Optional[int] = None
+    audio_rate: int = 48000
+    audio_channels: int = 1
+    # >0 → segmentos de N segundos codificados em paralelo (SegmentedEncoder)
+    segment_seconds: float = 0.0
+    workers: int = 0  # 0 → nº de CPUs
+    # >0 → contentor fragmentado (fMP4/MKV) com um fragmento autónomo a cada N segundos
+    fragment_seconds: float = 0.0
+    # frames convertidos para I420 (yuv420p, 12 bits/píxel) logo na captura: metade dos bytes até ao ffmpeg
+    i420: bool = False
+
+
+# Cantos possíveis para uma sobreposição picture-in-picture
+PIP_POSITIONS = ('bottom-right', 'bottom-left', 'top-right', 'top-left')
+
+
+@dataclass
+class OverlaySpec:
+    """Câmara sobreposta ao ecrã (picture-in-picture), capturada em paralelo ao seu ritmo."""
+    camera_index: int = 0
+    position: str = 'bottom-right'
+    scale: float = 0.25   # largura relativa à largura de saída
+    margin: int = 16
+    fps: int = 30
+
+
+@dataclass
+class CameraFormat:
+    """Formato pedido à câmara (0/'' = o que o driver escolher por omissão)."""
+    fourcc: str = 'MJPG'   # 'MJPG' comprimido na câmara; 'YUYV' cru (limitado pela largura de banda USB)
+    width: int = 0
+    height: int = 0
+    fps: int = 0
+    buffer_size: int = 1   # poucos buffers no driver → frames mais recentes, menos latência
+
+
+@dataclass
+class MotionOptions:
+    """Gravação da câmara só com movimento: um ficheiro por evento, com pre-roll e post-roll."""
+    threshold: int = 25      # diferença de luminância (0–255) para um píxel contar como ativo
+    min_area: float = 0.005  # fração mínima de píxeis ativos para haver movimento
+    pre_roll: float = 2.0    # s antes do movimento (anel de frames em memória)
+    post_roll: float = 3.0   # s depois do último movimento
+    step: int = 8            # redução do frame antes da comparação
+    check_fps: float = 10.0  # comparações por segundo (em repouso é o único trabalho além da leitura)
+    max_mb: int = 256        # limite de memória do anel de pre-roll (frames BGR à resolução da câmara)
+
+
+def list_monitors() -> list[dict]:
+    """Monitores do mss: [0] é o ambiente de trabalho virtual inteiro, [1..] cada monitor."""
+    with _screen_grabber() as sct:
+        return [dict(m) for m in sct.monitors]
+
+
+def monitor_region(sct, index: int) -> CaptureRegion:
+    monitors = sct.monitors
+    if not 0 <= index < len(monitors):
+        raise RuntimeError(f"O monitor {index} não existe (há {len(monitors) - 1}).")
+    mon = monitors[index]
+    return CaptureRegion(mon['left'], mon['top'], mon['width'], mon['height'])
+
+
+def monitor_stream_path(path: str, index: int) -> str:
+    """Ficheiro de um stream por monitor: <base>_mon<N><ext>."""
+    base, ext = os.path.splitext(path)
+    return f"{base}_mon{index}{ext or '.mp4'}"
+
+
+def motion_event_path(path: str, index: int, t_wall: float | None = None) -> str:
+    """Ficheiro de um evento de movimento: <base>_evt<NNN>_<data-hora><ext>."""
+    base, ext = os.path.splitext(path)
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(t_wall))
+    return f"{base}_evt{index:03d}_{stamp}{ext or '.mp4'}"
+
+
+def motion_index_path(path: str) -> str:
+    """Índice JSON-lines dos eventos de movimento gravados com a saída `path`."""
+    return os.path.splitext(path)[0] + "_events.jsonl"
+
+
+def has_ffmpeg() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+def _ffmpeg_video_args(opts: EncodeOptions) -> list[str]:
+    return ["-c:v", opts.vcodec, "-preset", opts.preset, "-b:v", f"{opts.bitrate_kbps}k", "-pix_fmt", opts.pix_fmt]
+
+
+def _ffmpeg_raw_input(w: int, h: int, fps: float, opts: EncodeOptions, src: str) -> list[str]:
+    """Entrada rawvideo do ffmpeg: BGR24, ou I420 já convertido na captura."""
+    pix_fmt = 'yuv420p' if opts.i420 else 'bgr24'
+    return ["-f", "rawvideo", "-pix_fmt", pix_fmt, "-s", f"{w}x{h}", "-r", f"{fps}", "-i", src]
+
+
+def _check_raw_frame(frame: np.ndarray, size: tuple[int, int], i420: bool):
+    """Um frame I420 é um plano (h*3/2, w): Y seguido de U e V a meia resolução."""
+    w, h = size
+    expected = (h * 3 // 2, w) if i420 else (h, w, 3)
+    if frame.shape != expected:
+        raise ValueError(f"Frame {frame.shape} ≠ {expected} ({w}x{h} {'I420' if i420 else 'BGR'})")
+
+
+def _ffmpeg_fragment_args(path: str, seconds: float) -> list[str]:
+    """Saída fragmentada: o ficheiro em disco é reproduzível até ao último fragmento escrito."""
+    if seconds <= 0:
+        return []
+    # keyframe no início de cada fragmento, e escrita imediata de cada pacote para o disco
+    args = ["-force_key_frames", f"expr:gte(t,n_forced*{seconds:g})", "-flush_packets", "1"]
+    if path.lower().endswith(('.mkv', '.webm')):
+        return args + ["-cluster_time_limit", str(int(seconds * 1000))]
+    return args + ["-movflags", "+frag_keyframe+empty_moov+default_base_moof", "-frag_duration", str(int(seconds * 1e6))]
+
+
+class PooledFrame:
+    """Buffer de um FramePool com contagem de referências (partilhado sem cópias)."""
+    __slots__ = ('data', '_pool', '_refs')
+
+    def __init__(self, data: np.ndarray, pool: 'FramePool'):
+        self.data = data
+        self._pool = pool
+        self._refs = 0
+
+    def retain(self) -> 'PooledFrame':
+        with self._pool._lock:
+            self._refs += 1
+        return self
+
+    def release(self):
+        with self._pool._lock:
+            self._refs -= 1
+            if self._refs == 0:
+                self._pool._free.append(self)
+
+
+class FramePool:
+    """Pool de buffers numpy pré-alocados e reutilizáveis.
+
+    A captura preenche um buffer livre, que passa por referência para a
+    pré-visualização e para o codificador; volta ao pool quando o último
+    utilizador faz release(). Se o pool esvaziar aloca-se um buffer extra
+    (contado em `misses`) em vez de bloquear a captura.
+    """
+    def __init__(self, shape: tuple, dtype=np.uint8, size: int = 8):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self._free = deque(PooledFrame(np.empty(self.shape, self.dtype), self) for _ in range(max(1, size)))
+        self.allocations = len(self._free)
+        self.acquired = 0
+        self.misses = 0
+
+    def acquire(self) -> PooledFrame:
+        with self._lock:
+            self.acquired += 1
+            if self._free:
+                frame = self._free.popleft()
+            else:
+                self.misses += 1
+                self.allocations += 1
+                frame = PooledFrame(np.empty(self.shape, self.dtype), self)
+            frame._refs = 1
+        return frame
+
+    def stats(self) -> dict:
+        with self._lock:
+            free = len(self._free)
+        return {
+            'shape': self.shape,
+            'allocations': self.allocations,
+            'acquired': self.acquired,
+            'misses': self.misses,
+            'in_use': self.allocations - free,
+            'bytes': self.allocations * int(np.prod(self.shape)) * self.dtype.itemsize,
+        }
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Pico de memória residente do processo (None se não for possível medir)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return int(peak) if sys.platform == 'darwin' else int(peak) * 1024
+    except Exception:
+        pass
+    try:
+        import psutil  # type: ignore
+        info = psutil.Process().memory_info()
+        return int(getattr(info, 'peak_wset', info.rss))
+    except Exception:
+        return None
+
+
+class SafeFrameBuffer:
+    """Thread-safe último frame capturado (PooledFrame BGR, partilhado por referência)."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None  # type: Optional[PooledFrame]
+        self.seq = 0  # incrementa a cada set(): permite ao leitor saltar frames já mostrados
+
+    def set(self, frame: PooledFrame):
+        frame.retain()
+        with self._lock:
+            old, self._frame = self._frame, frame
+            self.seq += 1
+        if old is not None:
+            old.release()
+
+    def get(self) -> Optional[PooledFrame]:
+        """Devolve o último frame com uma referência extra; o chamador faz release()."""
+        with self._lock:
+            return None if self._frame is None else self._frame.retain()
+
+    def get_with_seq(self) -> tuple[Optional[PooledFrame], int]:
+        """Como get(), mas devolve também o seq desse mesmo frame."""
+        with self._lock:
+            return (None if self._frame is None else self._frame.retain()), self.seq
+
+    def clear(self):
+        with self._lock:
+            old, self._frame = self._frame, None
+        if old is not None:
+            old.release()
+
+
+class StageStats:
+    """Throughput de uma etapa do pipeline (frames processados e tempo ocupado)."""
+    def __init__(self, name: str):
+        self.name = name
+        self.frames = 0
+        self.busy = 0.0
+        self._t_first: float | None = None
+        self._t_last: float | None = None
+
+    def add(self, dt: float):
+        now = time.perf_counter()
+        if self._t_first is None:
+            self._t_first = now - dt
+        self._t_last = now
+        self.frames += 1
+        self.busy += dt
+
+    def snapshot(self) -> dict:
+        wall = (self._t_last - self._t_first) if self.frames else 0.0
+        return {
+            'frames': self.frames,
+            'fps': (self.frames / wall) if wall > 0 else 0.0,
+            'avg_ms': (1000.0 * self.busy / self.frames) if self.frames else 0.0,
+            'load': (self.busy / wall) if wall > 0 else 0.0,
+        }
+
+
+class Histogram:
+    """Histograma de tempos com baldes logarítmicos fixos (sem alocações em add())."""
+    EDGES_MS = tuple(0.05 * 2 ** (k / 2) for k in range(32))  # 0.05 ms … ~2 s, √2 entre baldes
+
+    def __init__(self):
+        self.counts = [0] * (len(self.EDGES_MS) + 1)
+        self.n = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, dt: float):
+        ms = 1000.0 * dt
+        self.counts[bisect_right(self.EDGES_MS, ms)] += 1
+        self.n += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def merge(self, other: "Histogram"):
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.n += other.n
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def percentile(self, q: float) -> float:
+        """Limite superior do balde que contém o quantil q (ms)."""
+        if not self.n:
+            return 0.0
+        rank = q * self.n
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= rank and c:
+                return min(self.EDGES_MS[i], self.max_ms) if i < len(self.EDGES_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self) -> dict:
+        return {
+            'n': self.n,
+            'mean_ms': round(self.total_ms / self.n, 3) if self.n else 0.0,
+            'p50_ms': round(self.percentile(0.50), 3),
+            'p95_ms': round(self.percentile(0.95), 3),
+            'p99_ms': round(self.percentile(0.99), 3),
+            'max_ms': round(self.max_ms, 3),
+        }
+
+
+class Telemetry:
+    """Histogramas por etapa do caminho quente e contadores do pipeline.
+
+    Cada etapa é escrita por uma só thread (captura ou codificação); sample()
+    troca os histogramas do intervalo por novos e acumula-os nos totais. Os
+    contadores vêm de funções registadas (gravador, áudio) lidas só na amostra.
+    Sem telemetria, o RecorderThread recebe None e não chama nada disto.
+    """
+    STAGES = ('grab', 'convert', 'resize', 'preview', 'write')
+
+    def __init__(self):
+        self._hist = {s: Histogram() for s in self.STAGES}
+        self.totals = {s: Histogram() for s in self.STAGES}
+        self._counters: list = []
+        self.t0 = time.perf_counter()
+        self.last: dict | None = None  # última amostra (lida pelo painel da GUI)
+
+    def add(self, stage: str, dt: float):
+        self._hist[stage].add(dt)
+
+    def add_counters(self, fn):
+        """Regista fn() → dict de contadores incluídos em cada amostra."""
+        self._counters.append(fn)
+
+    def counters(self) -> dict:
+        out = {}
+        for fn in self._counters:
+            try:
+                out.update(fn())
+            except Exception:
+                pass
+        return out
+
+    def sample(self) -> dict:
+        now = time.perf_counter()
+        stages = {}
+        for s in self.STAGES:
+            h, self._hist[s] = self._hist[s], Histogram()
+            self.totals[s].merge(h)
+            stages[s] = h.summary()
+        self.last = {'t': round(now - self.t0, 3), 'stages': stages, 'counters': self.counters()}
+        return self.last
+
+    def summary(self) -> dict:
+        return {'t': round(time.perf_counter() - self.t0, 3), 'summary': True,
+                'stages': {s: h.summary() for s, h in self.totals.items()}, 'counters': self.counters()}
+
+
+class TelemetryLogger(threading.Thread):
+    """Escreve uma amostra de Telemetry por intervalo num ficheiro JSON-lines; no fim, o resumo."""
+    def __init__(self, telemetry: Telemetry, path: str, interval: float = 1.0):
+        super().__init__(daemon=True, name="qtrec-telemetry")
+        self.telemetry = telemetry
+        self.path = path
+        self.interval = interval
+        self._done = threading.Event()
+
+    def stop(self):
+        self._done.set()
+
+    def run(self):
+        with open(self.path, 'w') as f:
+            while not self._done.wait(self.interval):
+                f.write(json.dumps(self.telemetry.sample()) + "\n")
+                f.flush()
+            f.write(json.dumps(self.telemetry.sample()) + "\n")
+            f.write(json.dumps(self.telemetry.summary()) + "\n")
+
+
+class FrameItem:
+    """Frame capturado a caminho do codificador, com a sua posição na linha temporal."""
+    __slots__ = ('frame', 'slot', 'count', 'ts')
+
+    def __init__(self, frame: PooledFrame | None, slot: int, count: int, ts: float):
+        self.frame = frame  # buffer do pool (a fila/encoder fazem release); None → repetir o anterior
+        self.slot = slot    # primeiro slot de saída (CFR) ou índice do frame (VFR)
+        self.count = count  # nº de slots que este frame ocupa (>1 → duplicados)
+        self.ts = ts        # instante de captura (perf_counter)
+
+    def release(self):
+        if self.frame is not None:
+            self.frame.release()
+
+
+class EncodedFrame:
+    """Frame já comprimido (JPEG da câmara) com a interface de PooledFrame usada pelo pipeline."""
+    __slots__ = ('data',)
+
+    def __init__(self, data: np.ndarray):
+        self.data = data  # bytes do frame (array uint8 1-D); não pertence a nenhum pool
+
+    def retain(self) -> 'EncodedFrame':
+        return self
+
+    def release(self):
+        pass
+
+
+class DamageDetector:
+    """Deteta se o ecrã mudou em relação ao último frame publicado.
+
+    A decisão é exata e barata: um único cv2.norm(NORM_INF) sobre o frame
+    inteiro (apanha até o cursor de texto de 1 px). Só nos frames alterados
+    se calcula o mapa de tiles alterados, numa versão reduzida do frame, para
+    as estatísticas. A referência é o próprio frame anterior (sem cópia), por
+    isso o chamador não pode reutilizar o buffer de um frame já verificado —
+    o mss devolve um buffer novo em cada grab.
+    """
+    def __init__(self, step: int = 4, tile: int = 64, threshold: int = 0):
+        self.step = max(1, int(step))
+        self.tile = max(self.step, int(tile))
+        self.threshold = int(threshold)
+        self._ref: np.ndarray | None = None
+        self._small: np.ndarray | None = None
+        self._small_ref: np.ndarray | None = None
+        self._diff: np.ndarray | None = None
+        self.checked = 0
+        self.unchanged = 0
+        self.changed_tiles = 0
+        self.last_rect: CaptureRegion | None = None  # bounding box da última alteração (px do frame)
+        self._changed_area = 0.0
+
+    def changed(self, frame: np.ndarray) -> bool:
+        self.checked += 1
+        h, w = frame.shape[:2]
+        if self._ref is None or self._ref.shape != frame.shape:
+            size = (max(1, w // self.step), max(1, h // self.step))
+            self._small = np.empty((size[1], size[0]) + frame.shape[2:], frame.dtype)
+            self._small_ref = np.empty_like(self._small)
+            self._diff = np.empty_like(self._small)
+            cv2.resize(frame, size, dst=self._small_ref, interpolation=cv2.INTER_NEAREST)
+            self._ref = frame
+            self.last_rect = CaptureRegion(0, 0, w, h)
+            self._changed_area += 1.0
+            return True
+        if cv2.norm(frame, self._ref, cv2.NORM_INF) <= self.threshold:
+            self.unchanged += 1
+            return False
+        self._ref = frame
+        small = self._small
+        cv2.resize(frame, (small.shape[1], small.shape[0]), dst=small, interpolation=cv2.INTER_NEAREST)
+        cv2.absdiff(small, self._small_ref, dst=self._diff)
+        self._small, self._small_ref = self._small_ref, small
+        mask = self._diff.max(axis=2) > self.threshold if self._diff.ndim == 3 else self._diff > self.threshold
+        ts = self.tile // self.step
+        tiles = np.logical_or.reduceat(mask, np.arange(0, mask.shape[0], ts), axis=0)
+        tiles = np.logical_or.reduceat(tiles, np.arange(0, mask.shape[1], ts), axis=1)
+        n = int(tiles.sum())
+        if n == 0:
+            # alteração mais fina do que a amostragem: sabe-se que mudou, mas não onde
+            self.last_rect = None
+            return True
+        self.changed_tiles += n
+        self._changed_area += n / tiles.size
+        rows = np.flatnonzero(tiles.any(axis=1))
+        cols = np.flatnonzero(tiles.any(axis=0))
+        top, left = int(rows[0]) * self.tile, int(cols[0]) * self.tile
+        bottom = min(h, (int(rows[-1]) + 1) * self.tile)
+        right = min(w, (int(cols[-1]) + 1) * self.tile)
+        self.last_rect = CaptureRegion(left, top, right - left, bottom - top)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            'checked': self.checked,
+            'unchanged': self.unchanged,
+            'unchanged_ratio': (self.unchanged / self.checked) if self.checked else 0.0,
+            'avg_changed_area': (self._changed_area / self.checked) if self.checked else 0.0,
+            'changed_tiles': self.changed_tiles,
+            'last_rect': None if self.last_rect is None else (self.last_rect.left, self.last_rect.top, self.last_rect.width, self.last_rect.height),
+        }
+
+
+class MotionDetector:
+    """Movimento por diferença de frames numa versão reduzida em cinzento.
+
+    O frame é reduzido `step` vezes com INTER_AREA (a média dos píxeis já
+    atenua o ruído do sensor) e comparado com uma referência que acompanha a
+    cena devagar (média móvel com peso `learn` por comparação): mudanças de
+    luz lentas entram na referência, um objeto a mexer-se não. Há movimento
+    quando a fração de píxeis com diferença > threshold chega a min_area.
+    Tudo corre num frame com 1/step² dos píxeis, sem alocações.
+    """
+    def __init__(self, threshold: int = 25, min_area: float = 0.005, step: int = 8, learn: float = 0.05):
+        self.threshold = int(threshold)
+        self.min_area = float(min_area)
+        self.step = max(1, int(step))
+        self.learn = learn
+        self._small: np.ndarray | None = None
+        self._gray: np.ndarray | None = None
+        self._bg: np.ndarray | None = None     # referência em float32
+        self._bg8: np.ndarray | None = None
+        self._diff: np.ndarray | None = None
+        self.area = 0.0   # fração de píxeis ativos na última comparação
+        self.checked = 0
+        self.active = 0
+
+    def update(self, frame: np.ndarray) -> bool:
+        """Compara um frame BGR/BGRA (ou o plano Y de um I420) com a referência e atualiza-a."""
+        if frame.ndim == 2:
+            frame = frame[:frame.shape[0] * 2 // 3]  # I420: só o plano Y
+        h, w = frame.shape[:2]
+        size = (max(1, w // self.step), max(1, h // self.step))
+        if self._gray is None or self._gray.shape != (size[1], size[0]):
+            self._small = np.empty((size[1], size[0]) + frame.shape[2:], np.uint8)
+            self._gray = np.empty((size[1], size[0]), np.uint8)
+            self._bg8 = np.empty_like(self._gray)
+            self._diff = np.empty_like(self._gray)
+            self._bg = None
+        cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        if frame.ndim == 3:
+            code = cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+            cv2.cvtColor(self._small, code, dst=self._gray)
+        else:
+            np.copyto(self._gray, self._small)
+        self.checked += 1
+        if self._bg is None:
+            self._bg = self._gray.astype(np.float32)
+            self.area = 0.0
+            return False
+        cv2.convertScaleAbs(self._bg, dst=self._bg8)
+        cv2.absdiff(self._gray, self._bg8, dst=self._diff)
+        cv2.threshold(self._diff, self.threshold, 255, cv2.THRESH_BINARY, dst=self._diff)
+        self.area = cv2.countNonZero(self._diff) / self._diff.size
+        cv2.accumulateWeighted(self._gray, self._bg, self.learn)
+        moving = self.area >= self.min_area
+        self.active += moving
+        return moving
+
+    def stats(self) -> dict:
+        return {'checked': self.checked, 'active': self.active, 'area': round(self.area, 4)}
+
+
+class FrameScheduler:
+    """Cadência por prazos absolutos: o prazo do frame n é t0 + n/fps.
+
+    Ao contrário de `sleep(intervalo - dt)`, um atraso não se propaga aos
+    frames seguintes. Em CFR cada captura ocupa o slot correspondente ao seu
+    instante: slots saltados são preenchidos com duplicados, de modo que a
+    duração do ficheiro coincide com o tempo real. Em VFR a linha temporal é
+    a mesma; quem descarta as repetições é o ffmpeg (FFmpegPipeWriter com
+    vfr), que mantém os pts dos frames restantes no contentor.
+    """
+    def __init__(self, fps: int, vfr: bool = False):
+        self.fps = max(1, int(fps))
+        self.interval = 1.0 / self.fps
+        self.vfr = vfr
+        self.t0: float | None = None
+        self.next_slot = 0      # próximo slot de saída livre
+        self.captured = 0
+        self.duplicated = 0     # slots preenchidos com repetição por a captura se atrasar
+        self.skipped = 0        # capturas descartadas por caírem num slot já ocupado
+        self.stride = 1         # capturar 1 slot em cada `stride` (controlo adaptativo); os restantes repetem
+        self.strided = 0        # slots repetidos de propósito por stride > 1
+        self._grid = 0          # índice do próximo prazo na grelha t0 + n/fps
+        self._t_last: float | None = None
+
+    def start(self):
+        self.t0 = time.perf_counter()
+
+    def wait(self):
+        """Dorme até ao próximo prazo absoluto (não dorme se já passou)."""
+        grid = self._grid
+        if self.stride > 1:
+            grid = -(-grid // self.stride) * self.stride
+        delay = self.t0 + grid * self.interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def skip(self, t: float):
+        """Captura que não ocupa slots (p.ex. câmara em repouso no modo movimento): avança só o prazo seguinte."""
+        self.captured += 1
+        self._t_last = t
+        self._grid = max(self._grid, int((t - self.t0) * self.fps) + 1)
+
+    def place(self, t: float) -> tuple[int, int]:
+        """Devolve (slot, nº de slots) para uma captura feita no instante t."""
+        self.captured += 1
+        self._t_last = t
+        k = int((t - self.t0) * self.fps)
+        self._grid = max(self._grid, k + 1)
+        count = k - self.next_slot + 1
+        if count <= 0:
+            self.skipped += 1
+            return k, 0
+        slot = self.next_slot
+        planned = min(count - 1, self.stride - 1)
+        self.strided += planned
+        self.duplicated += count - 1 - planned
+        self.next_slot = k + 1
+        return slot, count
+
+    def report(self) -> dict:
+        elapsed = (self._t_last - self.t0) if (self.t0 is not None and self._t_last is not None) else 0.0
+        return {
+            'mode': 'vfr' if self.vfr else 'cfr',
+            'target_fps': self.fps,
+            'capture_fps': (self.captured / elapsed) if elapsed > 0 else 0.0,
+            'captured': self.captured,
+            'duplicated': self.duplicated,
+            'skipped': self.skipped,
+            'strided': self.strided,
+        }
+
+
+class QualityController:
+    """Realimentação que troca resolução/fps de captura por manter o tempo real.
+
+    Uma vez por janela (1 s) mede a ocupação de cada etapa do pipeline:
+    tempo de processamento por frame a dividir pelo orçamento do frame, ou
+    seja tempo ocupado / tempo decorrido. Se uma etapa passar de `high`, ou
+    se houver frames descartados/atrasados, desce um degrau de LADDER. Só
+    sobe quando a ocupação prevista no degrau de cima fica abaixo de `high`
+    durante `up_windows` janelas seguidas; se uma subida tiver de ser
+    desfeita logo a seguir, a espera para voltar a subir duplica.
+    """
+    # (decimação da captura, divisor do fps): primeiro o fps (texto legível), depois a resolução
+    LADDER = ((1, 1), (1, 2), (2, 2), (2, 3), (2, 4))
+
+    def __init__(self, fps: int, *, scale: bool = True, window: float = 1.0, high: float = 0.85,
+                 up_windows: int = 3):
+        self.fps = max(1, int(fps))
+        self.levels = [lv for lv in self.LADDER if scale or lv[0] == 1]
+        self.level = 0
+        self.window = window
+        self.high = high
+        self.up_windows = self._base_up = up_windows
+        self.changes = 0
+        self.loads: dict[str, float] = {}
+        self._calm = 0
+        self._since_up: int | None = None   # janelas desde a última subida
+        self._t_next: float | None = None
+        self._last: tuple[float, dict[str, float], int] | None = None
+        self._warned = False
+
+    @property
+    def step(self) -> int:
+        return self.levels[self.level][0]
+
+    @property
+    def stride(self) -> int:
+        return self.levels[self.level][1]
+
+    def describe(self, level: int | None = None) -> str:
+        step, stride = self.levels[self.level if level is None else level]
+        return f"{100 // step}% da resolução, {self.fps / stride:.3g} fps"
+
+    def update(self, now: float, stages: dict[str, StageStats], lost: int) -> bool:
+        """Chamado no ciclo de captura (barato fora da fronteira da janela); True se o degrau mudou.
+
+        `lost` é o total acumulado de frames descartados ou capturados tarde.
+        """
+        if self._t_next is None:
+            self._t_next = now + self.window
+            self._last = (now, {n: st.busy for n, st in stages.items()}, lost)
+            return False
+        if now < self._t_next:
+            return False
+        t_prev, busy_prev, lost_prev = self._last
+        dt = now - t_prev
+        busy = {n: st.busy for n, st in stages.items()}
+        self.loads = {n: (busy[n] - busy_prev.get(n, 0.0)) / dt for n in busy}
+        self._last = (now, busy, lost)
+        self._t_next = now + self.window
+        load = max(self.loads.values(), default=0.0)
+        late = lost - lost_prev > max(1, 0.02 * self.fps * dt)
+        if self._since_up is not None:
+            self._since_up += 1
+        if (load > self.high or late) and self.level < len(self.levels) - 1:
+            if self._since_up is not None and self._since_up <= 2:
+                self.up_windows = min(8 * self._base_up, 2 * self.up_windows)  # subida falhada: histerese maior
+            self._since_up = None
+            reason = f"ocupação {load:.0%}" + (f", {lost - lost_prev} frames perdidos" if late else "")
+            return self._set(self.level + 1, reason)
+        if self.level == 0 or load > self.high or late:
+            if self.level > 0 and not self._warned:
+                # o degrau mais baixo não chega: o custo fixo (p.ex. codificar à resolução de saída) domina
+                self._warned = True
+                log.warning("Qualidade adaptativa no mínimo (%s) e o pipeline continua saturado (%s): "
+                            "reduza a resolução de saída ou use VFR", self.describe(),
+                            ", ".join(f"{n} {v:.0%}" for n, v in self.loads.items()))
+            self._calm = 0
+            return False
+        # previsão no degrau de cima: custo por frame ∝ píxeis, nº de frames ∝ 1/stride
+        step, stride = self.levels[self.level]
+        up_step, up_stride = self.levels[self.level - 1]
+        predicted = load * (stride / up_stride) * (step / up_step) ** 2
+        self._calm = self._calm + 1 if predicted < self.high else 0
+        if self._calm < self.up_windows:
+            return False
+        self._since_up = 0
+        return self._set(self.level - 1, f"ocupação {load:.0%}, prevista {predicted:.0%}")
+
+    def _set(self, level: int, reason: str) -> bool:
+        log.info("Qualidade adaptativa: %s → %s (%s)", self.describe(), self.describe(level), reason)
+        self.level = level
+        self.changes += 1
+        self._calm = 0
+        return True
+
+    def report(self) -> dict:
+        return {'level': self.level, 'quality': self.describe(), 'changes': self.changes,
+                'up_windows': self.up_windows, 'loads': {n: round(v, 3) for n, v in self.loads.items()}}
+
+
+class AVSync:
+    """Instantes de vídeo e áudio no mesmo relógio (perf_counter), para alinhar no mux.
+
+    O vídeo regista t0 (instante do slot 0) e o fim; o áudio regista o
+    instante ADC da primeira amostra e, a cada bloco do PortAudio, o
+    instante e o nº de amostras até aí. Daí saem o desvio inicial e a deriva
+    do relógio da placa de som face ao tempo real, corrigidos no ffmpeg.
+    """
+    def __init__(self):
+        self.video_t0: float | None = None
+        self.video_t_end: float | None = None
+        self.video_frames = 0
+        self.fps = 0
+        self.vfr = False
+        self.samplerate = 0
+        self.audio_t0: float | None = None
+        self.audio_t_last: float | None = None   # instante ADC do último bloco
+        self.audio_frames_last = 0               # amostras anteriores a esse bloco
+        self.audio_frames = 0                    # total de amostras entregues
+        self._video_started = threading.Event()
+
+    def video_started(self, t0: float, fps: int, vfr: bool):
+        self.video_t0, self.fps, self.vfr = t0, fps, vfr
+        self._video_started.set()
+
+    def wait_video(self, timeout: float | None = None) -> bool:
+        return self._video_started.wait(timeout)
+
+    def video_finished(self, t_end: float, frames: int):
+        self.video_t_end, self.video_frames = t_end, frames
+
+    def audio_block(self, t_adc: float, frames_before: int):
+        # chamado no callback de áudio: só atribuições
+        if self.audio_t0 is None:
+            self.audio_t0 = t_adc
+        self.audio_t_last = t_adc
+        self.audio_frames_last = frames_before
+
+    def report(self) -> dict | None:
+        if self.video_t0 is None or self.audio_t0 is None or not self.samplerate:
+            return None
+        r = {'start_offset_ms': 1000.0 * (self.audio_t0 - self.video_t0)}
+        wall_a = self.audio_t_last - self.audio_t0
+        if wall_a > 1.0 and self.audio_frames_last:
+            # taxa real da placa de som medida contra o relógio do sistema
+            real_rate = self.audio_frames_last / wall_a
+            r['audio_rate_hz'] = real_rate
+            r['audio_drift_ms'] = 1000.0 * (self.audio_frames / self.samplerate - self.audio_frames / real_rate)
+        if self.video_t_end is not None and self.video_frames:
+            wall_v = self.video_t_end - self.video_t0
+            r['video_drift_ms'] = 1000.0 * (self.video_frames / self.fps - wall_v)
+        r['tempo'] = self._tempo(r)
+        return r
+
+    def _tempo(self, r: dict) -> float:
+        """Fator atempo que põe a duração do áudio na linha temporal do vídeo."""
+        tempo = r.get('audio_rate_hz', self.samplerate) / self.samplerate
+        if self.video_t_end is not None and self.video_frames:
+            wall_v = self.video_t_end - self.video_t0
+            if wall_v > 0:
+                tempo *= wall_v / (self.video_frames / self.fps)
+        return tempo
+
+    def ffmpeg_audio_filter(self) -> str | None:
+        """Filtro de áudio do ffmpeg com o desvio inicial e a correção de deriva."""
+        r = self.report()
+        if r is None:
+            return None
+        filters = []
+        offset = r['start_offset_ms']
+        if offset > 1:
+            filters.append(f"adelay={offset:.0f}:all=1")
+        elif offset < -1:
+            filters.append(f"atrim=start={-offset / 1000.0:.4f},asetpts=PTS-STARTPTS")
+        tempo = r['tempo']
+        if abs(tempo - 1.0) > 1e-4 and 0.5 <= tempo <= 2.0:
+            filters.append(f"atempo={tempo:.6f}")
+        return ",".join(filters) or None
+
+
+class FrameQueue:
+    """Fila limitada entre captura e codificação, com política de descarte.
+
+    - 'drop-oldest': com a fila cheia descarta o frame mais antigo (captura nunca bloqueia)
+    - 'drop-newest': com a fila cheia descarta o frame acabado de capturar
+    - 'block': a captura espera até haver espaço (nenhum frame perdido)
+    """
+    def __init__(self, maxsize: int = 8, policy: str = 'drop-oldest', on_drop=None):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Política de descarte inválida: {policy}")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.on_drop = on_drop  # chamado com cada item descartado (ex.: devolver ao pool)
+        self.dropped = 0
+        self.max_depth = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def put(self, item) -> bool:
+        """Enfileira um item. Devolve False se foi o próprio item a ser descartado."""
+        evicted = None
+        with self._cond:
+            if self._closed:
+                accepted = False
+            elif len(self._items) >= self.maxsize and self.policy == 'drop-newest':
+                self.dropped += 1
+                accepted = False
+            else:
+                if len(self._items) >= self.maxsize:
+                    if self.policy == 'drop-oldest':
+                        evicted = self._items.popleft()
+                        self.dropped += 1
+                    else:
+                        while len(self._items) >= self.maxsize and not self._closed:
+                            self._cond.wait()
+                accepted = not self._closed
+                if accepted:
+                    self._items.append(item)
+                    self.max_depth = max(self.max_depth, len(self._items))
+                    self._cond.notify_all()
+        if self.on_drop is not None:
+            if evicted is not None:
+                self.on_drop(evicted)
+            if not accepted:
+                self.on_drop(item)
+        return accepted
+
+    def get(self):
+        """Retira o próximo item; devolve None quando a fila foi fechada e está vazia."""
+        with self._cond:
+            while not self._items and not self._closed:
+                self._cond.wait()
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class FFmpegPipeWriter:
+    """Envia frames crus (BGR, ou I420 com opts.i420) para o stdin de um processo ffmpeg.
+
+    Tem a mesma interface que o cv2.VideoWriter (write/release/isOpened), pelo
+    que o pipeline não distingue os dois backends. O ficheiro final fica pronto
+    quando release() termina: não há ficheiro temporário nem segundo encode.
+    Com vfr, as repetições da linha temporal (repeat(): slots repetidos,
+    ecrã sem alterações) continuam a ocupar o seu slot no pipe, mas o ffmpeg
+    descarta-as antes do encoder e os frames restantes ficam com os pts dos
+    seus slots: frame rate variável no contentor, sem perder a duração real.
+    """
+    def __init__(self, path: str, size_wh: tuple[int, int], fps: float, opts: EncodeOptions, *, vfr: bool = False):
+        w, h = size_wh
+        self.path = path
+        self.size = (int(w), int(h))
+        self.i420 = opts.i420
+        self.vfr = vfr
+        self.bytes_written = 0
+        self._hold: np.ndarray | None = None   # vfr: cópia do último slot, retida até se saber se é o final
+        self._holding = False
+        args = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", *self._input_args(w, h, fps, opts)]
+        pass_fds: tuple[int, ...] = ()
+        if opts.audio_fd is not None:
+            # sem probing: o formato é conhecido e esperar por dados de áudio atrasaria o vídeo
+            args += ["-thread_queue_size", "1024", "-probesize", "32", "-analyzeduration", "0",
+                     "-f", "s16le", "-ar", str(opts.audio_rate), "-ac", str(opts.audio_channels), "-i", f"pipe:{opts.audio_fd}"]
+            pass_fds = (opts.audio_fd,)
+        args += self._video_args(opts)
+        if vfr:
+            args += self._vfr_args()
+        if opts.audio_fd is not None:
+            args += ["-c:a", "aac", "-b:a", "160k"]
+        args += _ffmpeg_fragment_args(path, opts.fragment_seconds)
+        args += [path]
+        try:
+            self._proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                          stderr=subprocess.PIPE, pass_fds=pass_fds)
+        finally:
+            # o ffmpeg tem a sua cópia; fechar a nossa para ele ver EOF quando o áudio parar
+            if opts.audio_fd is not None:
+                os.close(opts.audio_fd)
+                opts.audio_fd = None
+        # stderr lido em paralelo, só as últimas linhas: com avisos a mais o pipe encheria e o ffmpeg
+        # (e com ele o write() do encoder) ficaria bloqueado
+        self._stderr: deque[bytes] = deque(maxlen=64)
+        self._stderr_reader = threading.Thread(target=self._stderr.extend, args=(self._proc.stderr,),
+                                               name="qtrec-ffmpeg-stderr", daemon=True)
+        self._stderr_reader.start()
+
+    def _input_args(self, w: int, h: int, fps: float, opts: EncodeOptions) -> list[str]:
+        return _ffmpeg_raw_input(w, h, fps, opts, "pipe:0")
+
+    def _video_args(self, opts: EncodeOptions) -> list[str]:
+        return _ffmpeg_video_args(opts)
+
+    def _vfr_args(self) -> list[str]:
+        # só frames exatamente iguais ao último mantido (hi=lo=0); -fps_mode vfr não volta a duplicá-los
+        return ["-vf", "mpdecimate=hi=0:lo=0:frac=0", "-fps_mode", "vfr"]
+
+    def isOpened(self) -> bool:
+        return self._proc.poll() is None
+
+    def write(self, frame: np.ndarray):
+        _check_raw_frame(frame, self.size, self.i420)
+        if not self.vfr:
+            self._write(frame)
+            return
+        if self._holding:
+            self._write(self._hold)
+        if self._hold is None:
+            self._hold = np.empty_like(frame)
+        np.copyto(self._hold, frame)
+        self._holding = True
+
+    def _write(self, frame: np.ndarray):
+        try:
+            self._proc.stdin.write(np.ascontiguousarray(frame).data)
+        except (BrokenPipeError, OSError) as e:
+            raise RuntimeError(f"O ffmpeg terminou durante a gravação: {self._stderr_tail()}") from e
+        self.bytes_written += frame.nbytes
+
+    def repeat(self, count: int = 1) -> int:
+        """Repete o último frame em `count` slots (só com vfr); devolve os slots escritos.
+
+        O último slot fica sempre retido: no fim da gravação release()
+        escreve-o com um píxel alterado, para o ffmpeg não o descartar como
+        repetição e o ficheiro acabar no instante certo.
+        """
+        if not self._holding:
+            return 0
+        for _ in range(count):
+            self._write(self._hold)
+        return count
+
+    def release(self):
+        if self._holding:
+            self._holding = False
+            # píxel central (o mpdecimate não compara as margens); em I420 fica no plano Y
+            rows = self._hold.shape[0] * 2 // 3 if self.i420 else self._hold.shape[0]
+            self._hold[rows // 2, self._hold.shape[1] // 2] ^= 4
+            try:
+                self._write(self._hold)
+            except RuntimeError:
+                pass
+        if self._proc.stdin and not self._proc.stdin.closed:
+            try:
+                self._proc.stdin.close()
+            except OSError:
+                pass
+        self._proc.wait()
+        if self._proc.returncode != 0:
+            log.error("ffmpeg terminou com código %s: %s", self._proc.returncode, self._stderr_tail())
+
+    def _stderr_tail(self) -> str:
+        if self._proc.poll() is not None:
+            self._stderr_reader.join(timeout=1)
+        return b''.join(self._stderr).decode(errors='replace').strip()[-500:]
+
+
+class MJPEGPipeWriter(FFmpegPipeWriter):
+    """Copia os JPEG da câmara para o contentor tal como chegam (sem decode nem re-encode).
+
+    write() recebe o buffer comprimido de um frame; em CFR os duplicados são
+    o mesmo JPEG escrito outra vez, o que não custa nada ao ffmpeg.
+    """
+    def _input_args(self, w: int, h: int, fps: float, opts: EncodeOptions) -> list[str]:
+        return ["-f", "mjpeg", "-framerate", f"{fps}", "-i", "pipe:0"]
+
+    def _video_args(self, opts: EncodeOptions) -> list[str]:
+        return ["-c:v", "copy"]
+
+    def write(self, frame: np.ndarray):
+        try:
+            self._proc.stdin.write(frame.data)
+        except (BrokenPipeError, OSError) as e:
+            raise RuntimeError(f"O ffmpeg terminou durante a gravação: {self._stderr_tail()}") from e
+        self.bytes_written += frame.nbytes
+
+
+def _encode_segment(raw_path: str, out_path: str, size_wh: tuple[int, int], fps: float,
+                    opts: dict, threads: int) -> str:
+    """Codifica um segmento cru num processo ffmpeg próprio e apaga o ficheiro cru."""
+    w, h = size_wh
+    enc = EncodeOptions(**opts)
+    args = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y", *_ffmpeg_raw_input(w, h, fps, enc, raw_path),
+    ] + _ffmpeg_video_args(enc) + ["-threads", str(threads), "-an", out_path]
+    try:
+        proc = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg falhou no segmento {os.path.basename(raw_path)}: "
+                               f"{proc.stderr.decode(errors='replace').strip()[-500:]}")
+    finally:
+        try:
+            os.remove(raw_path)
+        except OSError:
+            pass
+    return out_path
+
+
+class SegmentedEncoder:
+    """Codificação paralela por segmentos (mesma interface que o cv2.VideoWriter).
+
+    Os frames crus são acumulados em segmentos de duração fixa num diretório
+    temporário; cada segmento completo é codificado por um processo ffmpeg
+    separado (até `workers` em simultâneo) enquanto a captura continua no
+    seguinte. Os processos são lançados a partir de um pool de threads e não
+    com multiprocessing: o trabalho pesado já corre fora do Python, e fazer
+    fork de um processo com Qt/OpenCV e threads ativas pode bloquear.
+    Como cada segmento é um encode independente, começa num keyframe, e no
+    fim os segmentos são juntos sem recodificação com o concat demuxer.
+    """
+    def __init__(self, path: str, size_wh: tuple[int, int], fps: float, opts: EncodeOptions):
+        self.path = path
+        self.size = (int(size_wh[0]), int(size_wh[1]))
+        self.fps = fps
+        self.workers = opts.workers or os.cpu_count() or 1
+        self.segment_frames = max(1, int(round(opts.segment_seconds * fps)))
+        self._opts = {k: v for k, v in asdict(opts).items() if k != 'audio_fd'}
+        self.i420 = opts.i420
+        self._threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self._dir = tempfile.mkdtemp(prefix="qtrec_seg_")
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="qtrec-segment")
+        self._futures = []
+        self._raw = None
+        self._frames_in_segment = 0
+        self._opened = True
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def write(self, frame: np.ndarray):
+        _check_raw_frame(frame, self.size, self.i420)
+        if self._raw is None:
+            self._raw = open(os.path.join(self._dir, f"seg_{len(self._futures):05d}.raw"), 'wb')
+        self._raw.write(np.ascontiguousarray(frame).data)
+        self._frames_in_segment += 1
+        if self._frames_in_segment >= self.segment_frames:
+            self._submit()
+
+    def _submit(self):
+        raw_path = self._raw.name
+        self._raw.close()
+        self._raw = None
+        self._frames_in_segment = 0
+        out_path = os.path.splitext(raw_path)[0] + ".mp4"
+        self._futures.append(self._pool.submit(_encode_segment, raw_path, out_path, self.size,
+                                               self.fps, self._opts, self._threads))
+
+    def release(self):
+        if not self._opened:
+            return
+        self._opened = False
+        try:
+            if self._raw is not None:
+                self._submit()
+            segments = [f.result() for f in self._futures]
+            if segments:
+                list_path = os.path.join(self._dir, "segments.txt")
+                with open(list_path, 'w') as f:
+                    for seg in segments:
+                        f.write(f"file '{seg}'\n")
+                proc = subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0",
+                                       "-i", list_path, "-c", "copy", self.path],
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                if proc.returncode != 0:
+                    log.error("Falha ao juntar segmentos: %s", proc.stderr.decode(errors='replace').strip()[-500:])
+        finally:
+            self._pool.shutdown(cancel_futures=True)
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+
+H264_NAL_SPS = 7
+
+
+class ReplayBuffer:
+    """Anel em memória com os últimos N segundos de vídeo já comprimido (H.264 Annex B).
+
+    O fluxo é guardado em blocos que começam num keyframe precedido de
+    SPS/PPS, por isso qualquer sufixo do anel é decodificável sem
+    recodificar. Os blocos mais antigos saem quando deixam de ser precisos
+    para cobrir a janela ou quando o total passa `max_bytes`, pelo que a
+    memória não cresce com o tempo de execução.
+    """
+    def __init__(self, seconds: float = 30.0, max_bytes: int = 256 * 1024 * 1024, fps: float = 30.0):
+        self.seconds = float(seconds)
+        self.max_bytes = int(max_bytes)
+        self.fps = float(fps)
+        self._chunks: deque[tuple[float, bytes]] = deque()
+        # bloco ainda em curso (GOP sem o SPS seguinte): já entra nos snapshots
+        self._open_t: float | None = None
+        self._open: list[bytes] = []
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def begin(self, t: float):
+        """Fecha o bloco em curso e abre outro no instante `t` (um SPS acabou de chegar)."""
+        with self._lock:
+            self._close_open()
+            self._open_t = t
+            # manter o bloco que começa antes do início da janela (cobre-a por inteiro)
+            while self._chunks:
+                nxt = self._chunks[1][0] if len(self._chunks) > 1 else t
+                if self._bytes <= self.max_bytes and nxt > t - self.seconds:
+                    break
+                _, old = self._chunks.popleft()
+                self._bytes -= len(old)
+                self.evicted += 1
+
+    def extend(self, data: bytes):
+        """Acrescenta NAL units completas ao bloco em curso (ignoradas antes do 1.º SPS)."""
+        with self._lock:
+            if self._open_t is not None and data:
+                self._open.append(data)
+                self._bytes += len(data)
+
+    def finish(self):
+        with self._lock:
+            self._close_open()
+
+    def append(self, t: float, chunk: bytes):
+        """Acrescenta um bloco já fechado."""
+        self.begin(t)
+        self.extend(chunk)
+        self.finish()
+
+    def _close_open(self):
+        if self._open_t is not None and self._open:
+            self._chunks.append((self._open_t, b''.join(self._open)))
+        self._open_t = None
+        self._open = []
+
+    def snapshot(self, seconds: float | None = None) -> bytes:
+        seconds = self.seconds if seconds is None else seconds
+        with self._lock:
+            chunks = list(self._chunks)
+            if self._open_t is not None and self._open:
+                chunks.append((self._open_t, b''.join(self._open)))
+        if not chunks:
+            return b''
+        # a janela acaba agora, não no início do último GOP
+        cutoff = time.perf_counter() - seconds
+        start = 0
+        for i, (t, _) in enumerate(chunks):
+            if t <= cutoff:
+                start = i
+        return b''.join(c for _, c in chunks[start:])
+
+    def save(self, path: str, seconds: float | None = None) -> str:
+        """Grava a janela em disco sem recodificar (remux -c copy; sem ffmpeg fica em .h264)."""
+        data = self.snapshot(seconds)
+        if not data:
+            raise RuntimeError("O buffer de replay ainda está vazio.")
+        if path.lower().endswith(('.h264', '.264')) or not has_ffmpeg():
+            path = os.path.splitext(path)[0] + '.h264'
+            with open(path, 'wb') as f:
+                f.write(data)
+            return path
+        proc = subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                               # Annex B não tem timestamps: genpts dá a cada pacote pts/dts pela ordem e -framerate
+                               "-fflags", "+genpts", "-f", "h264", "-framerate", f"{self.fps}", "-i", "pipe:0",
+                               "-c", "copy", path],
+                              input=data, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if proc.returncode != 0:
+            raise RuntimeError(f"Falha ao gravar o replay: {proc.stderr.decode(errors='replace').strip()[-300:]}")
+        return path
+
+
+class ReplayEncoder:
+    """Codifica para H.264 em memória e alimenta um ReplayBuffer (interface do cv2.VideoWriter)."""
+    def __init__(self, buffer: ReplayBuffer, size_wh: tuple[int, int], fps: float, opts: EncodeOptions,
+                 keyframe_seconds: float = 1.0):
+        w, h = size_wh
+        self.buffer = buffer
+        self.size = (int(w), int(h))
+        args = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", *_ffmpeg_raw_input(w, h, fps, opts, "pipe:0"),
+        ] + _ffmpeg_video_args(opts) + [
+            # GOPs curtos: é a granularidade com que o replay pode começar;
+            # dump_extra repete SPS/PPS em cada keyframe, tornando cada bloco autónomo
+            "-force_key_frames", f"expr:gte(t,n_forced*{keyframe_seconds:g})", "-bsf:v", "dump_extra",
+            # sem B-frames: ordem de decode = ordem de apresentação, e o remux sem timestamps fica monotónico
+            "-bf", "0",
+        ] + (
+            # sem lookahead o x264 entrega cada frame logo: o save apanha os últimos instantes
+            ["-tune", "zerolatency"] if opts.vcodec == "libx264" else []
+        ) + [
+            "-an", "-f", "h264", "-flush_packets", "1", "pipe:1",
+        ]
+        self._proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._reader = threading.Thread(target=self._read_loop, name="qtrec-replay", daemon=True)
+        self._reader.start()
+
+    def isOpened(self) -> bool:
+        return self._proc.poll() is None
+
+    def write(self, frame: np.ndarray):
+        try:
+            self._proc.stdin.write(np.ascontiguousarray(frame).data)
+        except (BrokenPipeError, OSError) as e:
+            raise RuntimeError("O ffmpeg do replay terminou inesperadamente.") from e
+
+    def release(self):
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        self._proc.wait()
+        self._reader.join()
+
+    @staticmethod
+    def _next_sps(buf: bytearray, start: int) -> int:
+        """Posição do próximo start code de um SPS (início de bloco), ou -1."""
+        while True:
+            i = buf.find(b'\x00\x00\x01', start)
+            if i < 0 or i + 3 >= len(buf):
+                return -1
+            if buf[i + 3] & 0x1F == H264_NAL_SPS:
+                return i - 1 if i > 0 and buf[i - 1] == 0 else i
+            start = i + 3
+
+    def _read_loop(self):
+        fd = self._proc.stdout.fileno()
+        buf = bytearray()
+        scan = 0
+        while True:
+            data = os.read(fd, 1 << 16)
+            if not data:
+                break
+            buf += data
+            cut = 0
+            while (pos := self._next_sps(buf, scan)) >= 0:
+                self.buffer.extend(bytes(buf[cut:pos]))
+                self.buffer.begin(time.perf_counter())
+                cut = pos
+                scan = pos + 4  # não voltar a encontrar o SPS que abre o bloco atual
+            # tudo antes do último start code são NAL units completas: ficam já visíveis ao save
+            last = buf.rfind(b'\x00\x00\x01', cut + 1)
+            if last > cut:
+                if buf[last - 1] == 0:
+                    last -= 1
+                self.buffer.extend(bytes(buf[cut:last]))
+                cut = last
+            del buf[:cut]
+            scan = max(0, scan - cut)
+        self.buffer.extend(bytes(buf))
+        self.buffer.finish()
+
+
+# Spool bruto (.qtspool): cabeçalho fixo | índice (um registo por frame distinto) | frames crus.
+# magic, versão, largura, altura, i420, fps, capacidade, bytes/frame, início do índice, início dos dados, nº de frames
+_SPOOL_HEADER = struct.Struct('<8sIIIIdQQQQQ')
+_SPOOL_MAGIC = b'QTRSPOOL'
+_SPOOL_HEADER_BYTES = 4096
+_SPOOL_COUNT_OFFSET = _SPOOL_HEADER.size - 8
+# instante (s desde o 1.º frame), posição no ficheiro, bytes, nº de slots CFR que o frame ocupa
+SPOOL_INDEX_DTYPE = np.dtype([('ts', '<f8'), ('offset', '<u8'), ('size', '<u4'), ('repeat', '<u4')])
+
+
+class SpoolWriter:
+    """Grava frames crus num ficheiro pré-alocado e mapeado em memória (interface do cv2.VideoWriter).
+
+    Para cadências que o codificador não acompanha em tempo real: cada frame
+    distinto custa uma cópia para o mmap e um registo no índice; repetições
+    CFR só incrementam o registo anterior. O nº de frames no cabeçalho é
+    atualizado depois dos dados, por isso um spool interrompido continua
+    legível. Quando enche, os frames seguintes são descartados e `on_full` é
+    chamado uma vez. A codificação fica para transcode_spool().
+    """
+    def __init__(self, path: str, size_wh: tuple[int, int], fps: float, *, i420: bool = False,
+                 max_bytes: int = 4 << 30, on_full=None):
+        w, h = int(size_wh[0]), int(size_wh[1])
+        self.path = path
+        self.size = (w, h)
+        self.i420 = i420
+        self.frame_bytes = w * h * 3 // 2 if i420 else w * h * 3
+        self.capacity = max(1, int(max_bytes) // self.frame_bytes)
+        index_end = _SPOOL_HEADER_BYTES + self.capacity * SPOOL_INDEX_DTYPE.itemsize
+        self._data_offset = -(-index_end // mmap.ALLOCATIONGRANULARITY) * mmap.ALLOCATIONGRANULARITY
+        total = self._data_offset + self.capacity * self.frame_bytes
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            # reservar já o espaço: a captura não pode falhar a meio por falta de disco
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(self._fd, 0, total)
+            else:
+                os.ftruncate(self._fd, total)
+            self._mm = mmap.mmap(self._fd, total)
+        except OSError as e:
+            os.close(self._fd)
+            os.remove(path)
+            raise RuntimeError(f"Não foi possível reservar {total / 2**20:.0f} MB para o spool: {e}") from e
+        _SPOOL_HEADER.pack_into(self._mm, 0, _SPOOL_MAGIC, 1, w, h, int(i420), float(fps), self.capacity,
+                                self.frame_bytes, _SPOOL_HEADER_BYTES, self._data_offset, 0)
+        self.index = np.ndarray((self.capacity,), SPOOL_INDEX_DTYPE, buffer=self._mm, offset=_SPOOL_HEADER_BYTES)
+        self._data = np.ndarray((self.capacity * self.frame_bytes,), np.uint8, buffer=self._mm, offset=self._data_offset)
+        self.count = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self._t0: float | None = None
+        self._on_full = on_full
+
+    def isOpened(self) -> bool:
+        return not self._mm.closed
+
+    def write(self, frame: np.ndarray):
+        self.write_frame(frame, time.perf_counter())
+
+    def write_frame(self, frame: np.ndarray, ts: float, count: int = 1) -> int:
+        """Frame distinto capturado em `ts` (perf_counter) que ocupa `count` slots CFR.
+
+        Devolve o nº de slots guardados: 0 se o spool estiver cheio.
+        """
+        if self.count >= self.capacity:
+            self._overflow(count)
+            return 0
+        _check_raw_frame(frame, self.size, self.i420)
+        i = self.count
+        start = i * self.frame_bytes
+        np.copyto(self._data[start:start + self.frame_bytes].reshape(frame.shape), frame)
+        if self._t0 is None:
+            self._t0 = ts
+        self.index[i] = (ts - self._t0, self._data_offset + start, self.frame_bytes, count)
+        self.count = i + 1
+        struct.pack_into('<Q', self._mm, _SPOOL_COUNT_OFFSET, self.count)
+        self.bytes_written += self.frame_bytes
+        return count
+
+    def repeat(self, count: int = 1) -> int:
+        """Mais `count` slots CFR do último frame (sem cópia); devolve os slots guardados."""
+        if self.count == 0:
+            return 0
+        if self.count >= self.capacity and self.dropped:
+            self._overflow(count)
+            return 0
+        self.index['repeat'][self.count - 1] += count
+        return count
+
+    def _overflow(self, count: int):
+        if not self.dropped and self._on_full is not None:
+            log.warning("Spool cheio (%d frames, %.0f MB): a parar a gravação", self.count,
+                        self.count * self.frame_bytes / 2**20)
+            self._on_full()
+        self.dropped += count
+
+    def release(self):
+        if self._mm.closed:
+            return
+        # os arrays sobre o mmap têm de sair antes de o fechar; o ficheiro encolhe para o que foi usado
+        del self.index, self._data
+        self._mm.close()
+        os.ftruncate(self._fd, self._data_offset + self.count * self.frame_bytes)
+        os.close(self._fd)
+        log.info("Spool %s: %d frames distintos, %.0f MB%s", self.path, self.count,
+                 self.count * self.frame_bytes / 2**20, f", {self.dropped} descartados (cheio)" if self.dropped else "")
+
+
+class Spool:
+    """Leitura de um .qtspool com acesso aleatório (pré-visualização, corte, transcodificação)."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, _version, w, h, i420, fps, _capacity, frame_bytes,
+         index_offset, self._data_offset, count) = _SPOOL_HEADER.unpack_from(self._mm, 0)
+        if magic != _SPOOL_MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} não é um spool do gravador")
+        self.size = (w, h)
+        self.i420 = bool(i420)
+        self.fps = fps
+        self.frame_bytes = frame_bytes
+        # spool interrompido a meio: só contam frames cujos dados estão no ficheiro
+        count = min(count, max(0, len(self._mm) - self._data_offset) // frame_bytes)
+        self.index = np.ndarray((count,), SPOOL_INDEX_DTYPE, buffer=self._mm, offset=index_offset)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if not self._mm.closed:
+            del self.index
+            try:
+                self._mm.close()
+            except BufferError:
+                pass  # ainda há vistas de frame(i) vivas: o mmap fecha quando forem libertadas
+
+    @property
+    def duration(self) -> float:
+        """Duração em CFR (slots × 1/fps)."""
+        return int(self.index['repeat'].sum()) / self.fps if len(self) else 0.0
+
+    def frame(self, i: int) -> np.ndarray:
+        """Vista só de leitura sobre o frame i (BGR (h, w, 3) ou I420 (h*3/2, w)), sem cópia."""
+        e = self.index[i]
+        w, h = self.size
+        shape = (h * 3 // 2, w) if self.i420 else (h, w, 3)
+        return np.ndarray(shape, np.uint8, buffer=self._mm, offset=int(e['offset']))
+
+    def frame_bgr(self, i: int) -> np.ndarray:
+        f = self.frame(i)
+        return cv2.cvtColor(f, cv2.COLOR_YUV2BGR_I420) if self.i420 else f.copy()
+
+    def at(self, t: float) -> int:
+        """Índice do frame visível no instante t (s desde o 1.º frame)."""
+        return max(0, min(len(self) - 1, int(np.searchsorted(self.index['ts'], t, 'right')) - 1))
+
+    def range(self, start: float = 0.0, end: float | None = None) -> tuple[int, int]:
+        """Frames [i0, i1) capturados entre start e end (s)."""
+        ts = self.index['ts']
+        i0 = int(np.searchsorted(ts, start, 'left'))
+        i1 = len(self) if end is None else int(np.searchsorted(ts, end, 'left'))
+        return i0, max(i0, i1)
+
+
+def transcode_spool(spool_path: str, out_path: str, opts: EncodeOptions | None = None, *, codec: str = 'mp4v',
+                    start: float = 0.0, end: float | None = None, progress=None,
+                    cancel: threading.Event | None = None) -> bool:
+    """Codifica um spool (ou o troço [start, end) s) para out_path, em CFR com as repetições do índice.
+
+    Com `opts` e ffmpeg usa o FFmpegPipeWriter (I420 do spool vai direto
+    para o ffmpeg); sem eles o cv2.VideoWriter com `codec`. Escreve para um
+    .part renomeado no fim; devolve False se cancelado.
+    """
+    with Spool(spool_path) as sp:
+        i0, i1 = sp.range(start, end)
+        if i1 <= i0:
+            raise RuntimeError(f"O spool {spool_path} não tem frames nesse intervalo.")
+        repeats = sp.index['repeat'][i0:i1]
+        total = max(1, int(repeats.sum()))
+        part = _partial_path(out_path)
+        use_ffmpeg = opts is not None and has_ffmpeg()
+        if use_ffmpeg:
+            writer = FFmpegPipeWriter(part, sp.size, sp.fps, replace(opts, i420=sp.i420, audio_fd=None))
+        else:
+            writer = cv2.VideoWriter(part, cv2.VideoWriter_fourcc(*codec.upper()), sp.fps, sp.size)
+            if not writer.isOpened():
+                raise RuntimeError("Não foi possível abrir o VideoWriter. Tente outro codec/ficheiro.")
+        done = 0
+        cancelled = False
+        finished = False
+        try:
+            for k, i in enumerate(range(i0, i1)):
+                if cancel is not None and cancel.is_set():
+                    cancelled = True
+                    break
+                frame = sp.frame(i)
+                if not use_ffmpeg and sp.i420:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420)
+                for _ in range(int(repeats[k])):
+                    writer.write(frame)
+                done += int(repeats[k])
+                if progress is not None:
+                    progress(done / total)
+            finished = True
+        finally:
+            writer.release()
+            if not finished:
+                # erro a meio (ffmpeg morreu, disco cheio…): não deixar o .part para trás
+                _remove_quietly(part)
+    failed = use_ffmpeg and writer._proc.returncode != 0
+    if cancelled or failed:
+        if os.path.exists(part):
+            os.remove(part)
+        if failed:
+            raise RuntimeError(f"ffmpeg terminou com código {writer._proc.returncode} ao codificar o spool")
+        return False
+    os.replace(part, out_path)
+    if start <= 0 and end is None:
+        _move_sidecars(spool_path, out_path)
+    return True
+
+
+# extensões dos vídeos temporários qtrec_video_* (os ficheiros laterais .txt/.jsonl não são vídeo)
+RECOVERABLE_EXTS = ('.mp4', '.mkv', '.mov', '.avi', '.webm')
+
+
+def recover_temp_files(dest_dir: str, tmp_dir: str | None = None) -> list[tuple[str, str | None, str]]:
+    """Recupera gravações interrompidas (qtrec_video_*, segmentos qtrec_seg_*, spools qtrec_spool_*) para dest_dir.
+
+    Cada ficheiro é remultiplexado sem recodificar (`-c copy`; um spool é
+    antes codificado com as EncodeOptions por omissão), juntando o
+    WAV qtrec_audio_* da mesma sessão quando existe. Um MP4 não fragmentado
+    sem átomo moov (gravação antiga ou via OpenCV) não é recuperável.
+    Depois de recuperada, a origem (e o WAV usado) é apagada, para não voltar
+    a aparecer na próxima recuperação; os ficheiros laterais acompanham o
+    destino. Devolve (origem, destino ou None, mensagem) por gravação encontrada.
+    """
+    tmp_dir = tmp_dir or tempfile.gettempdir()
+    if not has_ffmpeg():
+        return [(tmp_dir, None, "ffmpeg não encontrado: não é possível recuperar")]
+    os.makedirs(dest_dir, exist_ok=True)
+    names = sorted(os.listdir(tmp_dir))
+
+    def stamp(name: str) -> int | None:
+        try:
+            return int(os.path.splitext(name)[0].rsplit('_', 1)[1])
+        except (IndexError, ValueError):
+            return None
+
+    audio = {stamp(n): os.path.join(tmp_dir, n) for n in names if n.startswith("qtrec_audio_") and n.endswith(".wav")}
+    results = []
+    for name in names:
+        src = os.path.join(tmp_dir, name)
+        base = os.path.splitext(name)[0]
+        encoded = None  # vídeo intermédio do spool, apagado no fim
+        if name.startswith("qtrec_spool_") and name.endswith(".qtspool") and os.path.isfile(src):
+            encoded = os.path.join(dest_dir, f"recuperado_{base}_video.mp4")
+            try:
+                transcode_spool(src, encoded, EncodeOptions())
+            except (RuntimeError, ValueError, OSError) as e:
+                results.append((src, None, str(e)))
+                continue
+            inputs = ["-i", encoded]
+        elif (name.startswith("qtrec_video_") and name.lower().endswith(RECOVERABLE_EXTS) and os.path.isfile(src)
+              and ".part." not in name):
+            inputs = ["-i", src]
+        elif name.startswith("qtrec_seg_") and os.path.isdir(src):
+            segs = sorted(f for f in os.listdir(src) if f.endswith(".mp4"))
+            if not segs:
+                results.append((src, None, "sem segmentos codificados"))
+                continue
+            list_path = os.path.join(src, "recover.txt")
+            with open(list_path, 'w') as f:
+                for seg in segs:
+                    f.write(f"file '{os.path.join(src, seg)}'\n")
+            inputs = ["-f", "concat", "-safe", "0", "-i", list_path]
+        else:
+            continue
+        ext = os.path.splitext(name)[1] if os.path.isfile(src) and encoded is None else ".mp4"
+        dst = os.path.join(dest_dir, f"recuperado_{base}{ext or '.mp4'}")
+        # o WAV é criado no mesmo segundo (ou no seguinte) que o vídeo temporário
+        ts = stamp(name)
+        wav = next((audio[t] for t in (ts, None if ts is None else ts + 1) if t in audio), None)
+        args = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"] + inputs
+        if wav:
+            args += ["-i", wav, "-c:v", "copy", "-c:a", "aac", "-b:a", "160k"]
+        else:
+            args += ["-c", "copy"]
+        proc = subprocess.run(args + [dst], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        ok = proc.returncode == 0 and os.path.exists(dst) and os.path.getsize(dst) > 0
+        if encoded is not None:
+            # transcode_spool passou os sidecars para o intermédio: seguem o resultado
+            # (ou voltam ao spool, para uma nova tentativa)
+            _move_sidecars(encoded, dst if ok else src)
+            os.remove(encoded)
+        if ok:
+            results.append((src, dst, "recuperado" + (" (com áudio)" if wav else "")))
+            if os.path.isdir(src):
+                shutil.rmtree(src, ignore_errors=True)
+            else:
+                _move_sidecars(src, dst)
+                _remove_quietly(src)
+            if wav:
+                _remove_quietly(wav)
+                audio = {t: a for t, a in audio.items() if a != wav}
+        else:
+            try:
+                os.remove(dst)
+            except OSError:
+                pass
+            results.append((src, None, proc.stderr.decode(errors='replace').strip()[-200:] or "não recuperável"))
+    return results
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def temp_media_path(prefix: str, ext: str) -> str:
+    """Temporário <tmp>/<prefix>_<segundos><ext> que ainda não existe.
+
+    Com a finalização em segundo plano pode começar-se uma gravação nova no
+    mesmo segundo em que a anterior ainda usa o seu temporário.
+    """
+    stamp = int(time.time())
+    while True:
+        path = os.path.join(tempfile.gettempdir(), f"{prefix}_{stamp}{ext}")
+        if not os.path.exists(path):
+            return path
+        stamp += 1
+
+
+# FourCC do OpenCV cujo vídeo já é H.264: recodificar só para mudar o bitrate não compensa
+_H264_FOURCCS = {'H264', 'X264', 'AVC1'}
+
+
+def _partial_path(final_path: str) -> str:
+    """Ficheiro em curso ao lado do destino (mesma extensão, para o ffmpeg escolher o muxer)."""
+    base, ext = os.path.splitext(final_path)
+    return f"{base}.part{ext}"
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _move_file(src: str, dst: str, progress=None, cancel: threading.Event | None = None,
+               chunk: int = 8 << 20) -> bool:
+    """Move src → dst: os.replace (atómico) no mesmo sistema de ficheiros, senão cópia por blocos.
+
+    A cópia vai para um ficheiro .part ao lado do destino e só no fim é
+    renomeada, por isso dst nunca fica a meio. Devolve False se cancelada
+    (src fica intacto).
+    """
+    try:
+        os.replace(src, dst)
+        return True
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    part = _partial_path(dst)
+    total = max(1, os.path.getsize(src))
+    done = 0
+    try:
+        with open(src, 'rb') as fi, open(part, 'wb') as fo:
+            while block := fi.read(chunk):
+                if cancel is not None and cancel.is_set():
+                    raise _Cancelled()
+                fo.write(block)
+                done += len(block)
+                if progress is not None:
+                    progress(done / total)
+        shutil.copystat(src, part)
+        os.replace(part, dst)
+    except _Cancelled:
+        os.remove(part)
+        return False
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    os.remove(src)
+    return True
+
+
+def _run_ffmpeg(args: list[str], out_path: str, duration_s: float, progress=None,
+                cancel: threading.Event | None = None) -> bool:
+    """Corre o ffmpeg para um .part e renomeia para out_path; progresso lido de `-progress pipe:1`.
+
+    Devolve False se cancelado (o .part é apagado). Um erro do ffmpeg levanta
+    RuntimeError com o fim do stderr.
+    """
+    part = _partial_path(out_path)
+    cmd = [args[0], "-hide_banner", "-loglevel", "error", "-nostats", "-progress", "pipe:1", *args[1:], part]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL, text=True)
+    # stderr em paralelo: com muitos erros o pipe encheria e o ffmpeg pararia
+    err: list[str] = []
+    reader = threading.Thread(target=lambda: err.extend(proc.stderr), daemon=True)
+    reader.start()
+    cancelled = False
+    for line in proc.stdout:
+        if cancel is not None and cancel.is_set():
+            cancelled = True
+            proc.terminate()
+            break
+        key, _, value = line.strip().partition('=')
+        # out_time_us (e out_time_ms, apesar do nome) vêm em microssegundos
+        if key == 'out_time_us' and value.isdigit() and progress is not None:
+            progress(min(1.0, int(value) / 1e6 / duration_s) if duration_s > 0 else 0.0)
+    proc.wait()
+    reader.join(timeout=1)
+    if cancelled or proc.returncode != 0:
+        if os.path.exists(part):
+            os.remove(part)
+        if cancelled:
+            return False
+        raise RuntimeError(f"ffmpeg terminou com código {proc.returncode}: {''.join(err).strip()[-500:]}")
+    os.replace(part, out_path)
+    return True
+
+
+def _move_sidecars(src_path: str, dst_path: str):
+    """Ficheiros laterais (instantes VFR, telemetria) acompanham o ficheiro final."""
+    for suffix in ('.timestamps.txt', '.telemetry.jsonl'):
+        if os.path.exists(src_path + suffix):
+            try:
+                shutil.move(src_path + suffix, dst_path + suffix)
+            except Exception:
+                pass
+
+
+def mux_or_copy(video_path: str, final_path: str, wav_path: str | None = None, *,
+                video_encoded: bool = False, reencode: bool = False, bitrate_kbps: int = 6000,
+                av_sync: "AVSync | None" = None, video_codec: str | None = None, duration_s: float = 0.0,
+                progress=None, cancel: threading.Event | None = None) -> bool:
+    """Junta o vídeo temporário com o WAV (ffmpeg) ou move-o para o destino.
+
+    O vídeo só é recodificado se `reencode` for pedido e ainda não for H.264
+    (`video_codec` = FourCC do OpenCV); sem áudio nem recodificação o
+    temporário é simplesmente movido (os.replace se estiver no mesmo sistema
+    de ficheiros). `progress(fração)` é chamado à medida que avança e
+    `cancel` interrompe: o destino não é criado e os temporários ficam para
+    recover_temp_files. Se terminar, os temporários são removidos e os
+    ficheiros de instantes VFR/telemetria acompanham o ficheiro final.
+    Devolve False se cancelado.
+    """
+    if not video_path or not os.path.exists(video_path):
+        return True
+    if final_path == video_path:
+        return True
+    has_wav = bool(wav_path and os.path.exists(wav_path))
+    reencode = reencode and not video_encoded and (video_codec or '').upper() not in _H264_FOURCCS
+    same_container = os.path.splitext(video_path)[1].lower() == os.path.splitext(final_path)[1].lower()
+    if (not has_wav and not reencode and same_container) or not has_ffmpeg():
+        # nada a converter: o ficheiro final é o temporário
+        ok = _move_file(video_path, final_path, progress, cancel)
+    else:
+        args = ["ffmpeg", "-y", "-i", video_path]
+        if has_wav:
+            args += ["-i", wav_path]
+            # alinhamento pelos instantes de captura: desvio inicial + deriva do relógio de áudio
+            af = av_sync.ffmpeg_audio_filter() if av_sync is not None else None
+            if af:
+                args += ["-af", af]
+        if reencode:
+            # re‑encode para aplicar bitrate
+            args += ["-c:v", "libx264", "-b:v", f"{bitrate_kbps}k", "-pix_fmt", "yuv420p"]
+        else:
+            # o vídeo já tem o codec final (H.264 do ffmpeg em direto ou o do OpenCV): só copiar
+            args += ["-c:v", "copy"]
+        if has_wav:
+            args += ["-c:a", "aac", "-b:a", "160k"]
+        ok = _run_ffmpeg(args, final_path, duration_s, progress, cancel)
+    if not ok:
+        return False
+    _move_sidecars(video_path, final_path)
+    # limpar temporários
+    for tmp in (video_path, wav_path):
+        if tmp:
+            try:
+                os.remove(tmp)
+            except Exception:
+                pass
+    return True
+
+
+class FinalizeJob:
+    """Finalização de uma gravação já parada: esperar pelas threads e juntar/mover para o destino.
+
+    Corre no Finalizer (fora da thread da GUI). `stage`, `progress` e
+    `state` podem ser lidos a qualquer momento; cancel() interrompe o mux
+    ou a cópia, deixando os temporários para recuperação.
+    """
+    def __init__(self, final_path: str, video_path: str | None = None, wav_path: str | None = None, *,
+                 threads=(), video_encoded: bool = False, reencode: bool = False, bitrate_kbps: int = 6000,
+                 av_sync: "AVSync | None" = None, video_codec: str | None = None, extra_paths=(),
+                 spool_path: str | None = None, encode_opts: EncodeOptions | None = None):
+        self.final_path = final_path
+        self.video_path = video_path
+        self.wav_path = wav_path
+        self.threads = list(threads)  # a 1.ª é o RecorderThread principal (dá a duração para o progresso)
+        self.video_encoded = video_encoded
+        self.reencode = reencode
+        self.bitrate_kbps = bitrate_kbps
+        self.av_sync = av_sync
+        self.video_codec = video_codec
+        self.extra_paths = list(extra_paths)
+        # gravação em spool: codificar primeiro (para video_path se houver áudio a juntar, senão para o destino)
+        self.spool_path = spool_path
+        self.encode_opts = encode_opts
+        self.state = 'pending'   # pending → running → done | cancelled | failed
+        self.stage = 'em espera'
+        self.progress = 0.0
+        self.error: Exception | None = None
+        self.av_report: dict | None = None
+        self._cancel = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.state in ('done', 'cancelled', 'failed')
+
+    def cancel(self):
+        self._cancel.set()
+
+    def describe(self) -> str:
+        name = os.path.basename(self.final_path)
+        if self.state == 'running' and self.progress > 0:
+            return f"{name}: {self.stage} {100 * self.progress:.0f}%"
+        return f"{name}: {self.stage}"
+
+    def _set_progress(self, fraction: float):
+        self.progress = fraction
+
+    def run(self):
+        self.state = 'running'
+        try:
+            # com ffmpeg em direto, o fim das threads inclui o fecho do ficheiro final pelo codificador
+            self.stage = 'a fechar a gravação'
+            for t in self.threads:
+                t.join()
+            if self.av_sync is not None:
+                self.av_report = self.av_sync.report()
+            rec = self.threads[0] if self.threads else None
+            duration = rec.frames_written / rec.fps if getattr(rec, 'frames_written', 0) else 0.0
+            video_encoded = self.video_encoded
+            spool = self.spool_path if self.spool_path and os.path.exists(self.spool_path) else None
+            ok = not ((spool or self.video_path) and self._cancel.is_set())
+            if ok and spool:
+                self.stage = 'a codificar o spool'
+                ok = transcode_spool(spool, self.video_path or self.final_path, self.encode_opts,
+                                     codec=self.video_codec or 'mp4v', progress=self._set_progress, cancel=self._cancel)
+                if ok:
+                    os.remove(spool)
+                    self.progress = 0.0
+                video_encoded = self.encode_opts is not None
+            if ok and self.video_path:
+                self.stage = 'a juntar/copiar'
+                ok = not self._cancel.is_set() and mux_or_copy(
+                    self.video_path, self.final_path, self.wav_path, video_encoded=video_encoded,
+                    reencode=self.reencode, bitrate_kbps=self.bitrate_kbps, av_sync=self.av_sync,
+                    video_codec=self.video_codec, duration_s=duration, progress=self._set_progress, cancel=self._cancel)
+            self.state, self.stage = ('done', 'concluída') if ok else ('cancelled', 'cancelada')
+            if not ok:
+                log.warning("Finalização de %s cancelada: temporários mantidos em %s", self.final_path,
+                            tempfile.gettempdir())
+        except Exception as e:
+            self.error = e
+            self.state, self.stage = 'failed', 'falhou'
+            log.error("Finalização de %s falhou (temporários mantidos): %s", self.final_path, e)
+
+
+class Finalizer(threading.Thread):
+    """Fila de finalizações em segundo plano, uma de cada vez e por ordem de chegada."""
+    def __init__(self):
+        super().__init__(daemon=True, name="qtrec-finalizer")
+        self.jobs: list[FinalizeJob] = []   # todas as submetidas, por ordem (a GUI lê o estado)
+        self._queue: queue.Queue[FinalizeJob | None] = queue.Queue()
+
+    def submit(self, job: FinalizeJob) -> FinalizeJob:
+        self.jobs.append(job)
+        self._queue.put(job)
+        return job
+
+    def active(self) -> list[FinalizeJob]:
+        return [j for j in self.jobs if not j.done]
+
+    def close(self, timeout: float | None = None):
+        """Termina depois dos trabalhos já submetidos."""
+        self._queue.put(None)
+        self.join(timeout)
+
+    def run(self):
+        while (job := self._queue.get()) is not None:
+            job.run()
+
+
+def window_geometry(win) -> CaptureRegion | None:
+    """Retângulo atual de uma janela do pygetwindow (None se fechada, minimizada ou inválida)."""
+    try:
+        if getattr(win, 'isMinimized', False):
+            return None
+        r = CaptureRegion(int(win.left), int(win.top), int(win.width), int(win.height))
+    except Exception:
+        try:
+            l, t, a, b = win.box
+            if a > l and b > t:
+                # algumas plataformas devolvem (esq, topo, dir, baixo)
+                a, b = a - l, b - t
+            r = CaptureRegion(int(l), int(t), int(a), int(b))
+        except Exception:
+            return None
+    return r if r.width > 0 and r.height > 0 else None
+
+
+class WindowTracker(threading.Thread):
+    """Segue a posição/tamanho de uma janela em segundo plano, a um ritmo baixo.
+
+    Consultar o pygetwindow custa chamadas ao sistema de janelas, por isso
+    nunca é feito no ciclo de captura: este só lê `region`, um CaptureRegion
+    que é substituído (nunca alterado) quando a janela muda.
+    """
+    def __init__(self, window, region: CaptureRegion, interval: float = 0.25):
+        super().__init__(daemon=True, name="qtrec-window-tracker")
+        self.window = window
+        self.region = region
+        self.interval = max(0.02, float(interval))
+        self.changes = 0
+        self.lost = 0   # consultas sem geometria válida (janela minimizada/fechada): mantém-se a última
+        self.stats = StageStats('window-poll')
+        self._done = threading.Event()
+
+    def stop(self):
+        self._done.set()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            t0 = time.perf_counter()
+            r = window_geometry(self.window)
+            self.stats.add(time.perf_counter() - t0)
+            if r is None:
+                self.lost += 1
+            elif r != self.region:
+                self.region = r
+                self.changes += 1
+
+    def report(self) -> dict:
+        return {'polls': self.stats.frames, 'poll_ms': self.stats.snapshot()['avg_ms'],
+                'changes': self.changes, 'lost': self.lost}
+
+
+class RegionGrabber:
+    """Grab de uma região do ecrã para um canvas BGR de tamanho fixo.
+
+    O canvas fica com o tamanho inicial da região. Se a região mudar (janela
+    seguida por um WindowTracker) o conteúdo é cortado ou completado a preto
+    nesse canvas, por isso o writer nunca tem de ser reaberto. A parte da
+    região fora do ambiente de trabalho não é pedida ao mss.
+    """
+    def __init__(self, sct, region: CaptureRegion, tracker: WindowTracker | None = None):
+        self.sct = sct
+        self.tracker = tracker
+        self.bounds = monitor_region(sct, 0)
+        self.canvas_shape = (int(region.height), int(region.width), 3)
+        self._bgr: np.ndarray | None = None  # canvas intermédio do I420 com corte/margens
+        self._set_region(region)
+
+    def _set_region(self, region: CaptureRegion):
+        self.region = region
+        b = self.bounds
+        left, top = max(region.left, b.left), max(region.top, b.top)
+        right = min(region.left + region.width, b.left + b.width)
+        bottom = min(region.top + region.height, b.top + b.height)
+        if right <= left or bottom <= top:
+            self.monitor = None  # totalmente fora do ecrã
+            return
+        self.monitor = {'left': int(left), 'top': int(top), 'width': int(right - left), 'height': int(bottom - top)}
+        self.offset = (int(left - region.left), int(top - region.top))
+        self.full = self.offset == (0, 0) and (self.monitor['height'], self.monitor['width'], 3) == self.canvas_shape
+
+    def grab(self) -> np.ndarray | None:
+        """Vista BGRA sem cópia sobre o buffer do mss; None se a região estiver fora do ecrã."""
+        tracker = self.tracker
+        if tracker is not None and tracker.region is not self.region:
+            self._set_region(tracker.region)
+        if self.monitor is None:
+            return None
+        img = self.sct.grab(self.monitor)
+        return np.frombuffer(img.raw, dtype=np.uint8).reshape(img.height, img.width, 4)
+
+    def scaled_shape(self, step: int) -> tuple[int, int, int]:
+        h, w, c = self.canvas_shape
+        return -(-h // step), -(-w // step), c
+
+    def i420_shape(self, step: int) -> tuple[int, int]:
+        """Forma (h*3/2, w) do frame I420; com decimação as dimensões descem para pares."""
+        h, w, _ = self.scaled_shape(step)
+        h, w = h - h % 2, w - w % 2
+        return h * 3 // 2, w
+
+    def convert_i420(self, bgra: np.ndarray, dst: np.ndarray, step: int = 1):
+        """BGRA → I420 numa só passagem (sem o BGR intermédio); com corte/margens passa por um canvas BGR."""
+        h, w = dst.shape[0] * 2 // 3, dst.shape[1]
+        if self.full:
+            cv2.cvtColor(bgra[::step, ::step][:h, :w], cv2.COLOR_BGRA2YUV_I420, dst=dst)
+            return
+        if self._bgr is None or self._bgr.shape[:2] != (h, w):
+            self._bgr = np.empty((h, w, 3), np.uint8)
+        self.convert(bgra, self._bgr, step)
+        cv2.cvtColor(self._bgr, cv2.COLOR_BGR2YUV_I420, dst=dst)
+
+    def convert(self, bgra: np.ndarray, dst: np.ndarray, step: int = 1):
+        """BGRA → BGR no canvas `dst`, cortando/completando a preto se os tamanhos diferirem.
+
+        Com step > 1 lê-se só 1 píxel em cada `step` (vista com strides, sem
+        cópia); `dst` tem então a forma scaled_shape(step).
+        """
+        if step > 1:
+            bgra = bgra[::step, ::step]
+        if self.full:
+            cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=dst)
+            return
+        dst.fill(0)
+        dx, dy = (-(-v // step) for v in self.offset)
+        h = min(bgra.shape[0], dst.shape[0] - dy)
+        w = min(bgra.shape[1], dst.shape[1] - dx)
+        if h > 0 and w > 0:
+            cv2.cvtColor(bgra[:h, :w], cv2.COLOR_BGRA2BGR, dst=dst[dy:dy + h, dx:dx + w])
+
+
+class LatestFrameSource(threading.Thread):
+    """Captura uma fonte na sua própria thread e ritmo, guardando só o último frame (BGR).
+
+    Quem consome (o compositor) lê `latest` sem esperar pela captura; frames
+    que ninguém chegou a ler são simplesmente substituídos.
+    """
+    def __init__(self, name: str, fps: int):
+        super().__init__(daemon=True, name=f"qtrec-src-{name}")
+        self.interval = 1.0 / max(1, int(fps))
+        self.latest = SafeFrameBuffer()
+        self.stats = StageStats(name)
+        self.error: Exception | None = None
+        self.pool: FramePool | None = None
+        self._running = threading.Event()
+        self._running.set()
+
+    def stop(self):
+        self._running.clear()
+
+    def _open(self):
+        pass
+
+    def _grab(self) -> PooledFrame | None:
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def run(self):
+        try:
+            self._open()
+            next_t = time.perf_counter()
+            while self._running.is_set():
+                t0 = time.perf_counter()
+                pf = self._grab()
+                if pf is None:
+                    break
+                self.latest.set(pf)
+                pf.release()
+                self.stats.add(time.perf_counter() - t0)
+                # prazos absolutos; se a captura se atrasar, recomeça a grelha em vez de acumular atraso
+                next_t = max(next_t + self.interval, time.perf_counter() - self.interval)
+                delay = next_t - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._close()
+            self.latest.clear()
+
+
+class ScreenSource(LatestFrameSource):
+    """Ecrã/janela/região via mss (o objeto mss é criado na própria thread)."""
+    def __init__(self, region: CaptureRegion | None, fps: int, monitor: int = 1,
+                 tracker: WindowTracker | None = None):
+        super().__init__('screen', fps)
+        self.region = region
+        self.monitor_index = monitor
+        self.tracker = tracker
+        self._sct = None
+        self.grabber: RegionGrabber | None = None
+
+    def _open(self):
+        self._sct = _screen_grabber()
+        if self.region is None:
+            self.region = monitor_region(self._sct, self.monitor_index)
+        self.grabber = RegionGrabber(self._sct, self.region, self.tracker)
+        # último frame + frame a ser composto + frame novo
+        self.pool = FramePool(self.grabber.canvas_shape, np.uint8, 3)
+
+    def _grab(self) -> PooledFrame | None:
+        bgra = self.grabber.grab()
+        pf = self.pool.acquire()
+        if bgra is None:
+            pf.data.fill(0)  # janela fora do ecrã
+        else:
+            self.grabber.convert(bgra, pf.data)
+        return pf
+
+    def _close(self):
+        if self._sct is not None:
+            self._sct.close()
+
+
+def _fourcc_str(value: float) -> str:
+    v = int(value)
+    return "".join(chr((v >> 8 * i) & 0xFF) for i in range(4)).strip("\0 ")
+
+
+def open_camera(index: int, fmt: CameraFormat | None = None):
+    """Abre a câmara e negoceia formato, resolução, fps e nº de buffers.
+
+    A ordem importa: o V4L2 só aceita as resoluções/fps do formato atual, por
+    isso o FOURCC é pedido primeiro. Devolve (cap, dict com os valores que a
+    câmara aceitou); diferenças face ao pedido ficam no log.
+    """
+    cap = cv2.VideoCapture(index)
+    if not cap.isOpened():
+        raise RuntimeError(f"Não foi possível acessar a câmera (índice {index}).")
+    if fmt is not None:
+        if fmt.fourcc:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fmt.fourcc.upper()))
+        if fmt.width > 0 and fmt.height > 0:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, fmt.width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, fmt.height)
+        if fmt.fps > 0:
+            cap.set(cv2.CAP_PROP_FPS, fmt.fps)
+        if fmt.buffer_size > 0:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, fmt.buffer_size)
+    got = {
+        'fourcc': _fourcc_str(cap.get(cv2.CAP_PROP_FOURCC)),
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 640),
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 480),
+        'fps': float(cap.get(cv2.CAP_PROP_FPS) or 0.0),
+    }
+    if fmt is not None:
+        refused = []
+        if fmt.fourcc and got['fourcc'] and got['fourcc'] != fmt.fourcc.upper():
+            refused.append(f"formato {fmt.fourcc}")
+        if fmt.width > 0 and fmt.height > 0 and (got['width'], got['height']) != (fmt.width, fmt.height):
+            refused.append(f"{fmt.width}x{fmt.height}")
+        if fmt.fps > 0 and got['fps'] > 0 and abs(got['fps'] - fmt.fps) > 0.5:
+            refused.append(f"{fmt.fps} fps")
+        if refused:
+            log.warning("A câmara %d não aceitou %s", index, ", ".join(refused))
+    log.info("Câmara %d: %s %dx%d @ %.3g fps", index, got['fourcc'] or "?", got['width'], got['height'], got['fps'])
+    return cap, got
+
+
+class CameraSource(LatestFrameSource):
+    """Câmara via cv2.VideoCapture, lida diretamente para buffers do pool."""
+    def __init__(self, camera_index: int, fps: int):
+        super().__init__(f'camera{camera_index}', fps)
+        self.camera_index = camera_index
+        self._cap = None
+
+    def _open(self):
+        self._cap = cv2.VideoCapture(self.camera_index)
+        if not self._cap.isOpened():
+            raise RuntimeError(f"Não foi possível acessar a câmera (índice {self.camera_index}).")
+
+    def _grab(self) -> PooledFrame | None:
+        if self.pool is None:
+            ok, frame = self._cap.read()
+            if not ok:
+                return None
+            self.pool = FramePool(frame.shape, frame.dtype, 3)
+            pf = self.pool.acquire()
+            np.copyto(pf.data, frame)
+            return pf
+        pf = self.pool.acquire()
+        ok, frame = self._cap.read(pf.data)
+        if not ok:
+            pf.release()
+            return None
+        if frame is not pf.data:
+            if frame.shape != pf.data.shape:
+                pf.release()
+                self.pool = FramePool(frame.shape, frame.dtype, 3)
+                pf = self.pool.acquire()
+            np.copyto(pf.data, frame)
+        return pf
+
+    def _close(self):
+        if self._cap is not None:
+            self._cap.release()
+
+
+_stripe_executor: ThreadPoolExecutor | None = None
+
+
+def _stripe_pool() -> ThreadPoolExecutor:
+    """Pool partilhado para o redimensionamento em faixas (criado só quando é preciso)."""
+    global _stripe_executor
+    if _stripe_executor is None:
+        _stripe_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="qtrec-resize")
+    return _stripe_executor
+
+
+class FrameResizer:
+    """Redimensionamento src → dst de tamanho fixo, com o método mais barato para a razão.
+
+    As etapas são escolhidas uma vez no construtor:
+      - redução ≥ 2×: metades sucessivas com INTER_AREA (o OpenCV tem um
+        caminho rápido para fatores inteiros), enquanto faltar ≥ 2×;
+      - fator inteiro restante: INTER_AREA (mesmo caminho rápido);
+      - resto < 2×: INTER_LINEAR, ~4× mais barato que INTER_AREA a razões
+        não inteiras e sem aliasing visível abaixo de 2×;
+      - ampliação (captura reduzida pelo controlo adaptativo): INTER_LINEAR.
+    Com `stripes` > 1 cada etapa é dividida em faixas horizontais processadas
+    em paralelo (o OpenCV liberta o GIL). As faixas começam em múltiplos
+    exatos da razão, por isso o resultado é igual ao de uma só chamada; a
+    ampliação não é dividida (cada faixa precisaria de linhas vizinhas). Por
+    omissão só se usam faixas se o OpenCV estiver limitado a 1 thread: caso
+    contrário o resize já é paralelo por dentro.
+    """
+    MIN_STRIPE_PIXELS = 1 << 18  # faixas menores que ~512x512 não compensam a sincronização
+
+    def __init__(self, src_wh: tuple[int, int], dst_wh: tuple[int, int], channels: int = 3,
+                 stripes: int | None = None):
+        self.src_wh = tuple(src_wh)
+        self.dst_wh = tuple(dst_wh)
+        if stripes is None:
+            stripes = (os.cpu_count() or 1) if cv2.getNumThreads() <= 1 else 1
+        self.stripes = max(1, int(stripes))
+        # (interpolação, buffer de destino, linhas src por bloco, linhas dst por bloco; 0 = sem faixas)
+        self.stages: list[tuple[int, np.ndarray, int, int]] = []
+        (w, h), (dw, dh) = self.src_wh, self.dst_wh
+        while w >= 2 * dw and h >= 2 * dh and w % 2 == 0 and h % 2 == 0 and (w, h) != (2 * dw, 2 * dh):
+            w, h = w // 2, h // 2
+            self._add_stage(cv2.INTER_AREA, w, h, channels, 2, 1)
+        if (w, h) != (dw, dh):
+            if w % dw == 0 and h % dh == 0 and w // dw == h // dh:
+                self._add_stage(cv2.INTER_AREA, dw, dh, channels, h // dh, 1)
+            elif w < 2 * dw and h < 2 * dh:
+                # faixas só quando as linhas também reduzem (a ampliar, a faixa precisaria de linhas vizinhas)
+                r = Fraction(h, dh)
+                rows = (r.numerator, r.denominator) if h >= dh else (0, 0)
+                self._add_stage(cv2.INTER_LINEAR, dw, dh, channels, *rows)
+            else:
+                # razão grande e não inteira (dimensões ímpares): INTER_AREA genérico, sem faixas
+                self._add_stage(cv2.INTER_AREA, dw, dh, channels, 0, 0)
+
+    def _add_stage(self, interp: int, w: int, h: int, channels: int, src_rows: int, dst_rows: int):
+        shape = (h, w) if channels == 1 else (h, w, channels)  # 1 canal: plano 2-D (p.ex. Y/U/V do I420)
+        self.stages.append((interp, np.empty(shape, np.uint8), src_rows, dst_rows))
+
+    def describe(self) -> str:
+        names = {cv2.INTER_AREA: 'area', cv2.INTER_LINEAR: 'linear'}
+        return " → ".join(f"{names[i]} {b.shape[1]}x{b.shape[0]}" for i, b, _, _ in self.stages) or "cópia"
+
+    def resize(self, frame: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """Devolve o frame redimensionado em `out` ou num buffer interno (válido até à próxima chamada)."""
+        if not self.stages:
+            if out is None:
+                return frame
+            np.copyto(out, frame)
+            return out
+        src = frame
+        last = len(self.stages) - 1
+        for k, (interp, dst, src_rows, dst_rows) in enumerate(self.stages):
+            if k == last and out is not None:
+                dst = out
+            self._run_stage(src, dst, interp, src_rows, dst_rows)
+            src = dst
+        return src
+
+    def _run_stage(self, src: np.ndarray, dst: np.ndarray, interp: int, src_rows: int, dst_rows: int):
+        dh, dw = dst.shape[:2]
+        n = min(self.stripes, dh * dw // self.MIN_STRIPE_PIXELS)
+        blocks = dh // dst_rows if dst_rows else 0
+        if n <= 1 or blocks < n:
+            cv2.resize(src, (dw, dh), dst=dst, interpolation=interp)
+            return
+        # faixa k: blocos [k*blocks/n, (k+1)*blocks/n) → linhas proporcionais em src e dst
+        edges = [blocks * k // n for k in range(n)] + [blocks]
+        pool = _stripe_pool()
+        jobs = []
+        for b0, b1 in zip(edges, edges[1:]):
+            y0, y1 = b0 * dst_rows, (b1 * dst_rows if b1 < blocks else dh)
+            s0, s1 = b0 * src_rows, (b1 * src_rows if b1 < blocks else src.shape[0])
+            jobs.append(pool.submit(cv2.resize, src[s0:s1], (dw, y1 - y0), dst=dst[y0:y1], interpolation=interp))
+        for job in jobs:
+            job.result()
+
+
+def i420_planes(buf: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vistas (Y, U, V) sobre um frame I420 contíguo de forma (h*3/2, w)."""
+    rows, w = buf.shape
+    h = rows * 2 // 3
+    flat = buf.reshape(-1)
+    q = (h // 2) * (w // 2)
+    return buf[:h], flat[h * w:h * w + q].reshape(h // 2, w // 2), flat[h * w + q:].reshape(h // 2, w // 2)
+
+
+class I420Resizer:
+    """FrameResizer aplicado a cada plano de um frame I420 (1,5 bytes/píxel em vez dos 3 do BGR)."""
+    def __init__(self, src_wh: tuple[int, int], dst_wh: tuple[int, int]):
+        (w, h), (dw, dh) = src_wh, dst_wh
+        self.src_wh = tuple(src_wh)
+        self.dst_wh = tuple(dst_wh)
+        self._luma = FrameResizer((w, h), (dw, dh), 1)
+        self._chroma = FrameResizer((w // 2, h // 2), (dw // 2, dh // 2), 1)
+        self._out = np.empty((dh * 3 // 2, dw), np.uint8)
+        self._out_planes = i420_planes(self._out)
+
+    def describe(self) -> str:
+        return f"I420 (Y: {self._luma.describe()}; U/V: {self._chroma.describe()})"
+
+    def resize(self, frame: np.ndarray) -> np.ndarray:
+        (y, u, v), (oy, ou, ov) = i420_planes(frame), self._out_planes
+        self._luma.resize(y, oy)
+        self._chroma.resize(u, ou)
+        self._chroma.resize(v, ov)
+        return self._out
+
+
+class Compositor:
+    """Compõe a fonte principal e as sobreposições num frame de saída BGR.
+
+    Os retângulos (ROI) de cada sobreposição são calculados uma vez por forma
+    de fonte e guardados como slices; cada sobreposição é redimensionada para
+    um buffer próprio só quando chega um frame novo dessa fonte. Por frame
+    há apenas cópias/resizes para buffers já existentes.
+    """
+    def __init__(self, out_wh: tuple[int, int], overlays: list[OverlaySpec]):
+        self.out_w, self.out_h = out_wh
+        self.overlays = list(overlays)
+        n = len(self.overlays)
+        self._rois: list[tuple[slice, slice] | None] = [None] * n
+        self._src_shapes: list[tuple | None] = [None] * n
+        self._scaled: list[np.ndarray | None] = [None] * n
+        self._seqs = [-1] * n
+        self._base_resizer: FrameResizer | None = None
+
+    def _roi(self, spec: OverlaySpec, src_h: int, src_w: int) -> tuple[slice, slice]:
+        w = max(2, min(self.out_w - 2 * spec.margin, int(self.out_w * spec.scale)))
+        h = max(2, min(self.out_h - 2 * spec.margin, int(round(w * src_h / src_w))))
+        x = spec.margin if spec.position.endswith('left') else self.out_w - spec.margin - w
+        y = spec.margin if spec.position.startswith('top') else self.out_h - spec.margin - h
+        return slice(y, y + h), slice(x, x + w)
+
+    def compose(self, base: np.ndarray, overlays: list[tuple[np.ndarray | None, int]], dst: np.ndarray):
+        if base.shape[:2] == (self.out_h, self.out_w):
+            np.copyto(dst, base)
+        else:
+            rs = self._base_resizer
+            if rs is None or rs.src_wh != (base.shape[1], base.shape[0]):
+                rs = self._base_resizer = FrameResizer((base.shape[1], base.shape[0]), (self.out_w, self.out_h))
+            np.copyto(dst, rs.resize(base))
+        for i, (frame, seq) in enumerate(overlays):
+            if frame is None:
+                continue
+            if frame.shape != self._src_shapes[i]:
+                ys, xs = self._rois[i] = self._roi(self.overlays[i], frame.shape[0], frame.shape[1])
+                self._scaled[i] = np.empty((ys.stop - ys.start, xs.stop - xs.start, 3), np.uint8)
+                self._src_shapes[i] = frame.shape
+                self._seqs[i] = -1
+            scaled = self._scaled[i]
+            if seq != self._seqs[i]:
+                # sobreposição pequena: INTER_LINEAR custa ~1/8 do INTER_AREA numa redução 4x
+                cv2.resize(frame, (scaled.shape[1], scaled.shape[0]), dst=scaled, interpolation=cv2.INTER_LINEAR)
+                self._seqs[i] = seq
+            ys, xs = self._rois[i]
+            np.copyto(dst[ys, xs], scaled)
+
+
+class MotionEvent:
+    """Um evento da gravação por movimento: ficheiro, fila, linha temporal e thread de codificação próprios."""
+    def __init__(self, index: int, path: str, t0: float, fps: int, vfr: bool, queue_size: int, policy: str):
+        self.index = index
+        self.path = path
+        self.t0 = t0  # prazo da grelha de captura do primeiro frame (o mais antigo do pre-roll)
+        self.t_wall = time.time() - (time.perf_counter() - t0)
+        self.queue = FrameQueue(queue_size, policy, on_drop=FrameItem.release)
+        self.scheduler = FrameScheduler(fps, vfr)
+        self.scheduler.t0 = t0
+        self.timestamps_path = path + '.timestamps.txt' if vfr else None
+        self.pre_roll = 0.0
+        self.peak_area = 0.0
+        self.thread: threading.Thread | None = None
+
+    def record(self, session_t0: float) -> dict:
+        """Linha do índice de eventos."""
+        frames = self.scheduler.next_slot
+        duration = frames / self.scheduler.fps
+        return {
+            'index': self.index,
+            'file': os.path.basename(self.path),
+            'start': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.t_wall)),
+            'offset_s': round(self.t0 - session_t0, 3),
+            'duration_s': round(duration, 3),
+            'frames': frames,
+            'pre_roll_s': round(self.pre_roll, 3),
+            'peak_area': round(self.peak_area, 4),
+        }
+
+
+class RecorderThread(threading.Thread):
+    def __init__(self, *, mode: str, file_path: str, fps: int = 20,
+                 camera_index: int = 0, region: CaptureRegion | None = None,
+                 codec: str = 'mp4v', out_size: Tuple[int, int] | None = None,
+                 preview_buf: SafeFrameBuffer | None = None,
+                 preview_size: Tuple[int, int] = (480, 300), preview_fps: int = 10,
+                 running_flag: threading.Event | None = None,
+                 queue_size: int = 8, drop_policy: str = 'drop-oldest',
+                 encode_opts: EncodeOptions | None = None, vfr: bool = False,
+                 skip_unchanged: bool = False, replay_seconds: float = 0.0,
+                 replay_max_mb: int = 256, av_sync: AVSync | None = None,
+                 telemetry: Telemetry | None = None, overlays: list[OverlaySpec] | None = None,
+                 monitor: int = 1, window=None, track_interval: float = 0.25, adaptive: bool = False,
+                 camera_format: CameraFormat | None = None, camera_passthrough: bool = False,
+                 spool_mb: int = 0, motion: MotionOptions | None = None):
+        super().__init__(daemon=True)
+        self.mode = mode            # 'camera' | 'screen' | 'window'
+        self.file_path = file_path
+        self.fps = max(1, int(fps))
+        self.camera_index = camera_index
+        self.camera_format = camera_format
+        # câmara MJPEG sem redimensionamento: JPEGs copiados para o contentor, decode só para a pré-visualização
+        self.camera_passthrough = camera_passthrough
+        self.camera_info: dict | None = None  # formato negociado, preenchido ao abrir a câmara
+        self.passthrough_active = False
+        self.region = region
+        self.monitor = monitor      # índice mss sem região: 0 = todos os monitores, 1.. = um monitor
+        # modo janela: seguir a janela (pygetwindow) se se mover/redimensionar; 0 = região fixa
+        self.tracker: WindowTracker | None = None
+        if window is not None and mode != 'camera':
+            if self.region is None:
+                self.region = window_geometry(window)
+            if self.region is not None and track_interval > 0:
+                self.tracker = WindowTracker(window, self.region, track_interval)
+        self.codec = codec
+        self.out_size = out_size
+        # ecrã/janela + câmaras sobrepostas (picture-in-picture), cada fonte na sua thread
+        self.overlays = list(overlays or []) if mode != 'camera' else []
+        self.preview_buf = preview_buf
+        # a pré-visualização é reduzida aqui, ao ritmo próprio, para a GUI nunca tocar no frame inteiro
+        self.preview_enabled = preview_buf is not None
+        self.preview_size = preview_size
+        self.preview_interval = 1.0 / max(1, int(preview_fps))
+        self._preview_pool: FramePool | None = None
+        self._next_preview = 0.0
+        self.encode_opts = encode_opts  # None → cv2.VideoWriter; caso contrário ffmpeg por pipe
+        # câmara só com movimento: file_path é a base dos ficheiros por evento e do índice (sem replay nem spool)
+        self.motion = motion if (mode == 'camera' and replay_seconds <= 0) else None
+        self.motion_detector = (MotionDetector(motion.threshold, motion.min_area, motion.step)
+                                if self.motion is not None else None)
+        self.motion_index_path = motion_index_path(file_path) if self.motion is not None else None
+        self.motion_events: list[dict] = []  # um registo por evento fechado (também no índice)
+        self._motion_event: MotionEvent | None = None
+        self._motion_count = 0  # eventos abertos (o último pode ainda estar a ser fechado)
+        self._motion_lock = threading.Lock()
+        # >0 → frames crus num spool mmap de até N MB em file_path (codificado depois: transcode_spool)
+        self.spool_mb = int(spool_mb) if (replay_seconds <= 0 and self.motion is None) else 0
+        self._running = running_flag or threading.Event()
+        self._running.set()
+        # pipeline captura → fila limitada → codificação
+        self.queue = FrameQueue(queue_size, drop_policy, on_drop=FrameItem.release)
+        self.stats = {'capture': StageStats('capture'), 'encode': StageStats('encode'),
+                      'preview': StageStats('preview')}
+        self._encode_error: Exception | None = None
+        self.scheduler = FrameScheduler(self.fps, vfr)
+        self.av_sync = av_sync
+        # telemetria opcional: histogramas por etapa + <saída>.telemetry.jsonl
+        self.telemetry = telemetry
+        self.telemetry_path = file_path + '.telemetry.jsonl' if telemetry is not None else None
+        if telemetry is not None:
+            telemetry.add_counters(self.counters)
+        # ecrã/janela: frames iguais ao anterior não são convertidos nem redimensionados
+        self.damage = DamageDetector() if (skip_unchanged and mode != 'camera') else None
+        # ecrã/janela: baixar fps/resolução de captura quando o pipeline não acompanha (a composição só baixa o fps)
+        self.quality = QualityController(self.fps, scale=not self.overlays) if (adaptive and mode != 'camera') else None
+        # modo replay: nada vai para disco até save_replay()
+        self.replay = ReplayBuffer(replay_seconds, replay_max_mb * 1024 * 1024, self.fps) if replay_seconds > 0 else None
+        self.frames_written = 0
+        self.latency: deque[float] = deque(maxlen=8192)  # captura → escrito (s), últimos frames
+        self.gap_filled = 0  # slots repetidos no codificador por frames descartados na fila
+        # VFR: instante real de captura de cada frame distinto (formato "timestamp v2"; o contentor leva os pts dos slots)
+        self.timestamps_path = file_path + '.timestamps.txt' if vfr else None
+        # buffers reutilizáveis: captura, frame no codificador e o anterior (repetições)
+        self.pool: FramePool | None = None
+        self._pool_size = self.queue.maxsize + 3
+        self._resizers: dict[tuple[int, int], FrameResizer | I420Resizer] = {}
+        self._frame_size: Tuple[int, int] | None = None  # tamanho do writer quando out_size não é dado
+        self._i420_pool: FramePool | None = None  # câmara/composição: frames convertidos para I420
+        self._preview_yuv: np.ndarray | None = None
+        self.writer = None  # writer aberto (bytes_written, se o tiver, mede o débito até ao encoder)
+
+    def stop(self):
+        self._running.clear()
+
+    def run(self):
+        logger = None
+        if self.telemetry is not None:
+            logger = TelemetryLogger(self.telemetry, self.telemetry_path)
+            logger.start()
+        if self.tracker is not None:
+            self.tracker.start()
+        try:
+            if self.mode == 'camera':
+                self._record_camera()
+            elif self.overlays:
+                self._record_composite()
+            else:
+                self._record_screen_like()
+        finally:
+            if self.tracker is not None:
+                self.tracker.stop()
+            if logger is not None:
+                logger.stop()
+                logger.join()
+            # se o writer ffmpeg nunca chegou a abrir, fechar o pipe de áudio para não o bloquear
+            if self.encode_opts is not None and self.encode_opts.audio_fd is not None:
+                os.close(self.encode_opts.audio_fd)
+                self.encode_opts.audio_fd = None
+            log.info("Throughput por etapa: %s", self.stage_report())
+            self._log_fps()
+            if self.av_sync is not None and self.scheduler._t_last is not None:
+                self.av_sync.video_finished(self.scheduler._t_last + self.scheduler.interval, self.frames_written)
+        if self._encode_error is not None:
+            raise self._encode_error
+
+    def stage_report(self) -> dict:
+        report = {name: st.snapshot() for name, st in self.stats.items()}
+        report['queue'] = {'policy': self.queue.policy, 'dropped': self.queue.dropped, 'max_depth': self.queue.max_depth}
+        if self.pool is not None:
+            report['pool'] = self.pool.stats()
+        report['peak_rss_bytes'] = peak_rss_bytes()
+        if self.replay is not None:
+            report['replay'] = {'bytes': self.replay.nbytes, 'evicted_chunks': self.replay.evicted}
+        report['timing'] = dict(self.scheduler.report(), written=self.frames_written, gap_filled=self.gap_filled)
+        if self.damage is not None:
+            report['damage'] = self.damage.stats()
+        if self.tracker is not None:
+            report['window'] = self.tracker.report()
+        if self.quality is not None:
+            report['quality'] = self.quality.report()
+        if self.camera_info is not None:
+            report['camera'] = dict(self.camera_info, passthrough=self.passthrough_active)
+        if self.motion is not None:
+            report['motion'] = dict(self.motion_detector.stats(), events=len(self.motion_events))
+        if isinstance(self.writer, SpoolWriter):
+            report['spool'] = {'frames': self.writer.count, 'capacity': self.writer.capacity, 'dropped': self.writer.dropped}
+        if getattr(self.writer, 'bytes_written', 0):
+            fmt = 'MJPEG' if self.passthrough_active else 'I420' if getattr(self.writer, 'i420', False) else 'BGR'
+            report['encoder_input'] = {'format': fmt,
+                                       'MB': round(self.writer.bytes_written / 2**20, 1)}
+        return report
+
+    def counters(self) -> dict:
+        """Contadores do pipeline para a telemetria (lidos fora do caminho quente)."""
+        r = self.scheduler
+        c = {
+            'captured': r.captured,
+            'written': self.frames_written,
+            'queue_depth': len(self.queue),
+            'queue_max_depth': self.queue.max_depth,
+            'dropped': r.skipped + self.queue.dropped,
+            'duplicated': r.duplicated + self.gap_filled,
+        }
+        if self.damage is not None:
+            c['unchanged'] = self.damage.unchanged
+        if self.quality is not None:
+            c['quality_level'] = self.quality.level
+        return c
+
+    def status(self) -> dict:
+        """Estado resumido para o painel da GUI (o mesmo que o RecorderProcess recebe do worker)."""
+        return {
+            'frames_written': self.frames_written,
+            'queue_size': self.queue.maxsize,
+            'quality': self.quality.describe() if self.quality is not None else None,
+            'preview': self.stats['preview'].snapshot(),
+            'motion': self._motion_status() if self.motion is not None else None,
+        }
+
+    def _lost_frames(self) -> int:
+        """Frames descartados ou capturados tarde (sinal de saturação para o controlo adaptativo)."""
+        r = self.scheduler
+        return r.skipped + r.duplicated + self.queue.dropped + self.gap_filled
+
+    def _adapt(self, t: float) -> bool:
+        """Atualiza o controlo adaptativo; True se o degrau mudou (o stride já foi aplicado)."""
+        if not self.quality.update(t, self.stats, self._lost_frames()):
+            return False
+        self.scheduler.stride = self.quality.stride
+        return True
+
+    def _log_fps(self):
+        r = self.scheduler.report()
+        log.info("FPS alvo %d → captura %.2f fps (%s): %d capturados, %d escritos, %d duplicados, %d descartados",
+                 r['target_fps'], r['capture_fps'], r['mode'], r['captured'], self.frames_written,
+                 r['duplicated'] + self.gap_filled, r['skipped'] + self.queue.dropped)
+
+    def _start_timeline(self):
+        self.scheduler.start()
+        if self.av_sync is not None:
+            self.av_sync.video_started(self.scheduler.t0, self.fps, self.scheduler.vfr)
+
+    def _start_encoder(self, writer) -> threading.Thread:
+        t = threading.Thread(target=self._encode_loop, args=(writer,), name="qtrec-encoder", daemon=True)
+        t.start()
+        return t
+
+    def _encode_loop(self, writer, event: 'MotionEvent | None' = None):
+        """Etapa de codificação: consome a fila, redimensiona e escreve.
+
+        Slots perdidos por descartes na fila são preenchidos com o último
+        frame escrito, para a linha temporal nunca encolher (em VFR é o
+        ffmpeg que descarta essas repetições). Um evento de movimento traz a
+        sua própria fila, linha temporal e ficheiro de instantes.
+        """
+        stats = self.stats['encode']
+        frame_queue, sched, timestamps_path = ((event.queue, event.scheduler, event.timestamps_path)
+                                               if event is not None else (self.queue, self.scheduler, self.timestamps_path))
+        tel = self.telemetry
+        # spool: cada frame distinto é copiado uma vez; repetições e slots em falta só mexem no índice
+        spool = writer if isinstance(writer, SpoolWriter) else None
+        # spool e ffmpeg em VFR: as repetições são indicadas ao writer em vez de reescritas
+        repeat = writer.repeat if (spool is not None or getattr(writer, 'vfr', False)) else None
+        ts_file = open(timestamps_path, 'w') if timestamps_path else None
+        prev: PooledFrame | None = None   # mantém vivo o buffer do último frame escrito
+        prev_out: np.ndarray | None = None
+        next_slot = 0
+        try:
+            if ts_file is not None:
+                ts_file.write("# timestamp format v2\n")
+            while True:
+                item = frame_queue.get()
+                if item is None:
+                    break
+                try:
+                    t0 = time.perf_counter()
+                    gap = item.slot - next_slot
+                    if gap > 0 and prev_out is not None:
+                        if repeat is not None:
+                            gap = repeat(gap)  # o spool cheio não guarda nada
+                        else:
+                            for _ in range(gap):
+                                writer.write(prev_out)
+                        self.gap_filled += gap
+                        self.frames_written += gap
+                    if item.frame is None:
+                        # ecrã sem alterações: repetição barata do último frame (sem resize)
+                        out = prev_out
+                        if out is None:
+                            continue
+                        t_w = time.perf_counter()
+                    else:
+                        out = self._resize_if_needed(item.frame.data)
+                        t_w = time.perf_counter()
+                        if tel is not None:
+                            tel.add('resize', t_w - t0)
+                    written = item.count
+                    if repeat is None:
+                        for _ in range(item.count):
+                            writer.write(out)
+                    elif item.frame is None:
+                        written = repeat(item.count)
+                    elif spool is not None:
+                        written = spool.write_frame(out, item.ts, item.count)
+                    else:
+                        writer.write(out)
+                        repeat(item.count - 1)
+                    if tel is not None:
+                        tel.add('write', time.perf_counter() - t_w)
+                    self.frames_written += written
+                    next_slot = item.slot + item.count
+                    if ts_file is not None and item.frame is not None:
+                        ts_file.write(f"{1000.0 * (item.ts - sched.t0):.3f}\n")
+                    t1 = time.perf_counter()
+                    stats.add(t1 - t0)
+                    self.latency.append(t1 - item.ts)
+                    if item.frame is not None:
+                        prev_out = out
+                        if prev is not None:
+                            prev.release()
+                        prev = item.frame.retain()
+                finally:
+                    item.release()
+        except Exception as e:
+            # parar a captura para não acumular frames sem consumidor
+            self._encode_error = e
+            self._running.clear()
+            frame_queue.close()
+        finally:
+            if prev is not None:
+                prev.release()
+            if ts_file is not None:
+                ts_file.close()
+
+    def _stop_encoder(self, encoder: threading.Thread):
+        self.queue.close()
+        encoder.join()
+        # frames que ficaram na fila depois de um erro do codificador
+        while (item := self.queue.get()) is not None:
+            item.release()
+
+    def _update_preview(self, frame: np.ndarray, t: float):
+        """Reduz o frame ao tamanho da pré-visualização, no máximo preview_fps vezes por segundo."""
+        if not self.preview_enabled or self.preview_buf is None or t < self._next_preview:
+            return
+        t0 = time.perf_counter()
+        self._next_preview = t + self.preview_interval
+        i420 = frame.ndim == 2
+        h, w = (frame.shape[0] * 2 // 3, frame.shape[1]) if i420 else frame.shape[:2]
+        scale = min(self.preview_size[0] / w, self.preview_size[1] / h, 1.0)
+        shape = (max(1, int(h * scale)), max(1, int(w * scale)), 3)
+        if i420:
+            shape = (max(2, shape[0] & ~1), max(2, shape[1] & ~1), 3)
+        if self._preview_pool is None or self._preview_pool.shape != shape:
+            # frame mostrado + frame a ser lido pela GUI + frame novo
+            self._preview_pool = FramePool(shape, np.uint8, 3)
+        pv = self._preview_pool.acquire()
+        # INTER_LINEAR: barato mesmo em reduções grandes (4K → 480 px) e suficiente para pré-visualizar
+        if i420:
+            # reduzir os planos Y/U/V e só depois converter a cor, já com poucos píxeis
+            ph, pw = shape[:2]
+            if self._preview_yuv is None or self._preview_yuv.shape != (ph * 3 // 2, pw):
+                self._preview_yuv = np.empty((ph * 3 // 2, pw), np.uint8)
+            for src, dst in zip(i420_planes(frame), i420_planes(self._preview_yuv)):
+                cv2.resize(src, (dst.shape[1], dst.shape[0]), dst=dst, interpolation=cv2.INTER_LINEAR)
+            cv2.cvtColor(self._preview_yuv, cv2.COLOR_YUV2BGR_I420, dst=pv.data)
+        else:
+            src = frame if frame.shape[2] == 3 else cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+            cv2.resize(src, (shape[1], shape[0]), dst=pv.data, interpolation=cv2.INTER_LINEAR)
+        self.preview_buf.set(pv)
+        pv.release()
+        dt = time.perf_counter() - t0
+        self.stats['preview'].add(dt)
+        if self.telemetry is not None:
+            self.telemetry.add('preview', dt)
+
+    def _publish(self, pf: PooledFrame, t_capture: float, preview: bool = True):
+        """Entrega o frame (por referência) à pré-visualização e à fila do codificador."""
+        if preview:
+            self._update_preview(pf.data, t_capture)
+        slot, count = self.scheduler.place(t_capture)
+        if count == 0:
+            pf.release()
+            return
+        # em caso de descarte, a fila devolve o buffer ao pool
+        self.queue.put(FrameItem(pf, slot, count, t_capture))
+
+    def _publish_repeat(self, t_capture: float):
+        """Frame igual ao anterior: ocupa os slots com uma repetição (em VFR descartada pelo ffmpeg, não pelo pipe)."""
+        slot, count = self.scheduler.place(t_capture)
+        if count > 0:
+            self.queue.put(FrameItem(None, slot, count, t_capture))
+
+    def save_replay(self, path: str, seconds: float | None = None) -> str:
+        """Grava os últimos `seconds` (por omissão a janela inteira) do buffer de replay."""
+        if self.replay is None:
+            raise RuntimeError("A gravação não está em modo replay.")
+        return self.replay.save(path, seconds)
+
+    def _open_writer(self, size_wh: tuple[int, int], path: str | None = None):
+        path = path or self.file_path
+        if self.spool_mb > 0:
+            writer = SpoolWriter(path, size_wh, float(self.fps), max_bytes=self.spool_mb << 20,
+                                 i420=self.encode_opts is not None and self.encode_opts.i420, on_full=self.stop)
+        elif self.replay is not None:
+            writer = ReplayEncoder(self.replay, size_wh, float(self.fps), self.encode_opts or EncodeOptions())
+        elif self.encode_opts is not None and self.encode_opts.segment_seconds > 0:
+            writer = SegmentedEncoder(path, size_wh, float(self.fps), self.encode_opts)
+        elif self.encode_opts is not None:
+            writer = FFmpegPipeWriter(path, size_wh, float(self.fps), self.encode_opts, vfr=self.scheduler.vfr)
+        else:
+            fourcc = cv2.VideoWriter_fourcc(*self.codec.upper())
+            writer = cv2.VideoWriter(path, fourcc, float(self.fps), size_wh)
+            if not writer.isOpened():
+                raise RuntimeError("Não foi possível abrir o VideoWriter. Tente outro codec/ficheiro.")
+        self.writer = writer
+        return writer
+
+    def _setup_i420(self, out_wh: tuple[int, int], src_wh: tuple[int, int] | None = None) -> bool:
+        """Confirma a conversão I420 na captura pedida em encode_opts; desliga-a (com aviso) se não servir."""
+        opts = self.encode_opts
+        if opts is None or not opts.i420:
+            return False
+        if opts.pix_fmt != 'yuv420p':
+            why = f"o encoder usa {opts.pix_fmt}"
+        elif any(v % 2 for v in (*out_wh, *(src_wh or ()))):
+            why = "largura/altura ímpar"
+        else:
+            return True
+        log.warning("Conversão I420 na captura desligada (%s): frames BGR até ao ffmpeg", why)
+        self.encode_opts = replace(opts, i420=False)
+        return False
+
+    def _to_i420(self, pf: PooledFrame) -> PooledFrame:
+        """BGR → I420 num buffer de outro pool; o frame BGR volta logo ao seu pool."""
+        h, w = pf.data.shape[:2]
+        shape = (h * 3 // 2, w)
+        if self._i420_pool is None or self._i420_pool.shape != shape:
+            self._i420_pool = FramePool(shape, np.uint8, self._pool_size)
+        out = self._i420_pool.acquire()
+        cv2.cvtColor(pf.data, cv2.COLOR_BGR2YUV_I420, dst=out.data)
+        pf.release()
+        return out
+
+    def _resize_if_needed(self, frame: np.ndarray) -> np.ndarray:
+        size = self.out_size or self._frame_size
+        if size is None:
+            return frame
+        w, h = size
+        i420 = frame.ndim == 2  # I420: plano (h*3/2, w)
+        src_wh = (frame.shape[1], frame.shape[0] * 2 // 3) if i420 else (frame.shape[1], frame.shape[0])
+        if w > 0 and h > 0 and src_wh != (w, h):
+            # um resizer por tamanho de origem (muda com a decimação do controlo adaptativo);
+            # o buffer de saída é reutilizado: o writer consome o frame antes do próximo resize
+            rs = self._resizers.get(src_wh)
+            if rs is None or rs.dst_wh != (w, h):
+                rs = I420Resizer(src_wh, (w, h)) if i420 else FrameResizer(src_wh, (w, h), frame.shape[2])
+                self._resizers[src_wh] = rs
+                log.debug("Redimensionamento %dx%d → %dx%d: %s", *src_wh, w, h, rs.describe())
+            return rs.resize(frame)
+        return frame
+
+    def _record_camera(self):
+        cap, info = open_camera(self.camera_index, self.camera_format)
+        self.camera_info = info
+        try:
+            if self.camera_passthrough and self._passthrough_possible(cap, info):
+                self.passthrough_active = True
+                self._record_camera_mjpeg(cap, (info['width'], info['height']))
+            elif self.motion is not None:
+                self._record_camera_motion(cap, info['width'], info['height'])
+            else:
+                self._record_camera_decoded(cap, info['width'], info['height'])
+        finally:
+            cap.release()
+
+    def _passthrough_possible(self, cap, info: dict) -> bool:
+        """Verifica se os JPEG da câmara podem ir diretos para o contentor (lê um frame de teste)."""
+        if self.out_size and tuple(self.out_size) != (info['width'], info['height']):
+            why = "há redimensionamento"
+        elif (self.encode_opts is None or self.encode_opts.segment_seconds > 0 or self.replay is not None
+              or self.spool_mb > 0 or self.motion is not None):
+            why = "precisa do ffmpeg em direto, sem segmentos, replay, spool nem gravação por movimento"
+        elif info['fourcc'] != 'MJPG':
+            why = f"a câmara entrega {info['fourcc'] or '?'} e não MJPG"
+        else:
+            # sem conversão o backend (V4L2, MSMF) devolve o buffer comprimido tal como veio do driver
+            if cap.set(cv2.CAP_PROP_CONVERT_RGB, 0):
+                ok, buf = cap.read()
+                if ok and buf is not None and buf.ndim <= 2 and buf.size > 2 and buf.reshape(-1)[:2].tobytes() == b'\xff\xd8':
+                    return True
+                cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+            why = "o backend do OpenCV não entrega os frames comprimidos"
+        log.warning("Cópia MJPEG direta desligada (%s): a descodificar e recodificar", why)
+        return False
+
+    def _jpeg_preview_flag(self, size_wh: tuple[int, int]) -> int:
+        """imdecode já reduzido (1/2, 1/4, 1/8 no próprio IDCT) quando a pré-visualização é pequena."""
+        ratio = min(size_wh[0] / max(1, self.preview_size[0]), size_wh[1] / max(1, self.preview_size[1]))
+        for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                             (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if ratio >= factor:
+                return flag
+        return cv2.IMREAD_COLOR
+
+    def _record_camera_mjpeg(self, cap, size_wh: tuple[int, int]):
+        writer = self.writer = MJPEGPipeWriter(self.file_path, size_wh, float(self.fps), self.encode_opts)
+        encoder = self._start_encoder(writer)
+        stats = self.stats['capture']
+        sched = self.scheduler
+        tel = self.telemetry
+        preview_flag = self._jpeg_preview_flag(size_wh)
+        self._start_timeline()
+        try:
+            while self._running.is_set():
+                sched.wait()
+                t0 = time.perf_counter()
+                ok, buf = cap.read()
+                if not ok:
+                    break
+                buf = buf.reshape(-1)
+                if tel is not None:
+                    tel.add('grab', time.perf_counter() - t0)
+                if self.preview_enabled and t0 >= self._next_preview:
+                    # só os frames mostrados são descodificados
+                    img = cv2.imdecode(buf, preview_flag)
+                    if img is not None:
+                        self._update_preview(img, t0)
+                self._publish(EncodedFrame(buf), t0, preview=False)
+                stats.add(time.perf_counter() - t0)
+        finally:
+            self._stop_encoder(encoder)
+            writer.release()
+
+    def _read_camera(self, cap) -> PooledFrame | None:
+        """Lê um frame da câmara para um buffer do pool; None quando a câmara deixa de entregar."""
+        if self.pool is None:
+            ok, frame = cap.read()
+            if not ok:
+                return None
+            # o primeiro frame define a forma dos buffers do pool
+            self.pool = FramePool(frame.shape, frame.dtype, self._pool_size)
+            pf = self.pool.acquire()
+            np.copyto(pf.data, frame)
+            return pf
+        pf = self.pool.acquire()
+        ok, frame = cap.read(pf.data)  # decodifica diretamente no buffer
+        if not ok:
+            pf.release()
+            return None
+        if frame is not pf.data:
+            # o backend alocou um array novo (ex.: formato mudou): copiar para o pool
+            if frame.shape != pf.data.shape:
+                pf.release()
+                self.pool = FramePool(frame.shape, frame.dtype, self._pool_size)
+                pf = self.pool.acquire()
+            np.copyto(pf.data, frame)
+        return pf
+
+    def _record_camera_decoded(self, cap, width: int, height: int):
+        # respeitar out_size se definido
+        target_size = (self.out_size[0], self.out_size[1]) if self.out_size else (width, height)
+        i420 = self._setup_i420(target_size, (width, height))
+        writer = self._open_writer(target_size)
+        encoder = self._start_encoder(writer)
+        stats = self.stats['capture']
+        sched = self.scheduler
+        tel = self.telemetry
+        self._start_timeline()
+        try:
+            while self._running.is_set():
+                sched.wait()
+                t0 = time.perf_counter()
+                pf = self._read_camera(cap)
+                if pf is None:
+                    break
+                if tel is not None:
+                    t1 = time.perf_counter()
+                    tel.add('grab', t1 - t0)
+                if i420:
+                    # pré-visualização ainda do BGR; só o I420 (metade dos bytes) segue para o codificador
+                    self._update_preview(pf.data, t0)
+                    pf = self._to_i420(pf)
+                    if tel is not None:
+                        tel.add('convert', time.perf_counter() - t1)
+                self._publish(pf, t0, preview=not i420)
+                stats.add(time.perf_counter() - t0)
+        finally:
+            self._stop_encoder(encoder)
+            writer.release()
+
+    def _record_camera_motion(self, cap, width: int, height: int):
+        """Câmara gravada só com movimento: um ficheiro por evento, com pre-roll e post-roll.
+
+        Em repouso cada frame só é lido, comparado (MotionDetector, no máximo
+        check_fps vezes por segundo) e guardado por referência num anel de
+        pre-roll; nada é convertido, redimensionado nem codificado. Com
+        movimento abre-se um evento: os frames do anel seguem primeiro, com
+        os seus instantes reais, e depois os novos até `post_roll` s após o
+        último movimento. Cada evento tem fila, linha temporal e thread de
+        codificação próprias; a thread abre e fecha o ficheiro sem parar a
+        captura e, no fim, acrescenta o evento ao índice JSON-lines.
+        """
+        opts = self.motion
+        target_size = (self.out_size[0], self.out_size[1]) if self.out_size else (width, height)
+        i420 = self._setup_i420(target_size, (width, height))
+        detector = self.motion_detector
+        # o anel guarda buffers do pool: reservá-los já, dentro do limite de memória
+        ring_size = max(0, min(int(opts.pre_roll * self.fps), (opts.max_mb << 20) // max(1, width * height * 3)))
+        if ring_size < int(opts.pre_roll * self.fps):
+            log.warning("Pre-roll limitado a %.1f s pelo limite de %d MB", ring_size / self.fps, opts.max_mb)
+        self._pool_size = self.queue.maxsize + 3 + ring_size
+        preroll: deque[tuple[PooledFrame, float]] = deque()
+        pace = self.scheduler  # cadência da captura; a linha temporal de cada evento é a do evento
+        session_queue = self.queue
+        stats = self.stats['capture']
+        tel = self.telemetry
+        check_interval = 1.0 / max(0.1, opts.check_fps)
+        t_check = 0.0
+        last_motion = None
+        event: MotionEvent | None = None
+        events: list[MotionEvent] = []
+        with open(self.motion_index_path, 'a'):
+            pass  # o índice existe mesmo sem eventos
+        pace.start()
+        try:
+            while self._running.is_set():
+                pace.wait()
+                t0 = time.perf_counter()
+                pf = self._read_camera(cap)
+                if pf is None:
+                    break
+                pace.skip(t0)
+                if tel is not None:
+                    tel.add('grab', time.perf_counter() - t0)
+                if t0 >= t_check:
+                    t_check = t0 + check_interval
+                    if detector.update(pf.data):
+                        last_motion = t0
+                moving = last_motion is not None and t0 - last_motion <= opts.post_roll
+                if event is None and moving:
+                    event = self._open_motion_event(target_size, t0, preroll, i420, pace)
+                    events.append(event)
+                elif event is not None and not moving:
+                    self._close_motion_event(event, pace, session_queue)
+                    event = None
+                self._update_preview(pf.data, t0)
+                if event is None:
+                    preroll.append((pf, t0))
+                    if len(preroll) > ring_size:
+                        preroll.popleft()[0].release()
+                else:
+                    event.peak_area = max(event.peak_area, detector.area)
+                    if i420:
+                        pf = self._to_i420(pf)
+                    self._publish(pf, t0, preview=False)
+                stats.add(time.perf_counter() - t0)
+        finally:
+            while preroll:
+                preroll.popleft()[0].release()
+            if event is not None:
+                self._close_motion_event(event, pace, session_queue)
+            for ev in events:
+                ev.thread.join()
+
+    def _open_motion_event(self, size_wh: tuple[int, int], t: float, preroll: deque, i420: bool,
+                           pace: FrameScheduler) -> MotionEvent:
+        t_first = preroll[0][1] if preroll else t
+        self._motion_count += 1
+        index = self._motion_count
+        t_wall = time.time() - (time.perf_counter() - t_first)
+        # t0 do evento no prazo da grelha da captura em que o primeiro frame foi lido: as capturas
+        # chegam um pouco depois de cada prazo, e um t0 nesse instante faria os slots cair em cima delas
+        t_grid = pace.t0 + int((t_first - pace.t0) * pace.fps) * pace.interval
+        # a fila do evento leva o pre-roll inteiro de uma vez sem descartar nada
+        event = MotionEvent(index, motion_event_path(self.file_path, index, t_wall), t_grid, self.fps,
+                            pace.vfr, self.queue.maxsize + len(preroll), self.queue.policy)
+        event.pre_roll = t - t_first
+        self.scheduler, self.queue, self._motion_event = event.scheduler, event.queue, event
+        event.thread = threading.Thread(target=self._run_motion_event, args=(event, size_wh, pace.t0),
+                                        name=f"qtrec-motion-{index}", daemon=True)
+        event.thread.start()
+        while preroll:
+            pf, ts = preroll.popleft()
+            self._publish(self._to_i420(pf) if i420 else pf, ts, preview=False)
+        log.info("Movimento: evento %d → %s (pre-roll %.1f s)", index, event.path, event.pre_roll)
+        return event
+
+    def _close_motion_event(self, event: MotionEvent, pace: FrameScheduler, session_queue: FrameQueue):
+        """Fecha a fila do evento (a sua thread termina o ficheiro) e volta à captura em repouso."""
+        event.queue.close()
+        pace.duplicated += event.scheduler.duplicated
+        pace.skipped += event.scheduler.skipped
+        session_queue.dropped += event.queue.dropped
+        session_queue.max_depth = max(session_queue.max_depth, event.queue.max_depth)
+        self.scheduler, self.queue, self._motion_event = pace, session_queue, None
+
+    def _run_motion_event(self, event: MotionEvent, size_wh: tuple[int, int], session_t0: float):
+        writer = None
+        try:
+            writer = self._open_writer(size_wh, event.path)
+            self._encode_loop(writer, event)
+        except Exception as e:
+            self._encode_error = e
+            self._running.clear()
+            event.queue.close()
+        finally:
+            while (item := event.queue.get()) is not None:
+                item.release()
+            if writer is not None:
+                writer.release()
+        record = event.record(session_t0)
+        log.info("Movimento: evento %d gravado (%.1f s, %d frames)", event.index, record['duration_s'],
+                 record['frames'])
+        with self._motion_lock:
+            self.motion_events.append(record)
+            with open(self.motion_index_path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+
+    def _motion_status(self) -> dict:
+        event = self._motion_event
+        return {'events': self._motion_count, 'recording': event is not None,
+                'area': self.motion_detector.area}
+
+    def _record_screen_like(self):
+        with _screen_grabber() as sct:
+            region = self.region if self.region is not None else monitor_region(sct, self.monitor)
+            grabber = RegionGrabber(sct, region, self.tracker)
+            canvas_h, canvas_w = grabber.canvas_shape[:2]
+            # respeitar out_size
+            out_w = self.out_size[0] if self.out_size else canvas_w
+            out_h = self.out_size[1] if self.out_size else canvas_h
+            self._frame_size = (out_w, out_h)
+            # I420: BGRA → YUV numa só passagem, já decimada; o resize passa a ser por plano
+            i420 = self._setup_i420((out_w, out_h))
+            shape_for = grabber.i420_shape if i420 else grabber.scaled_shape
+            convert = grabber.convert_i420 if i420 else grabber.convert
+            writer = self._open_writer((out_w, out_h))
+            encoder = self._start_encoder(writer)
+            stats = self.stats['capture']
+            self.pool = FramePool(shape_for(1), np.uint8, self._pool_size)
+            pools = {1: self.pool}   # um pool por decimação usada pelo controlo adaptativo
+            step = 1
+            sched = self.scheduler
+            tel = self.telemetry
+            self._start_timeline()
+            try:
+                while self._running.is_set():
+                    sched.wait()
+                    t0 = time.perf_counter()
+                    if self.quality is not None and self._adapt(t0):
+                        step = self.quality.step
+                        if step not in pools:
+                            pools[step] = FramePool(shape_for(step), np.uint8, self._pool_size)
+                    # vista sem cópia sobre o buffer do mss → BGR contíguo num buffer do pool
+                    bgra = grabber.grab()
+                    if tel is not None:
+                        t1 = time.perf_counter()
+                        tel.add('grab', t1 - t0)
+                    if bgra is None or (self.damage is not None and not self.damage.changed(bgra)):
+                        # sem alterações (ou janela fora do ecrã): repetir o último frame
+                        self._publish_repeat(t0)
+                        stats.add(time.perf_counter() - t0)
+                        continue
+                    pf = pools[step].acquire()
+                    convert(bgra, pf.data, step)
+                    if tel is not None:
+                        tel.add('convert', time.perf_counter() - t1)
+                    # redimensionamento + escrita acontecem na etapa de codificação
+                    self._publish(pf, t0)
+                    stats.add(time.perf_counter() - t0)
+            finally:
+                self._stop_encoder(encoder)
+                writer.release()
+
+    def _record_composite(self):
+        """Ecrã/janela com câmaras sobrepostas: fontes em paralelo, composição ao ritmo de saída."""
+        main = ScreenSource(self.region, self.fps, self.monitor, self.tracker)
+        cams = [CameraSource(o.camera_index, o.fps) for o in self.overlays]
+        sources = [main, *cams]
+        for src in sources:
+            src.start()
+        encoder = writer = None
+        try:
+            # a resolução de saída só é conhecida depois da primeira captura do ecrã
+            t_limit = time.perf_counter() + 5.0
+            while main.latest.seq == 0 and main.error is None and main.is_alive() and time.perf_counter() < t_limit:
+                time.sleep(0.005)
+            if main.error is not None:
+                raise main.error
+            if main.grabber is None or main.latest.seq == 0:
+                raise RuntimeError("A captura do ecrã não arrancou.")
+            out_w = self.out_size[0] if self.out_size else main.grabber.canvas_shape[1]
+            out_h = self.out_size[1] if self.out_size else main.grabber.canvas_shape[0]
+            i420 = self._setup_i420((out_w, out_h))
+            writer = self._open_writer((out_w, out_h))
+            encoder = self._start_encoder(writer)
+            compositor = Compositor((out_w, out_h), self.overlays)
+            self.pool = FramePool((out_h, out_w, 3), np.uint8, self._pool_size)
+            stats = self.stats['capture']
+            sched = self.scheduler
+            tel = self.telemetry
+            last_seqs = None
+            warned = set()
+            self._start_timeline()
+            while self._running.is_set():
+                sched.wait()
+                t0 = time.perf_counter()
+                if self.quality is not None:
+                    self._adapt(t0)
+                if main.error is not None:
+                    raise main.error
+                for cam in cams:
+                    if cam.error is not None and cam not in warned:
+                        warned.add(cam)
+                        log.warning("Sobreposição sem imagem: %s", cam.error)
+                base, base_seq = main.latest.get_with_seq()
+                frames = [cam.latest.get_with_seq() for cam in cams]
+                try:
+                    if base is None:
+                        continue
+                    seqs = (base_seq, *(seq for _, seq in frames))
+                    if seqs == last_seqs:
+                        # nenhuma fonte tem frame novo: repetição, sem compor
+                        self._publish_repeat(t0)
+                    else:
+                        last_seqs = seqs
+                        pf = self.pool.acquire()
+                        t1 = time.perf_counter()
+                        compositor.compose(base.data, [(f.data if f is not None else None, seq) for f, seq in frames], pf.data)
+                        if i420:
+                            self._update_preview(pf.data, t0)
+                            pf = self._to_i420(pf)
+                        if tel is not None:
+                            tel.add('convert', time.perf_counter() - t1)
+                        self._publish(pf, t0, preview=not i420)
+                finally:
+                    if base is not None:
+                        base.release()
+                    for f, _ in frames:
+                        if f is not None:
+                            f.release()
+                stats.add(time.perf_counter() - t0)
+        finally:
+            for src in sources:
+                src.stop()
+            for src in sources:
+                src.join(timeout=2)
+            if encoder is not None:
+                self._stop_encoder(encoder)
+            if writer is not None:
+                writer.release()
+
+
+class SharedFrameRing:
+    """Anel de frames BGR em memória partilhada: o worker escreve, a GUI lê.
+
+    Tem a interface do SafeFrameBuffer (set/get/get_with_seq/seq), por isso o
+    RecorderThread e a GUI usam-no sem saber que há dois processos. Cada slot
+    tem um cabeçalho (seq, altura, largura, canais): o escritor marca o slot
+    como ocupado (seq = -1), copia o frame e só depois publica o seq; o leitor
+    copia para um buffer seu e descarta a cópia se o seq do slot mudou entretanto
+    (seqlock, sem locks entre processos). Com 3 slots e a pré-visualização a
+    poucas dezenas de fps isso praticamente nunca acontece.
+
+    Passa para o worker por pickle (só o nome do bloco e a geometria); quem o
+    criou chama close() no fim, que também apaga o bloco. O worker arranca
+    pelo multiprocessing e partilha o resource_tracker do criador, por isso
+    abrir o bloco lá não o faz apagar quando o worker termina.
+    """
+    _FIELDS = 4  # seq, altura, largura, canais
+
+    def __init__(self, max_shape: tuple[int, int, int], slots: int = 3):
+        from multiprocessing import shared_memory
+        self._setup(max_shape, slots)
+        self._owner = True
+        self._shm = shared_memory.SharedMemory(create=True, size=self._data_offset + self.slots * self.slot_bytes)
+        self._map()
+        self._hdr[:] = 0
+
+    def _setup(self, max_shape, slots):
+        self.max_shape = tuple(int(v) for v in max_shape)
+        self.slots = max(2, int(slots))
+        self.slot_bytes = int(np.prod(self.max_shape))
+        self._data_offset = -(-8 * (1 + self._FIELDS * self.slots) // 64) * 64
+        self._pool: FramePool | None = None  # cópias do lado do leitor
+        self.oversize = 0  # frames maiores que max_shape (não publicados)
+
+    def _map(self):
+        n = 1 + self._FIELDS * self.slots
+        self._hdr = np.ndarray((n,), np.int64, self._shm.buf)  # [0] = seq do último frame publicado
+        self._slot_hdr = self._hdr[1:].reshape(self.slots, self._FIELDS)
+        self._data = np.ndarray((self.slots, self.slot_bytes), np.uint8, self._shm.buf, self._data_offset)
+
+    @classmethod
+    def _attach(cls, name: str, max_shape, slots: int) -> 'SharedFrameRing':
+        from multiprocessing import shared_memory
+        ring = cls.__new__(cls)
+        ring._setup(max_shape, slots)
+        ring._owner = False
+        ring._shm = shared_memory.SharedMemory(name)
+        ring._map()
+        return ring
+
+    def __reduce__(self):
+        return SharedFrameRing._attach, (self._shm.name, self.max_shape, self.slots)
+
+    @property
+    def seq(self) -> int:
+        return int(self._hdr[0]) if self._hdr is not None else 0
+
+    def set(self, frame: PooledFrame):
+        """Escritor (um só): copia o frame para o slot seguinte e publica-o."""
+        data = frame.data
+        if data.ndim != 3 or data.nbytes > self.slot_bytes:
+            self.oversize += 1
+            return
+        seq = int(self._hdr[0]) + 1
+        i = seq % self.slots
+        head = self._slot_hdr[i]
+        head[0] = -1
+        np.copyto(self._data[i, :data.nbytes].reshape(data.shape), data)
+        head[1:] = data.shape
+        head[0] = seq
+        self._hdr[0] = seq
+
+    def get_with_seq(self) -> tuple[Optional[PooledFrame], int]:
+        """Cópia local do último frame publicado (o chamador faz release()) e o seu seq."""
+        seq = self.seq
+        if seq == 0:
+            return None, 0
+        i = seq % self.slots
+        head = self._slot_hdr[i]
+        shape = tuple(int(v) for v in head[1:])
+        if head[0] != seq or int(np.prod(shape)) > self.slot_bytes:
+            return None, seq
+        if self._pool is None or self._pool.shape != shape:
+            self._pool = FramePool(shape, np.uint8, 2)
+        pf = self._pool.acquire()
+        np.copyto(pf.data, self._data[i, :pf.data.nbytes].reshape(shape))
+        if head[0] != seq:  # o escritor deu a volta ao anel durante a cópia
+            pf.release()
+            return None, seq
+        return pf, seq
+
+    def get(self) -> Optional[PooledFrame]:
+        return self.get_with_seq()[0]
+
+    def clear(self):
+        self._hdr[0] = 0
+
+    def close(self):
+        if self._shm is None:
+            return
+        # as vistas numpy têm de sair antes de fechar o mapeamento
+        self._hdr = self._slot_hdr = self._data = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+
+class _AVSyncRelay(AVSync):
+    """AVSync do lado do worker: os instantes do vídeo seguem também para o AVSync da GUI."""
+    def __init__(self, send):
+        super().__init__()
+        self._send = send
+
+    def video_started(self, t0: float, fps: int, vfr: bool):
+        super().video_started(t0, fps, vfr)
+        self._send('video_started', t0, fps, vfr)
+
+    def video_finished(self, t_end: float, frames: int):
+        super().video_finished(t_end, frames)
+        self._send('video_finished', t_end, frames)
+
+
+def _worker_main(conn, kwargs: dict, telemetry: bool, relay_av: bool, status_interval: float,
+                 initializer, initargs):
+    """Processo worker do RecorderProcess: um RecorderThread comandado pelo pipe."""
+    lock = threading.Lock()
+
+    def send(*msg):
+        with lock:
+            try:
+                conn.send(msg)
+            except (OSError, ValueError):  # o processo da GUI já fechou o pipe
+                pass
+
+    errors: list[str] = []
+    threading.excepthook = lambda a: errors.append(f"{a.exc_type.__name__}: {a.exc_value}")
+    try:
+        if initializer is not None:
+            initializer(*initargs)
+        rec = RecorderThread(telemetry=Telemetry() if telemetry else None,
+                             av_sync=_AVSyncRelay(send) if relay_av else None, **kwargs)
+        rec.start()
+        connected = True
+        t_status = 0.0
+        while rec.is_alive():
+            if not connected:
+                rec.join(status_interval)
+            elif conn.poll(status_interval):
+                try:
+                    cmd, *args = conn.recv()
+                except EOFError:
+                    # a GUI terminou sem parar: fechar a gravação na mesma
+                    connected = False
+                    rec.stop()
+                    continue
+                if cmd == 'stop':
+                    rec.stop()
+                elif cmd == 'preview':
+                    rec.preview_enabled = bool(args[0])
+            now = time.perf_counter()
+            if now >= t_status:
+                t_status = now + status_interval
+                send('status', dict(rec.status(), telemetry=rec.telemetry.last if rec.telemetry else None))
+        rec.join()
+        send('done', rec.status(), rec.stage_report(), list(rec.latency),
+             rec.telemetry.totals if rec.telemetry else None)
+    except Exception as e:
+        errors.append(f"{type(e).__name__}: {e}")
+    finally:
+        if errors:
+            send('error', "; ".join(errors))
+        if kwargs.get('preview_buf') is not None:
+            kwargs['preview_buf'].close()
+        conn.close()
+
+
+class RecorderProcess:
+    """RecorderThread num processo à parte: captura e codificação fora do GIL da GUI.
+
+    Recebe os argumentos do RecorderThread que se podem serializar: não há
+    running_flag nem window (o modo janela grava a região fixa) nem replay
+    (save_replay precisa do buffer neste processo). A pré-visualização chega
+    por um SharedFrameRing; pelo pipe só passam comandos (parar, ligar a
+    pré-visualização) e, no sentido inverso, o estado a cada
+    `status_interval` s, os instantes do vídeo para o AVSync (perf_counter é
+    o mesmo relógio monotónico em todos os processos) e o relatório final.
+
+    Imita o RecorderThread no que a GUI, a CLI e o FinalizeJob usam
+    (start/stop/join/is_alive, preview_enabled, frames_written, fps, status,
+    stage_report, latency). `initializer(*initargs)` corre no worker antes
+    de gravar (p. ex. as fontes sintéticas dos benchmarks). O worker é
+    arrancado com "spawn" em todas as plataformas: fazer fork de um processo
+    com threads (e Qt) não é seguro.
+    """
+    def __init__(self, *, preview_buf: SharedFrameRing | None = None, av_sync: AVSync | None = None,
+                 telemetry: Telemetry | None = None, initializer=None, initargs: tuple = (),
+                 status_interval: float = 0.25, **kwargs):
+        import multiprocessing
+        for name in ('running_flag', 'window'):
+            if kwargs.get(name) is not None:
+                raise ValueError(f"RecorderProcess não aceita {name}")
+        if kwargs.get('replay_seconds', 0) > 0:
+            raise ValueError("O modo replay não corre num processo à parte.")
+        kwargs['preview_buf'] = preview_buf
+        self.file_path = kwargs['file_path']
+        self.fps = max(1, int(kwargs.get('fps', 20)))
+        self.replay = None
+        self.av_sync = av_sync
+        # `last` a cada estado e, no fim, os `totals` do worker (o JSON-lines fica no worker)
+        self.telemetry = telemetry
+        self.frames_written = 0
+        self.latency: list[float] = []
+        self.error: str | None = None
+        self._preview_enabled = preview_buf is not None
+        self._status: dict = {}
+        self._report: dict = {}
+        ctx = multiprocessing.get_context('spawn')
+        self._conn, child_conn = ctx.Pipe()
+        self._proc = ctx.Process(target=_worker_main, name="qtrec-worker",
+                                 args=(child_conn, kwargs, telemetry is not None, av_sync is not None,
+                                       status_interval, initializer, initargs))
+        self._child_conn = child_conn
+        self._listener = threading.Thread(target=self._listen, name="qtrec-worker-pipe", daemon=True)
+
+    def start(self):
+        self._proc.start()
+        self._child_conn.close()  # o worker tem a sua cópia: EOF aqui quando ele terminar
+        self._listener.start()
+        if not self._preview_enabled:
+            self._send('preview', False)
+
+    def _send(self, *msg):
+        try:
+            self._conn.send(msg)
+        except (OSError, ValueError):  # worker já terminou
+            pass
+
+    def stop(self):
+        self._send('stop')
+
+    @property
+    def preview_enabled(self) -> bool:
+        return self._preview_enabled
+
+    @preview_enabled.setter
+    def preview_enabled(self, value: bool):
+        if value != self._preview_enabled:
+            self._preview_enabled = value
+            if self._proc.pid is not None:
+                self._send('preview', value)
+
+    def is_alive(self) -> bool:
+        return self._proc.is_alive()
+
+    def join(self, timeout: float | None = None):
+        self._proc.join(timeout)
+        if self._proc.exitcode is None:
+            return
+        self._listener.join(timeout)
+        if self._proc.exitcode != 0 and self.error is None:
+            self.error = f"worker terminou com o código {self._proc.exitcode}"
+            log.error("Worker de gravação: %s", self.error)
+
+    def status(self) -> dict:
+        return self._status
+
+    def stage_report(self) -> dict:
+        return self._report
+
+    def _listen(self):
+        while True:
+            try:
+                kind, *args = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == 'status':
+                status = args[0]
+                sample = status.pop('telemetry', None)
+                if self.telemetry is not None and sample is not None:
+                    self.telemetry.last = sample
+                self._status = status
+                self.frames_written = status['frames_written']
+            elif kind == 'video_started' and self.av_sync is not None:
+                self.av_sync.video_started(*args)
+            elif kind == 'video_finished' and self.av_sync is not None:
+                self.av_sync.video_finished(*args)
+            elif kind == 'done':
+                self._status, self._report, self.latency, totals = args
+                if self.telemetry is not None and totals:
+                    for stage, h in totals.items():
+                        self.telemetry.totals.setdefault(stage, Histogram()).merge(h)
+                self.frames_written = self._status['frames_written']
+            elif kind == 'error':
+                self.error = args[0]
+                log.error("Worker de gravação: %s", self.error)
+        self._conn.close()
+
+
+class AudioRingBuffer:
+    """Anel PCM pré-alocado, um produtor (callback de áudio) e um consumidor (thread de escrita).
+
+    Sem locks: cada índice só é escrito por um dos lados e, com o GIL, a
+    atribuição de um inteiro é atómica. O produtor copia os dados antes de
+    publicar o novo índice de escrita. Se o anel estiver cheio, o excesso é
+    descartado e contado — o callback nunca espera.
+    """
+    def __init__(self, frames: int, channels: int, dtype=np.int16):
+        self.capacity = max(1, int(frames))
+        self._buf = np.zeros((self.capacity, channels), dtype)
+        self._out = np.empty_like(self._buf)
+        self._w = 0  # total de frames escritos (só o produtor altera)
+        self._r = 0  # total de frames lidos (só o consumidor altera)
+        self.dropped = 0
+
+    def available(self) -> int:
+        return self._w - self._r
+
+    def write(self, data: np.ndarray):
+        n = len(data)
+        free = self.capacity - (self._w - self._r)
+        if n > free:
+            self.dropped += n - free
+            data = data[:free]
+            n = free
+        if n <= 0:
+            return
+        start = self._w % self.capacity
+        first = min(n, self.capacity - start)
+        self._buf[start:start + first] = data[:first]
+        if first < n:
+            self._buf[:n - first] = data[first:]
+        self._w += n
+
+    def read(self) -> np.ndarray:
+        """Copia tudo o que está disponível para um buffer interno e devolve essa vista."""
+        n = self._w - self._r
+        start = self._r % self.capacity
+        first = min(n, self.capacity - start)
+        self._out[:first] = self._buf[start:start + first]
+        if first < n:
+            self._out[first:n] = self._buf[:n - first]
+        self._r += n
+        return self._out[:n]
+
+
+class AudioRecorder(threading.Thread):
+    """Grava áudio do microfone para WAV temporário usando sounddevice+soundfile.
+
+    O callback do PortAudio só copia para um AudioRingBuffer pré-alocado;
+    esta thread esvazia o anel em blocos grandes para o WAV (ou, com
+    `pcm_fd`, para o pipe lido pelo ffmpeg em direto). Assim o disco e as
+    alocações ficam fora da thread de tempo real. No pipe em direto não há
+    mux no fim para corrigir a deriva (AVSync.ffmpeg_audio_filter): cada
+    bloco é esticado/encolhido aqui para o nº de amostras seguir o relógio
+    do vídeo.
+    """
+    def __init__(self, samplerate: int = 48000, channels: int = 1, device: Optional[int] = None,
+                 pcm_fd: Optional[int] = None, ring_seconds: float = 4.0, block_seconds: float = 0.25,
+                 av_sync: AVSync | None = None):
+        super().__init__(daemon=True)
+        self.samplerate = int(samplerate)
+        self.channels = int(channels)
+        self.device = device
+        self.pcm_fd = pcm_fd
+        self.block_seconds = block_seconds
+        self.ring = AudioRingBuffer(int(self.samplerate * ring_seconds), self.channels)
+        # contadores de xruns: os dois primeiros vêm do argumento `status` do PortAudio
+        self.input_overflows = 0
+        self.input_underflows = 0
+        self.av_sync = av_sync
+        if av_sync is not None:
+            av_sync.samplerate = self.samplerate
+        # pipe em direto: o 1.º bloco é cortado/precedido de silêncio para começar em t0 do vídeo
+        self._pending_skip: int | None = None if (pcm_fd is not None and av_sync is not None) else 0
+        self._sent = 0             # amostras enviadas para o pipe desde t0 do vídeo (com o silêncio inicial)
+        # à espera do t0 do vídeo (câmara/worker lentos a arrancar): só o fim do áudio fica guardado, fora do anel
+        self._pre: deque[np.ndarray] = deque()
+        self._pre_frames = 0
+        self._pre_keep = int(self.samplerate * max(1.0, 4 * block_seconds))
+        self._pre_dropped = 0      # amostras antigas descartadas antes do t0 do vídeo
+        self.drift_adjusted = 0    # amostras acrescentadas (+) / retiradas (−) pela correção de deriva
+        self._sd = None  # sounddevice, carregado em run()
+        self._running = threading.Event()
+        self._running.set()
+        self.wav_path = None if pcm_fd is not None else temp_media_path("qtrec_audio", ".wav")
+
+    def stop(self):
+        self._running.clear()
+
+    def stats(self) -> dict:
+        return {
+            'input_overflows': self.input_overflows,
+            'input_underflows': self.input_underflows,
+            'ring_dropped_frames': self.ring.dropped,
+        }
+
+    def run(self):
+        backend = audio_backend()
+        if backend is not None:
+            self._sd, sf = backend
+        try:
+            if self.pcm_fd is not None:
+                with os.fdopen(self.pcm_fd, 'wb', buffering=0) as pipe:
+                    if backend is not None:
+                        self._capture(lambda block: pipe.write(block.tobytes()))
+                return
+            if backend is None:
+                return
+            with sf.SoundFile(self.wav_path, mode='w', samplerate=self.samplerate, channels=self.channels, subtype='PCM_16') as wav:
+                self._capture(wav.write)
+        finally:
+            stats = self.stats()
+            if any(stats.values()):
+                log.warning("Áudio com perdas: %s", stats)
+            if self.drift_adjusted:
+                log.info("Deriva do áudio corrigida em direto: %+.1f ms", 1000.0 * self.drift_adjusted / self.samplerate)
+
+    def _callback(self, indata, frames, time_info, status):
+        # thread de tempo real: sem I/O, sem alocações, sem locks
+        if status:
+            if status.input_overflow:
+                self.input_overflows += 1
+            if status.input_underflow:
+                self.input_underflows += 1
+        if not self._running.is_set():
+            raise self._sd.CallbackStop()
+        if self.av_sync is not None:
+            # instante ADC da 1.ª amostra do bloco, convertido para o relógio perf_counter
+            latency = time_info.currentTime - time_info.inputBufferAdcTime if time_info.currentTime else frames / self.samplerate
+            self.av_sync.audio_block(time.perf_counter() - latency, self.ring._w)
+        self.ring.write(indata)
+
+    def _capture(self, sink):
+        sink_ok = True
+        with self._sd.InputStream(samplerate=self.samplerate, channels=self.channels, device=self.device,
+                                  dtype='int16', callback=self._callback):
+            while self._running.is_set():
+                time.sleep(self.block_seconds)
+                if sink_ok:
+                    sink_ok = self._drain(sink)
+                else:
+                    self.ring.read()  # sem destino: descartar
+        if self._pending_skip is None:
+            self._pending_skip = 0  # o vídeo nunca arrancou: escrever o que houver
+        if sink_ok:
+            self._drain(sink)
+
+    def _drain(self, sink) -> bool:
+        if self._pending_skip is None:
+            if not self.av_sync.wait_video(0) or self.av_sync.audio_t0 is None:
+                # ainda sem t0 do vídeo: esvaziar o anel (para não transbordar) guardando só o fim
+                self._keep_prestart(self.ring.read())
+                return True
+            lead = self.av_sync.video_t0 - self.av_sync.audio_t0
+            self._pending_skip = int(round(lead * self.samplerate)) - self._pre_dropped
+            if self._pending_skip < 0:
+                # o áudio começou depois do vídeo: silêncio até ao 1.º bloco
+                try:
+                    sink(np.zeros((-self._pending_skip, self.channels), np.int16))
+                except (BrokenPipeError, OSError):
+                    return False
+                self._sent -= self._pending_skip
+                self._pending_skip = 0
+        block = self.ring.read()
+        if self._pre:
+            block = np.concatenate([*self._pre, block])
+            self._pre.clear()
+            self._pre_frames = 0
+        if self._pending_skip:
+            # o áudio começou antes do vídeo: descartar o excesso inicial
+            cut = min(self._pending_skip, len(block))
+            block = block[cut:]
+            self._pending_skip -= cut
+        if not len(block):
+            return True
+        if self.av_sync is not None:
+            self.av_sync.audio_frames += len(block)
+            if self.pcm_fd is not None:
+                block = self._correct_drift(block)
+        try:
+            sink(block)
+            self._sent += len(block)
+            return True
+        except (BrokenPipeError, OSError):
+            # o ffmpeg fechou o pipe: continuar a esvaziar o anel, mas sem destino
+            return False
+
+    def _keep_prestart(self, block: np.ndarray):
+        """Guarda uma cópia do bloco e descarta (contando) o áudio mais antigo que `_pre_keep` amostras."""
+        if len(block):
+            self._pre.append(block.copy())
+            self._pre_frames += len(block)
+        while self._pre and self._pre_frames - len(self._pre[0]) >= self._pre_keep:
+            old = self._pre.popleft()
+            self._pre_frames -= len(old)
+            self._pre_dropped += len(old)
+
+    def _correct_drift(self, block: np.ndarray, tolerance: float = 0.02, max_ratio: float = 0.005) -> np.ndarray:
+        """Reamostra o bloco (no máximo ±max_ratio) quando o áudio enviado se afasta mais de
+        `tolerance` s do relógio do vídeo: placa de som mais rápida/lenta que o sistema, ou perdas no anel."""
+        sync = self.av_sync
+        if sync.audio_t_last is None or sync.video_t0 is None:
+            return block
+        n = len(block)
+        # instante ADC a seguir à última amostra lida: bloco mais recente + o que veio depois dele
+        t_end = sync.audio_t_last + (self.ring._r - sync.audio_frames_last) / self.samplerate
+        error = self._sent + n - (t_end - sync.video_t0) * self.samplerate
+        if abs(error) < tolerance * self.samplerate:
+            return block
+        limit = max(1, int(n * max_ratio))
+        new_n = n - int(max(-limit, min(limit, error)))
+        src = np.linspace(0, n - 1, new_n)
+        out = np.empty((new_n, block.shape[1]), block.dtype)
+        for c in range(block.shape[1]):
+            out[:, c] = np.interp(src, np.arange(n), block[:, c])
+        self.drift_adjusted += new_n - n
+        return out
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Estruturas de dados do pipeline: fila, cadência, anel de áudio, spool, anel partilhado, recuperação."""
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import recorder_engine as engine
+
+
+# --- FrameQueue ---
+
+def test_queue_drop_oldest_evicts_head():
+    dropped = []
+    q = engine.FrameQueue(2, 'drop-oldest', on_drop=dropped.append)
+    assert all(q.put(i) for i in range(4))
+    assert dropped == [0, 1]
+    assert q.dropped == 2 and q.max_depth == 2
+    assert [q.get(), q.get()] == [2, 3]
+
+
+def test_queue_drop_newest_rejects_item():
+    dropped = []
+    q = engine.FrameQueue(2, 'drop-newest', on_drop=dropped.append)
+    assert [q.put(i) for i in range(4)] == [True, True, False, False]
+    assert dropped == [2, 3]
+    assert [q.get(), q.get()] == [0, 1]
+
+
+def test_queue_block_waits_for_space():
+    q = engine.FrameQueue(1, 'block')
+    q.put(0)
+    t = threading.Thread(target=q.put, args=(1,))
+    t.start()
+    t.join(0.1)
+    assert t.is_alive()  # fila cheia: o produtor espera
+    assert q.get() == 0
+    t.join(1)
+    assert not t.is_alive() and q.get() == 1 and q.dropped == 0
+
+
+def test_queue_close_unblocks_and_rejects():
+    q = engine.FrameQueue(1, 'block')
+    q.close()
+    assert q.put(0) is False
+    assert q.get() is None
+
+
+def test_queue_invalid_policy():
+    with pytest.raises(ValueError):
+        engine.FrameQueue(2, 'drop-random')
+
+
+# --- FrameScheduler ---
+
+def test_scheduler_place_fills_and_skips_slots():
+    s = engine.FrameScheduler(10)
+    s.t0 = 100.0
+    assert s.place(100.00) == (0, 1)
+    assert s.place(100.35) == (1, 3)   # slots 1..3: dois duplicados
+    assert s.place(100.38) == (3, 0)   # o slot 3 já está ocupado: descartado
+    assert s.place(100.41) == (4, 1)
+    assert (s.next_slot, s.captured, s.duplicated, s.skipped) == (5, 4, 2, 1)
+
+
+def test_scheduler_stride_counts_planned_repeats():
+    s = engine.FrameScheduler(10)
+    s.t0 = 0.0
+    s.stride = 2
+    s.place(0.0)
+    assert s.place(0.25) == (1, 2)
+    assert (s.strided, s.duplicated) == (1, 0)
+
+
+def test_scheduler_skip_advances_without_slots():
+    s = engine.FrameScheduler(10)
+    s.t0 = 0.0
+    s.skip(0.55)
+    assert s.next_slot == 0 and s.captured == 1
+    assert s.place(0.61) == (0, 7)
+
+
+# --- AudioRingBuffer ---
+
+def test_audio_ring_wraps_around():
+    ring = engine.AudioRingBuffer(8, 2)
+    ring.write(np.arange(12, dtype=np.int16).reshape(6, 2))
+    np.testing.assert_array_equal(ring.read()[:, 0], [0, 2, 4, 6, 8, 10])
+    ring.write(np.arange(100, 112, dtype=np.int16).reshape(6, 2))  # 2 no fim do anel, 4 no início
+    assert ring.available() == 6
+    np.testing.assert_array_equal(ring.read()[:, 0], [100, 102, 104, 106, 108, 110])
+    assert ring.available() == 0 and ring.dropped == 0
+
+
+def test_audio_ring_drops_overflow():
+    ring = engine.AudioRingBuffer(4, 1)
+    ring.write(np.arange(3, dtype=np.int16).reshape(3, 1))
+    ring.write(np.arange(10, 13, dtype=np.int16).reshape(3, 1))
+    assert ring.dropped == 2 and ring.available() == 4
+    np.testing.assert_array_equal(ring.read()[:, 0], [0, 1, 2, 10])
+
+
+# --- SpoolWriter / Spool ---
+
+def _spool(path, n=4):
+    w = engine.SpoolWriter(path, (32, 16), 10, max_bytes=1 << 20)
+    for i in range(n):
+        assert w.write_frame(np.full((16, 32, 3), i * 10, np.uint8), 50.0 + 0.2 * i, count=1 + i % 2) == 1 + i % 2
+    assert w.repeat(3) == 3
+    w.release()
+    return path
+
+
+def test_spool_round_trip(tmp_path):
+    path = _spool(str(tmp_path / "s.qtspool"))
+    with engine.Spool(path) as sp:
+        assert len(sp) == 4 and sp.size == (32, 16) and sp.fps == 10 and not sp.i420
+        np.testing.assert_allclose(sp.index['ts'], [0.0, 0.2, 0.4, 0.6])
+        assert list(sp.index['repeat']) == [1, 2, 1, 5]
+        assert sp.duration == pytest.approx(0.9)
+        assert sp.frame(2).shape == (16, 32, 3) and int(sp.frame(2)[0, 0, 0]) == 20
+        assert sp.at(0.0) == 0 and sp.at(0.3) == 1 and sp.at(9.0) == 3
+        assert sp.range(0.2, 0.6) == (1, 3)
+        assert sp.range(0.5) == (3, 4)
+        assert sp.range(0.6, 0.1) == (3, 3)
+
+
+def test_spool_truncated_counts_only_stored_frames(tmp_path):
+    path = _spool(str(tmp_path / "s.qtspool"))
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 1)  # último frame incompleto
+    with engine.Spool(path) as sp:
+        assert len(sp) == 3
+
+
+def test_spool_rejects_other_files(tmp_path):
+    path = tmp_path / "x.qtspool"
+    path.write_bytes(b'\0' * 4096)
+    with pytest.raises(ValueError):
+        engine.Spool(str(path))
+
+
+# --- SharedFrameRing ---
+
+def test_shared_ring_seqlock():
+    ring = engine.SharedFrameRing((8, 8, 3), slots=3)
+    pool = engine.FramePool((4, 6, 3), size=1)
+    try:
+        assert ring.get_with_seq() == (None, 0)
+        for i in range(1, 5):
+            pf = pool.acquire()
+            pf.data[:] = i
+            ring.set(pf)
+            pf.release()
+        pf, seq = ring.get_with_seq()
+        assert seq == ring.seq == 4
+        assert pf.data.shape == (4, 6, 3) and int(pf.data[0, 0, 0]) == 4
+        pf.release()
+        # slot a meio de uma escrita (seq = -1): a leitura é descartada
+        ring._slot_hdr[4 % ring.slots][0] = -1
+        assert ring.get_with_seq() == (None, 4)
+        big = engine.FramePool((16, 16, 3), size=1).acquire()
+        ring.set(big)
+        assert ring.oversize == 1 and ring.seq == 4
+        ring.clear()
+        assert ring.get() is None
+    finally:
+        ring.close()
+
+
+# --- recover_temp_files ---
+
+@pytest.mark.skipif(not engine.has_ffmpeg(), reason="precisa do ffmpeg")
+def test_recover_spool_keeps_sidecar(tmp_path):
+    tmp_dir, dest = tmp_path / "tmp", tmp_path / "out"
+    tmp_dir.mkdir()
+    dest.mkdir()
+    src = _spool(str(tmp_dir / "qtrec_spool_1700000000.qtspool"))
+    with open(src + ".telemetry.jsonl", 'w') as f:
+        f.write("{}\n")
+    results = engine.recover_temp_files(str(dest), str(tmp_dir))
+    dst = str(dest / "recuperado_qtrec_spool_1700000000.mp4")
+    assert results == [(src, dst, "recuperado")]
+    assert sorted(os.listdir(dest)) == [os.path.basename(dst), os.path.basename(dst) + ".telemetry.jsonl"]
+    assert os.listdir(tmp_dir) == []